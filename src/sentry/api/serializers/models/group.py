@@ -38,6 +38,7 @@ from sentry.models import (
     UserOptionValue,
 )
 from sentry.tagstore.snuba.backend import SnubaTagStorage
+from sentry.tsdb import cache as tsdb_cache
 from sentry.tsdb.snuba import SnubaTSDB
 from sentry.utils.db import attach_foreignkey
 from sentry.utils.safe import safe_execute
@@ -499,7 +500,8 @@ class StreamGroupSerializer(GroupSerializer, GroupStatsMixin):
         except Environment.DoesNotExist:
             stats = {key: tsdb.make_series(0, **query_params) for key in group_ids}
         else:
-            stats = tsdb.get_range(
+            stats = tsdb_cache.get_range(
+                tsdb,
                 model=tsdb.models.group,
                 keys=group_ids,
                 environment_ids=environment and [environment.id],
@@ -622,7 +624,8 @@ class StreamGroupSerializerSnuba(GroupSerializerSnuba, GroupStatsMixin):
         self.matching_event_id = matching_event_id
 
     def query_tsdb(self, group_ids, query_params):
-        return snuba_tsdb.get_range(
+        return tsdb_cache.get_range(
+            snuba_tsdb,
             model=snuba_tsdb.models.group,
             keys=group_ids,
             environment_ids=self.environment_ids,
@@ -3,10 +3,15 @@ from __future__ import absolute_import
 import logging
 import six
 
-from django.db.models import F
+from collections import OrderedDict
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, router
+from django.db.models import F, Model
 
 from sentry.signals import buffer_incr_complete
 from sentry.tasks.process_buffer import process_incr
+from sentry.utils import metrics
+from sentry.utils.db import is_postgres
 from sentry.utils.services import Service
 
 
@@ -32,7 +37,10 @@ class Buffer(Service):
     keep up with the updates.
     """
 
-    __all__ = ("incr", "process", "process_pending", "validate")
+    __all__ = ("incr", "process", "process_batch", "process_pending", "validate")
+
+    # maximum number of rows in a single bulk ``UPDATE`` statement
+    bulk_update_size = 500
 
     def incr(self, model, columns, filters, extra=None):
         """
@@ -72,3 +80,162 @@ class Buffer(Service):
             created=created,
             sender=model,
         )
+
+    def process_batch(self, items):
+        """
+        Processes many buffered increments at once. ``items`` is a sequence of
+        ``(model, columns, filters, extra)`` tuples.
+
+        On Postgres, increments for the same model that touch the same
+        columns are applied with multi-row ``UPDATE ... FROM (VALUES ...)``
+        statements. Increments for rows that don't exist yet, and anything
+        that can't be expressed that way, go through ``process``.
+        """
+        batches = OrderedDict()
+        fallback = []
+        for model, columns, filters, extra in items:
+            extra = dict(extra or {})
+            if not _can_bulk_update(model, columns, filters, extra):
+                fallback.append((model, columns, filters, extra or None))
+                continue
+
+            signature = (
+                model,
+                tuple(sorted(filters)),
+                tuple(sorted(columns)),
+                tuple(sorted(extra)),
+            )
+            rows = batches.setdefault(signature, OrderedDict())
+            row_key = tuple(filters[k] for k in signature[1])
+            if row_key in rows:
+                # the same row shows up twice, merge it as ``process`` would
+                # have applied both increments one after another
+                _, pending_columns, pending_extra = rows[row_key]
+                for column, amount in six.iteritems(columns):
+                    pending_columns[column] += amount
+                pending_extra.update(extra)
+            else:
+                rows[row_key] = (filters, dict(columns), extra)
+
+        for (model, filter_names, column_names, extra_names), rows in six.iteritems(batches):
+            rows = list(rows.values())
+            for i in range(0, len(rows), self.bulk_update_size):
+                chunk = rows[i : i + self.bulk_update_size]
+                updated = _bulk_update(model, filter_names, column_names, extra_names, chunk)
+                metrics.timing(
+                    "buffer.bulk-update.rows", len(updated), tags={"model": model.__name__}
+                )
+                for idx, (filters, columns, extra) in enumerate(chunk):
+                    if idx in updated:
+                        buffer_incr_complete.send_robust(
+                            model=model,
+                            columns=columns,
+                            filters=filters,
+                            extra=extra or None,
+                            created=False,
+                            sender=model,
+                        )
+                    else:
+                        fallback.append((model, columns, filters, extra or None))
+
+        for model, columns, filters, extra in fallback:
+            Buffer.process(self, model, columns, filters, extra)
+
+
+def _get_field(model, name):
+    if name == "pk":
+        return model._meta.pk
+    field = model._meta.get_field(name)
+    if not field.concrete or field.many_to_many:
+        raise FieldDoesNotExist(name)
+    return field
+
+
+def _can_bulk_update(model, columns, filters, extra):
+    from sentry.models import Group
+
+    if not (filters and columns) or not is_postgres(router.db_for_write(model)):
+        return False
+
+    if model is Group and "last_seen" in extra and "times_seen" in columns:
+        # ``score`` is computed in SQL, see ``_bulk_update``
+        extra.pop("score", None)
+
+    try:
+        for name in list(filters) + list(columns) + list(extra):
+            _get_field(model, name)
+    except FieldDoesNotExist:
+        return False
+
+    for value in list(six.itervalues(filters)) + list(six.itervalues(extra)):
+        if isinstance(value, Model) or hasattr(value, "resolve_expression"):
+            return False
+    # ``NULL = NULL`` never matches, leave these to ``create_or_update``
+    return all(value is not None for value in six.itervalues(filters))
+
+
+def _bulk_update(model, filter_names, column_names, extra_names, rows):
+    """
+    Applies ``rows`` (a list of ``(filters, columns, extra)``) with a single
+    statement and returns the indexes of the rows that were updated.
+    """
+    from sentry.models import Group
+
+    using = router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+
+    # values are referenced by position (``v.fN``, ``v.cN`` and ``v.eN``) so
+    # column names can't collide with each other or with ``idx``
+    fields = []
+    aliases = ["idx"]
+    for prefix, names in (("f", filter_names), ("c", column_names), ("e", extra_names)):
+        for i, name in enumerate(names):
+            field = _get_field(model, name)
+            fields.append((prefix, name, field))
+            aliases.append("%s%d" % (prefix, i))
+
+    placeholder = "(%s)" % ", ".join(
+        ["%s::integer"] + ["%%s::%s" % (field.db_type(connection),) for _, _, field in fields]
+    )
+    params = []
+    for idx, (filters, columns, extra) in enumerate(rows):
+        params.append(idx)
+        for prefix, name, field in fields:
+            value = {"f": filters, "c": columns, "e": extra}[prefix][name]
+            params.append(value if prefix == "c" else field.get_db_prep_save(value, connection))
+
+    assignments = []
+    for i, name in enumerate(column_names):
+        column = qn(_get_field(model, name).column)
+        assignments.append("%s = t.%s + v.c%d" % (column, column, i))
+    for i, name in enumerate(extra_names):
+        assignments.append("%s = v.e%d" % (qn(_get_field(model, name).column), i))
+    if model is Group and "last_seen" in extra_names and "times_seen" in column_names:
+        # mirrors ``ScoreClause`` for the values being written
+        assignments.append(
+            "%s = log(t.%s + v.c%d) * 600 + floor(extract(epoch from v.e%d))"
+            % (
+                qn("score"),
+                qn("times_seen"),
+                column_names.index("times_seen"),
+                extra_names.index("last_seen"),
+            )
+        )
+
+    conditions = [
+        "t.%s = v.f%d" % (qn(_get_field(model, name).column), i)
+        for i, name in enumerate(filter_names)
+    ]
+
+    sql = "UPDATE %s AS t SET %s FROM (VALUES %s) AS v (%s) WHERE %s RETURNING v.idx" % (
+        qn(model._meta.db_table),
+        ", ".join(assignments),
+        ", ".join([placeholder] * len(rows)),
+        ", ".join(aliases),
+        " AND ".join(conditions),
+    )
+
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return set(row[0] for row in cursor.fetchall())
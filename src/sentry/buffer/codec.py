@@ -0,0 +1,115 @@
+"""
+Compact serialization for the values stored in buffer hashes (filters and
+extra columns).
+
+Payloads are msgpack encoded and prefixed with a version byte. Types that
+msgpack doesn't know about natively are stored as extension types:
+
+* timezone aware datetimes (normalized to UTC) and naive datetimes, as
+  microseconds since the epoch,
+* model instances, as a reference of the model path and primary key,
+* anything else, as a pickle.
+
+``loads`` also understands the formats written by previous versions of the
+buffer (pickle and typed JSON) so values that were written before a deploy
+can still be read after it.
+"""
+from __future__ import absolute_import
+
+import msgpack
+import six
+import struct
+
+from datetime import datetime, timedelta
+from django.db import models
+from django.utils import timezone
+
+from sentry.utils import json
+from sentry.utils.compat import pickle
+from sentry.utils.imports import import_string
+
+VERSION = 1
+
+_VERSION_PREFIX = struct.pack("B", VERSION)
+
+EXT_DATETIME = 1
+EXT_NAIVE_DATETIME = 2
+EXT_MODEL = 3
+EXT_PICKLE = 4
+
+_epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_naive_epoch = datetime(1970, 1, 1)
+_int64 = struct.Struct(">q")
+
+
+def _to_microseconds(delta):
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return msgpack.ExtType(EXT_DATETIME, _int64.pack(_to_microseconds(value - _epoch)))
+        return msgpack.ExtType(
+            EXT_NAIVE_DATETIME, _int64.pack(_to_microseconds(value - _naive_epoch))
+        )
+    if isinstance(value, models.Model):
+        model = type(value)
+        return msgpack.ExtType(
+            EXT_MODEL,
+            msgpack.packb(
+                ["%s.%s" % (model.__module__, model.__name__), value.pk], use_bin_type=True
+            ),
+        )
+    return msgpack.ExtType(EXT_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _ext_hook(code, data):
+    if code == EXT_DATETIME:
+        return _epoch + timedelta(microseconds=_int64.unpack(data)[0])
+    elif code == EXT_NAIVE_DATETIME:
+        return _naive_epoch + timedelta(microseconds=_int64.unpack(data)[0])
+    elif code == EXT_MODEL:
+        path, pk = msgpack.unpackb(data, raw=False)
+        return import_string(path)(pk=pk)
+    elif code == EXT_PICKLE:
+        return pickle.loads(data)
+    return msgpack.ExtType(code, data)
+
+
+def dumps(value):
+    """
+    Serializes ``value`` with the current codec version.
+    """
+    return _VERSION_PREFIX + msgpack.packb(value, use_bin_type=True, default=_default)
+
+
+def _load_json_value(payload):
+    (type_, value) = payload
+    if type_ == "s":
+        return value
+    elif type_ == "d":
+        return datetime.fromtimestamp(float(value)).replace(tzinfo=timezone.utc)
+    elif type_ == "i":
+        return int(value)
+    elif type_ == "f":
+        return float(value)
+    else:
+        raise TypeError("invalid type: {}".format(type_))
+
+
+def loads(payload):
+    """
+    Deserializes a value written by ``dumps`` or by one of the legacy
+    (pickle or typed JSON) serializers.
+    """
+    if payload[:1] == _VERSION_PREFIX:
+        return msgpack.unpackb(payload[1:], raw=False, ext_hook=_ext_hook)
+    elif payload.startswith("{"):
+        # legacy typed JSON filters
+        return {k: _load_json_value(v) for k, v in six.iteritems(json.loads(payload))}
+    elif payload.startswith("["):
+        # legacy typed JSON value
+        return _load_json_value(json.loads(payload))
+    # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
+    return pickle.loads(payload)
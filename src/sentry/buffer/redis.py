@@ -1,24 +1,30 @@
 from __future__ import absolute_import
 
 import six
+import threading
 
 from time import time
 from binascii import crc32
+from collections import defaultdict, OrderedDict
 
-from datetime import datetime
+from celery.signals import task_postrun, worker_process_shutdown
+from django.core.signals import request_finished
 from django.db import models
-from django.utils import timezone
 from django.utils.encoding import force_bytes
+from pkg_resources import resource_string
+from redis.client import Script
 
-from sentry.buffer import Buffer
+from sentry.buffer import Buffer, codec
 from sentry.exceptions import InvalidConfiguration
 from sentry.tasks.process_buffer import process_incr, process_pending
-from sentry.utils import json, metrics
+from sentry.utils import metrics
 from sentry.utils.compat import pickle
 from sentry.utils.hashlib import md5_text
 from sentry.utils.imports import import_string
 from sentry.utils.redis import get_cluster_from_options
 
+IncrScript = Script(None, resource_string("sentry", "scripts/buffer/incr.lua"))
+
 
 class PendingBuffer(object):
     def __init__(self, size):
@@ -47,16 +53,84 @@ class PendingBuffer(object):
         return rv
 
 
+class PendingIncr(object):
+    """
+    The merged result of one or more ``incr`` calls for the same model and
+    filters that have not been written to Redis yet.
+    """
+
+    __slots__ = ["model", "filters", "columns", "extra", "timestamp"]
+
+    def __init__(self, model, filters):
+        self.model = model
+        self.filters = filters
+        self.columns = defaultdict(int)
+        self.extra = {}
+        # time of the first increment
+        self.timestamp = time()
+
+    def merge(self, columns, extra=None):
+        for column, amount in six.iteritems(columns):
+            self.columns[column] += amount
+        if extra:
+            # last write wins, same as HSET would do
+            self.extra.update(extra)
+
+
 class RedisBuffer(Buffer):
+    """
+    Buffers increments in Redis hashes until they are flushed to the
+    database by ``process_pending``/``process``.
+
+    If ``incr_coalesce_window`` (in seconds) is set, increments for the same
+    model and filters are merged in process memory and only written to Redis
+    once the window has passed (checked on every increment and whenever a
+    task or request finishes), ``incr_coalesce_max_keys`` distinct keys are
+    pending or the worker process shuts down. Every write is a
+    single script invocation per key and the keys of a flush are sent in one
+    pipeline per host.
+    """
+
     key_expire = 60 * 60  # 1 hour
     pending_key = "b:p"
 
-    def __init__(self, pending_partitions=1, incr_batch_size=2, **options):
+    def __init__(
+        self,
+        pending_partitions=1,
+        incr_batch_size=2,
+        incr_coalesce_window=0,
+        incr_coalesce_max_keys=1000,
+        incr_codec_version=codec.VERSION,
+        incr_bulk_flush=False,
+        pending_chunk_size=1000,
+        pending_max_duration=30,
+        **options
+    ):
         self.cluster, options = get_cluster_from_options("SENTRY_BUFFER_OPTIONS", options)
         self.pending_partitions = pending_partitions
         self.incr_batch_size = incr_batch_size
+        self.incr_coalesce_window = incr_coalesce_window
+        self.incr_coalesce_max_keys = incr_coalesce_max_keys
+        self.incr_codec_version = incr_codec_version
+        self.incr_bulk_flush = incr_bulk_flush
+        self.pending_chunk_size = pending_chunk_size
+        self.pending_max_duration = pending_max_duration
         assert self.pending_partitions > 0
         assert self.incr_batch_size > 0
+        assert self.incr_coalesce_window >= 0
+        assert self.incr_coalesce_max_keys > 0
+        assert self.incr_codec_version in (0, codec.VERSION)
+        assert self.pending_chunk_size > 0
+        assert self.pending_max_duration > 0
+
+        self._pending_incrs = OrderedDict()
+        self._pending_incrs_deadline = None
+        self._pending_incrs_lock = threading.Lock()
+
+        if self.incr_coalesce_window:
+            task_postrun.connect(self._flush_expired_incrs, weak=False)
+            request_finished.connect(self._flush_expired_incrs, weak=False)
+            worker_process_shutdown.connect(self.flush_incrs, weak=False)
 
     def validate(self):
         try:
@@ -107,45 +181,6 @@ class RedisBuffer(Buffer):
     def _make_lock_key(self, key):
         return "l:%s" % (key,)
 
-    def _dump_values(self, values):
-        result = {}
-        for k, v in six.iteritems(values):
-            result[k] = self._dump_value(v)
-        return result
-
-    def _dump_value(self, value):
-        if isinstance(value, six.string_types):
-            type_ = "s"
-        elif isinstance(value, datetime):
-            type_ = "d"
-            value = value.strftime("%s.%f")
-        elif isinstance(value, int):
-            type_ = "i"
-        elif isinstance(value, float):
-            type_ = "f"
-        else:
-            raise TypeError(type(value))
-        return (type_, six.text_type(value))
-
-    def _load_values(self, payload):
-        result = {}
-        for k, (t, v) in six.iteritems(payload):
-            result[k] = self._load_value((t, v))
-        return result
-
-    def _load_value(self, payload):
-        (type_, value) = payload
-        if type_ == "s":
-            return value
-        elif type_ == "d":
-            return datetime.fromtimestamp(float(value)).replace(tzinfo=timezone.utc)
-        elif type_ == "i":
-            return int(value)
-        elif type_ == "f":
-            return float(value)
-        else:
-            raise TypeError("invalid type: {}".format(type_))
-
     def incr(self, model, columns, filters, extra=None):
         """
         Increment the key by doing the following:
@@ -154,36 +189,34 @@ class RedisBuffer(Buffer):
             - Perform an incrby on counters
             - Perform a set (last write wins) on extra
         - Add hashmap key to pending flushes
+
+        With coalescing enabled the increment is merged into the pending
+        increments of this process first (see ``flush_incrs``).
         """
-        # TODO(dcramer): longer term we'd rather not have to serialize values
-        # here (unless it's to JSON)
         key = self._make_key(model, filters)
-        pending_key = self._make_pending_key_from_key(key)
-        # We can't use conn.map() due to wanting to support multiple pending
-        # keys (one per Redis partition)
-        conn = self.cluster.get_local_client_for_key(key)
-
-        pipe = conn.pipeline()
-        pipe.hsetnx(key, "m", "%s.%s" % (model.__module__, model.__name__))
-        # TODO(dcramer): once this goes live in production, we can kill the pickle path
-        # (this is to ensure a zero downtime deploy where we can transition event processing)
-        pipe.hsetnx(key, "f", pickle.dumps(filters))
-        # pipe.hsetnx(key, 'f', json.dumps(self._dump_values(filters)))
-        for column, amount in six.iteritems(columns):
-            pipe.hincrby(key, "i+" + column, amount)
 
-        if extra:
-            # Group tries to serialize 'score', so we'd need some kind of processing
-            # hook here
-            # e.g. "update score if last_seen or times_seen is changed"
-            for column, value in six.iteritems(extra):
-                # TODO(dcramer): once this goes live in production, we can kill the pickle path
-                # (this is to ensure a zero downtime deploy where we can transition event processing)
-                pipe.hset(key, "e+" + column, pickle.dumps(value))
-                # pipe.hset(key, 'e+' + column, json.dumps(self._dump_value(value)))
-        pipe.expire(key, self.key_expire)
-        pipe.zadd(pending_key, time(), key)
-        pipe.execute()
+        if not self.incr_coalesce_window:
+            pending = PendingIncr(model, filters)
+            pending.merge(columns, extra)
+            self._write_incrs([(key, pending)])
+        else:
+            now = time()
+            with self._pending_incrs_lock:
+                pending = self._pending_incrs.get(key)
+                if pending is None:
+                    pending = self._pending_incrs[key] = PendingIncr(model, filters)
+                pending.merge(columns, extra)
+
+                if self._pending_incrs_deadline is None:
+                    self._pending_incrs_deadline = now + self.incr_coalesce_window
+
+                should_flush = (
+                    self._pending_incrs_deadline <= now
+                    or len(self._pending_incrs) >= self.incr_coalesce_max_keys
+                )
+
+            if should_flush:
+                self.flush_incrs()
 
         metrics.incr(
             "buffer.incr",
@@ -191,6 +224,63 @@ class RedisBuffer(Buffer):
             tags={"module": model.__module__, "model": model.__name__},
         )
 
+    def _flush_expired_incrs(self, **kwargs):
+        deadline = self._pending_incrs_deadline
+        if deadline is not None and deadline <= time():
+            self.flush_incrs()
+
+    def flush_incrs(self, **kwargs):
+        """
+        Writes all increments that were coalesced in this process to Redis.
+        """
+        with self._pending_incrs_lock:
+            if not self._pending_incrs:
+                return
+            pending = self._pending_incrs
+            self._pending_incrs = OrderedDict()
+            self._pending_incrs_deadline = None
+
+        metrics.timing("buffer.incr.coalesced-keys", len(pending))
+        self._write_incrs(six.iteritems(pending))
+
+    def _write_incrs(self, items):
+        # Commands are routed by the buffer key, the pending key lives on
+        # every host (one per Redis partition) so it's always local to it.
+        commands = {}
+        for key, pending in items:
+            commands[key] = [
+                (
+                    IncrScript,
+                    [key, self._make_pending_key_from_key(key)],
+                    self._make_incr_args(pending, pending.timestamp),
+                )
+            ]
+        self.cluster.execute_commands(commands)
+
+    def _dump_value(self, value):
+        # Version 0 is the legacy pickle format, which is still readable by
+        # workers that run an older version. Only switch to the compact codec
+        # once all workers can read it.
+        if self.incr_codec_version == 0:
+            return pickle.dumps(value)
+        return codec.dumps(value)
+
+    def _make_incr_args(self, pending, timestamp):
+        model = pending.model
+        args = [
+            self.key_expire,
+            timestamp,
+            "%s.%s" % (model.__module__, model.__name__),
+            self._dump_value(pending.filters),
+            len(pending.columns),
+        ]
+        for column, amount in six.iteritems(pending.columns):
+            args.extend((column, amount))
+
+        for column, value in six.iteritems(pending.extra):
+            args.extend((column, self._dump_value(value)))
+        return args
+
     def process_pending(self, partition=None):
         if partition is None and self.pending_partitions > 1:
             # If we're using partitions, this one task fans out into
@@ -209,28 +299,55 @@ class RedisBuffer(Buffer):
             return
 
         pending_buffer = PendingBuffer(self.incr_batch_size)
+        tags = {"partition": "none" if partition is None else six.text_type(partition)}
+        # Only keys that were pending when we started are drained, anything
+        # added after that is left for the next run. A key keeps the score of
+        # its first increment until it's drained, so the oldest score is the
+        # age of the backlog.
+        started = time()
+        deadline = started + self.pending_max_duration
 
         try:
             keycount = 0
-            with self.cluster.all() as conn:
-                results = conn.zrange(pending_key, 0, -1)
-
-            with self.cluster.all() as conn:
-                for host_id, keys in six.iteritems(results.value):
+            lag = 0
+            within_deadline = True
+            for host_id in self.cluster.hosts:
+                conn = self.cluster.get_local_client(host_id)
+                oldest = conn.zrange(pending_key, 0, 0, withscores=True)
+                if oldest:
+                    lag = max(lag, started - oldest[0][1])
+
+                while within_deadline:
+                    keys = conn.zrangebyscore(
+                        pending_key, "-inf", started, start=0, num=self.pending_chunk_size
+                    )
                     if not keys:
-                        continue
+                        break
                     keycount += len(keys)
                     for key in keys:
                         pending_buffer.append(key)
                         if pending_buffer.full():
                             process_incr.apply_async(kwargs={"batch_keys": pending_buffer.flush()})
-                    conn.target([host_id]).zrem(pending_key, *keys)
+                    conn.zrem(pending_key, *keys)
+
+                    if time() > deadline:
+                        # back off and leave the remainder to the next run
+                        # rather than holding on to the partition
+                        within_deadline = False
+                    else:
+                        # keep our claim on the partition while we make progress
+                        client.expire(lock_key, 60)
 
             # queue up remainder of pending keys
             if not pending_buffer.empty():
                 process_incr.apply_async(kwargs={"batch_keys": pending_buffer.flush()})
 
-            metrics.timing("buffer.pending-size", keycount)
+            metrics.timing("buffer.pending-size", keycount, tags=tags)
+            metrics.timing("buffer.pending-lag", lag, tags=tags)
+            if not within_deadline:
+                with self.cluster.all() as conn:
+                    remaining = conn.zcard(pending_key)
+                metrics.timing("buffer.pending-remaining", sum(remaining.value.values()), tags=tags)
         finally:
             client.delete(lock_key)
 
@@ -241,9 +358,75 @@ class RedisBuffer(Buffer):
         if key is not None:
             batch_keys = [key]
 
+        if self.incr_bulk_flush and len(batch_keys) > 1:
+            self._process_batch_incrs(batch_keys)
+            return
+
         for key in batch_keys:
             self._process_single_incr(key)
 
+    def _load_incr_values(self, values):
+        model = import_string(values.pop("m"))
+        filters = codec.loads(values.pop("f"))
+
+        incr_values = {}
+        extra_values = {}
+        for k, v in six.iteritems(values):
+            if k.startswith("i+"):
+                incr_values[k[2:]] = int(v)
+            elif k.startswith("e+"):
+                extra_values[k[2:]] = codec.loads(v)
+        return model, incr_values, filters, extra_values
+
+    def _process_batch_incrs(self, keys):
+        """
+        Drains all of ``keys`` with one transaction per host and applies them
+        with ``Buffer.process_batch``.
+        """
+        with self.cluster.map() as conn:
+            locks = [(key, conn.set(self._make_lock_key(key), "1", nx=True, ex=10)) for key in keys]
+
+        locked = []
+        for key, result in locks:
+            if result.value:
+                locked.append(key)
+            else:
+                metrics.incr("buffer.revoked", tags={"reason": "locked"}, skip_internal=False)
+                self.logger.debug("buffer.revoked.locked", extra={"redis_key": key})
+
+        try:
+            keys_by_host = defaultdict(list)
+            router = self.cluster.get_router()
+            for key in locked:
+                keys_by_host[router.get_host_for_key(key)].append(key)
+
+            items = []
+            for host_id, host_keys in six.iteritems(keys_by_host):
+                pipe = self.cluster.get_local_client(host_id).pipeline()
+                for key in host_keys:
+                    pipe.hgetall(key)
+                    pipe.zrem(self._make_pending_key_from_key(key), key)
+                    pipe.delete(key)
+                results = pipe.execute()
+
+                for key, values in zip(host_keys, results[::3]):
+                    if not values:
+                        metrics.incr(
+                            "buffer.revoked", tags={"reason": "empty"}, skip_internal=False
+                        )
+                        self.logger.debug("buffer.revoked.empty", extra={"redis_key": key})
+                        continue
+                    items.append(self._load_incr_values(values))
+
+            metrics.timing("buffer.batch-size", len(items))
+            if items:
+                self.process_batch(items)
+        finally:
+            if locked:
+                with self.cluster.map() as conn:
+                    for key in locked:
+                        conn.delete(self._make_lock_key(key))
+
     def _process_single_incr(self, key):
         client = self.cluster.get_routing_client()
         lock_key = self._make_lock_key(key)
@@ -269,25 +452,6 @@ class RedisBuffer(Buffer):
                 self.logger.debug("buffer.revoked.empty", extra={"redis_key": key})
                 return
 
-            model = import_string(values.pop("m"))
-            if values["f"].startswith("{"):
-                filters = self._load_values(json.loads(values.pop("f")))
-            else:
-                # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
-                filters = pickle.loads(values.pop("f"))
-
-            incr_values = {}
-            extra_values = {}
-            for k, v in six.iteritems(values):
-                if k.startswith("i+"):
-                    incr_values[k[2:]] = int(v)
-                elif k.startswith("e+"):
-                    if v.startswith("["):
-                        extra_values[k[2:]] = self._load_value(json.loads(v))
-                    else:
-                        # TODO(dcramer): legacy pickle support - remove in Sentry 9.1
-                        extra_values[k[2:]] = pickle.loads(v)
-
-            super(RedisBuffer, self).process(model, incr_values, filters, extra_values)
+            super(RedisBuffer, self).process(*self._load_incr_values(values))
         finally:
             client.delete(lock_key)
@@ -1,13 +1,17 @@
 from __future__ import absolute_import
 
-__all__ = ["default_cache"]
+__all__ = ["default_cache", "event_cache"]
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 
 from sentry.utils.imports import import_string
 
+from .events import EventPayloadCache
+
 if not settings.SENTRY_CACHE:
     raise ImproperlyConfigured("You must configure ``cache.backend``.")
 
 default_cache = import_string(settings.SENTRY_CACHE)(**settings.SENTRY_CACHE_OPTIONS)
+
+event_cache = EventPayloadCache(default_cache)
@@ -24,3 +24,10 @@ class BaseCache(local):
 
     def get(self, key, version=None, raw=False):
         raise NotImplementedError
+
+    def touch(self, key, timeout, version=None):
+        """
+        Sets a new timeout on ``key``.  Returns False if the key does not
+        exist or the backend cannot change the timeout of an existing key.
+        """
+        return False
@@ -0,0 +1,129 @@
+"""
+Storage for event payloads while they move through the store tasks
+(preprocess, process and save).
+
+Payloads are written as an envelope: large top level sections (e.g.
+``exception``, ``threads`` or ``debug_meta``) are stored under keys of their
+own and everything else is kept inline in a manifest, which also records a
+digest of every section.  All parts are zlib compressed JSON.  When a
+processed event is written back, only sections whose digest changed are
+rewritten (unchanged ones only get their timeout renewed), so processors that
+touch a part of a large (e.g. native) event don't cause the whole event to be
+sent to the cache again.
+
+Payloads written as plain values (i.e. before ``store.use-payload-envelope``
+was enabled) can still be read.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import six
+import struct
+import zlib
+
+from sentry import options
+from sentry.utils import json, metrics
+
+VERSION = 1
+
+_VERSION_PREFIX = struct.pack("B", VERSION)
+
+# Top level values that encode to at least this many bytes are stored as
+# sections of their own.
+SECTION_MIN_SIZE = 1024
+
+
+def _dumps(value):
+    rv = json.dumps(value)
+    if isinstance(rv, six.text_type):
+        rv = rv.encode("utf-8")
+    return rv
+
+
+class EventPayloadCache(object):
+    def __init__(self, inner):
+        self.inner = inner
+
+    def make_section_key(self, key, name):
+        return u"{}:s:{}".format(key, name)
+
+    def _get_manifest(self, key):
+        """
+        Returns a tuple of ``(manifest, value)``, where ``manifest`` is None
+        if the value stored at ``key`` is not an envelope.
+        """
+        value = self.inner.get(key, raw=True)
+        if isinstance(value, six.binary_type) and value[:1] == _VERSION_PREFIX:
+            return json.loads(zlib.decompress(value[1:])), None
+        return None, value
+
+    def get(self, key):
+        manifest, value = self._get_manifest(key)
+        if manifest is None:
+            if isinstance(value, (six.binary_type, six.text_type)):
+                value = json.loads(value)
+            return value
+
+        data = manifest["data"]
+        for name in manifest["sections"]:
+            section = self.inner.get(self.make_section_key(key, name), raw=True)
+            if section is None:
+                metrics.incr(
+                    "events.payload.missing-section", tags={"section": name}, skip_internal=False
+                )
+                return None
+            data[name] = json.loads(zlib.decompress(section))
+        return data
+
+    def set(self, key, data, timeout):
+        if not options.get("store.use-payload-envelope"):
+            self.inner.set(key, data, timeout)
+            return
+
+        previous, _ = self._get_manifest(key)
+        previous_sections = previous["sections"] if previous is not None else {}
+
+        inline = []
+        sections = {}
+        written = 0
+        for name, value in six.iteritems(data):
+            encoded = _dumps(value)
+            if len(encoded) < SECTION_MIN_SIZE:
+                inline.append(_dumps(name) + b":" + encoded)
+                continue
+
+            digest = hashlib.md5(encoded).hexdigest()
+            sections[name] = digest
+            section_key = self.make_section_key(key, name)
+            # unchanged sections get the timeout of the new manifest, so they
+            # cannot expire before it.  They are written again if they are
+            # gone already or the backend cannot renew the timeout.
+            if previous_sections.get(name) != digest or not self.inner.touch(
+                section_key, timeout
+            ):
+                compressed = zlib.compress(encoded)
+                self.inner.set(section_key, compressed, timeout, raw=True)
+                metrics.timing("events.payload.section-size.raw", len(encoded))
+                metrics.timing("events.payload.section-size.compressed", len(compressed))
+                written += 1
+
+        for name in previous_sections:
+            if name not in sections:
+                self.inner.delete(self.make_section_key(key, name))
+
+        # the inline values were encoded already, so the manifest is
+        # assembled from the pieces instead of encoding them again
+        manifest = b'{"sections":%s,"data":{%s}}' % (_dumps(sections), b",".join(inline))
+        self.inner.set(key, _VERSION_PREFIX + zlib.compress(manifest), timeout, raw=True)
+
+        metrics.incr("events.payload.sections-written", written, skip_internal=False)
+        metrics.incr(
+            "events.payload.sections-unchanged", len(sections) - written, skip_internal=False
+        )
+
+    def delete(self, key):
+        manifest, _ = self._get_manifest(key)
+        if manifest is not None:
+            for name in manifest["sections"]:
+                self.inner.delete(self.make_section_key(key, name))
+        self.inner.delete(key)
@@ -32,6 +32,12 @@ class CommonRedisCache(BaseCache):
         key = self.make_key(key, version=version)
         self.client.delete(key)
 
+    def touch(self, key, timeout, version=None):
+        key = self.make_key(key, version=version)
+        if timeout:
+            return bool(self.client.expire(key, int(timeout)))
+        return bool(self.client.persist(key)) or bool(self.client.exists(key))
+
     def get(self, key, version=None, raw=False):
         key = self.make_key(key, version=version)
         result = self.client.get(key)
@@ -694,7 +694,11 @@ CELERYBEAT_SCHEDULE = {
 }
 
 BGTASKS = {
-    "sentry.bgtasks.clean_dsymcache:clean_dsymcache": {"interval": 5 * 60, "roles": ["worker"]}
+    "sentry.bgtasks.clean_dsymcache:clean_dsymcache": {"interval": 5 * 60, "roles": ["worker"]},
+    "sentry.bgtasks.clean_releasefilecache:clean_releasefilecache": {
+        "interval": 5 * 60,
+        "roles": ["worker"],
+    },
 }
 
 # Sentry logs to two major places: stdout, and it's internal project.
@@ -1027,6 +1031,10 @@ SENTRY_SCRAPE_JAVASCRIPT_CONTEXT = True
 SENTRY_BUFFER = "sentry.buffer.Buffer"
 SENTRY_BUFFER_OPTIONS = {}
 
+# Options for the Bloom filter of recently saved event ids that is used to
+# skip duplicate lookups (see ``sentry.utils.bloom.RedisBloomFilter``)
+SENTRY_EVENT_ID_FILTER_OPTIONS = {}
+
 # Cache backend
 # XXX: We explicitly require the cache to be configured as its not optional
 # and causes serious confusion with the default django cache
@@ -1153,9 +1161,17 @@ SENTRY_SOURCE_FETCH_TIMEOUT = 5
 # Timeout (in seconds) for socket operations when fetching remote source files
 SENTRY_SOURCE_FETCH_SOCKET_TIMEOUT = 2
 
+# Number of remote source files (and sourcemaps) that are fetched concurrently
+# while processing an event. With a value of 1 they are fetched one by one.
+SENTRY_SOURCE_FETCH_CONCURRENCY = 10
+
 # Maximum content length for source files before we abort fetching
 SENTRY_SOURCE_FETCH_MAX_SIZE = 40 * 1024 * 1024
 
+# Maximum total size (in bytes) of the JavaScript source files and sourcemaps
+# that are kept parsed in memory by every worker process
+SENTRY_JS_VIEW_CACHE_SIZE = 256 * 1024 * 1024
+
 # Fields which managed users cannot change via Sentry UI. Username and password
 # cannot be changed by managed users. Optionally include 'email' and
 # 'name' in SENTRY_MANAGED_USER_FIELDS.
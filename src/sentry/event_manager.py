@@ -5,6 +5,7 @@ import jsonschema
 import logging
 import six
 
+from collections import defaultdict, OrderedDict
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.core.cache import cache
@@ -13,7 +14,7 @@ from django.db.models import Func
 from django.utils import timezone
 from django.utils.encoding import force_text
 
-from sentry import buffer, eventtypes, eventstream, features, tagstore, tsdb
+from sentry import buffer, eventtypes, eventstream, features, options, tagstore, tsdb
 from sentry.constants import (
     DEFAULT_STORE_NORMALIZER_ARGS,
     LOG_LEVELS,
@@ -67,6 +68,7 @@ from sentry.plugins import plugins
 from sentry.signals import event_discarded, event_saved, first_event_received
 from sentry.tasks.integrations import kick_off_status_syncs
 from sentry.utils import metrics
+from sentry.utils.bloom import RedisBloomFilter
 from sentry.utils.canonical import CanonicalKeyDict
 from sentry.utils.data_filters import (
     is_valid_ip,
@@ -74,7 +76,7 @@ from sentry.utils.data_filters import (
     is_valid_error_message,
     FilterStatKeys,
 )
-from sentry.utils.dates import to_timestamp
+from sentry.utils.dates import to_datetime, to_timestamp
 from sentry.utils.db import is_postgres
 from sentry.utils.safe import safe_execute, trim, get_path, setdefault_path
 from sentry.stacktraces.processing import normalize_stacktraces_for_grouping
@@ -205,6 +207,236 @@ class HashDiscarded(Exception):
     pass
 
 
+_event_id_filter = None
+
+
+def get_event_id_filter():
+    global _event_id_filter
+    if _event_id_filter is None:
+        _event_id_filter = RedisBloomFilter("event-id", **settings.SENTRY_EVENT_ID_FILTER_OPTIONS)
+    return _event_id_filter
+
+
+def _check_event_id_filter(project, event_ids):
+    """
+    Looks up (and adds) ``event_ids`` in the event id filter. Returns the
+    set of ids that may have been seen before, or ``None`` if the filter is
+    not in use.
+    """
+    if not options.get("store.event-id-filter.write"):
+        return None
+
+    try:
+        seen = get_event_id_filter().check_and_add_many(
+            [u"{}:{}".format(project.id, event_id) for event_id in event_ids]
+        )
+    except Exception:
+        logger.exception("event-id-filter.failed")
+        return None
+
+    return set(event_id for event_id, maybe in zip(event_ids, seen) if maybe)
+
+
+def fetch_existing_events(project, event_ids):
+    """
+    Returns a mapping of event id to ``Event`` for those of ``event_ids``
+    that were already saved for ``project``.
+
+    Once the event id filter is trusted (``store.event-id-filter.read``),
+    only ids the filter may have seen before are looked up in the database.
+    """
+    event_ids = list(set(event_ids))
+    if not event_ids:
+        return {}
+
+    maybe_seen = _check_event_id_filter(project, event_ids)
+    if maybe_seen is not None and options.get("store.event-id-filter.read"):
+        lookup = maybe_seen
+    else:
+        lookup = event_ids
+
+    rv = {}
+    if lookup:
+        for event in Event.objects.filter(project_id=project.id, event_id__in=lookup):
+            event._project_cache = project
+            rv[event.event_id] = event
+
+    if maybe_seen is not None:
+        # the false positive rate is the ratio of false positives to all
+        # events that are not duplicates (false positives and negatives)
+        metrics.incr(
+            "events.id-filter.negative", len(event_ids) - len(maybe_seen), skip_internal=True
+        )
+        metrics.incr(
+            "events.id-filter.false-positive", len(maybe_seen.difference(rv)), skip_internal=True
+        )
+        # ids the filter missed, which were only found because they were
+        # looked up anyways. Expected while the filter is being populated.
+        metrics.incr(
+            "events.id-filter.false-negative",
+            len(set(rv).difference(maybe_seen)),
+            skip_internal=True,
+        )
+
+    return rv
+
+
+class EventBatch(object):
+    """
+    Shared state for saving many events of the same project in one go (see
+    ``EventManager.save_many``).
+
+    Lookups that would otherwise hit the database (or the shared cache) once
+    per event are resolved once per batch and memoized here, and counter
+    writes to TSDB and the buffer are merged in memory and only sent out
+    when ``flush`` is called.
+    """
+
+    def __init__(self, project):
+        self.project = project
+        self.existing_events = {}
+        self.releases = {}
+        self.environments = {}
+        self.grouphashes = {}
+        self.groups = {}
+        self.group_environments = {}
+        self.seen_instances = {}
+
+        self.tsdb_counters = defaultdict(lambda: defaultdict(int))
+        self.tsdb_frequencies = defaultdict(dict)
+        self.tsdb_distinct_counters = defaultdict(lambda: defaultdict(set))
+        self.buffer_increments = OrderedDict()
+
+        # TSDB only stores data at rollup granularity, so all timestamps that
+        # fall into the same bucket of the smallest rollup can share a write.
+        self.tsdb_resolution = min(tsdb.get_rollups() or [1])
+
+    def fetch_existing_events(self, event_ids):
+        self.existing_events.update(fetch_existing_events(self.project, event_ids))
+
+    def fetch_grouphashes(self, hashes):
+        hashes = set(hashes) - set(self.grouphashes)
+        if not hashes:
+            return
+
+        for grouphash in GroupHash.objects.filter(project=self.project, hash__in=hashes):
+            self.grouphashes[grouphash.hash] = grouphash
+
+    def get_release(self, version, date):
+        release = self.releases.get(version)
+        if release is None:
+            release = self.releases[version] = Release.get_or_create(
+                project=self.project, version=version, date_added=date
+            )
+        return release
+
+    def get_environment(self, name):
+        environment = self.environments.get(name)
+        if environment is None:
+            environment = self.environments[name] = Environment.get_or_create(
+                project=self.project, name=name
+            )
+        return environment
+
+    def get_group(self, group_id):
+        group = self.groups.get(group_id)
+        if group is None:
+            group = self.groups[group_id] = Group.objects.get(id=group_id)
+        return group
+
+    def get_group_environment(self, group, environment, release):
+        key = (group.id, environment.id)
+        if key in self.group_environments:
+            return self.group_environments[key], False
+
+        group_environment, is_new = GroupEnvironment.get_or_create(
+            group_id=group.id,
+            environment_id=environment.id,
+            defaults={"first_release": release if release else None},
+        )
+        self.group_environments[key] = group_environment
+        return group_environment, is_new
+
+    def get_or_create_seen(self, cls, key, datetime, **kwargs):
+        """
+        Memoizes ``get_or_create`` for models that track ``last_seen``
+        (``ReleaseEnvironment`` and friends). The model is consulted again
+        only if its own once-a-minute ``last_seen`` update would trigger.
+        """
+        instance = self.seen_instances.get((cls, key))
+        if instance is None or instance.last_seen < datetime - timedelta(seconds=60):
+            instance = self.seen_instances[(cls, key)] = cls.get_or_create(
+                datetime=datetime, **kwargs
+            )
+        return instance
+
+    def _get_tsdb_bucket(self, timestamp):
+        return tsdb.normalize_to_epoch(timestamp, self.tsdb_resolution)
+
+    def incr_multi(self, items, timestamp, environment_id=None):
+        counters = self.tsdb_counters[(self._get_tsdb_bucket(timestamp), environment_id)]
+        for item in items:
+            counters[item] += 1
+
+    def record_multi(self, items, timestamp, environment_id=None):
+        counters = self.tsdb_distinct_counters[(self._get_tsdb_bucket(timestamp), environment_id)]
+        for model, key, values in items:
+            counters[(model, key)].update(values)
+
+    def record_frequency_multi(self, requests, timestamp):
+        frequencies = self.tsdb_frequencies[self._get_tsdb_bucket(timestamp)]
+        for model, request in requests:
+            for key, items in six.iteritems(request):
+                counts = frequencies.setdefault((model, key), defaultdict(int))
+                for item, count in six.iteritems(items):
+                    counts[item] += count
+
+    def buffer_incr(self, model, columns, filters, extra=None):
+        key = (model, tuple(sorted(filters.items())))
+        pending = self.buffer_increments.get(key)
+        if pending is None:
+            pending = self.buffer_increments[key] = (defaultdict(int), dict(filters), {})
+
+        pending_columns, _, pending_extra = pending
+        for column, amount in six.iteritems(columns):
+            pending_columns[column] += amount
+        # Later values win, the same way they would when written to the
+        # buffer one after the other.
+        if extra:
+            pending_extra.update(extra)
+
+    def flush(self):
+        for (bucket, environment_id), counters in six.iteritems(self.tsdb_counters):
+            items_by_count = defaultdict(list)
+            for item, count in six.iteritems(counters):
+                items_by_count[count].append(item)
+            for count, items in six.iteritems(items_by_count):
+                tsdb.incr_multi(
+                    items, timestamp=to_datetime(bucket), count=count, environment_id=environment_id
+                )
+
+        for bucket, frequencies in six.iteritems(self.tsdb_frequencies):
+            requests = defaultdict(dict)
+            for (model, key), counts in six.iteritems(frequencies):
+                requests[model][key] = dict(counts)
+            tsdb.record_frequency_multi(list(requests.items()), timestamp=to_datetime(bucket))
+
+        for (bucket, environment_id), counters in six.iteritems(self.tsdb_distinct_counters):
+            tsdb.record_multi(
+                [(model, key, values) for (model, key), values in six.iteritems(counters)],
+                timestamp=to_datetime(bucket),
+                environment_id=environment_id,
+            )
+
+        for (model, _), (columns, filters, extra) in six.iteritems(self.buffer_increments):
+            buffer.incr(model, dict(columns), filters, extra or None)
+
+        self.tsdb_counters.clear()
+        self.tsdb_frequencies.clear()
+        self.tsdb_distinct_counters.clear()
+        self.buffer_increments.clear()
+
+
 class ScoreClause(Func):
     def __init__(self, group=None, last_seen=None, times_seen=None, *args, **kwargs):
         self.group = group
@@ -497,6 +729,99 @@ class EventManager(object):
 
         return trim(message.strip(), settings.SENTRY_MAX_MESSAGE_LENGTH)
 
+    @classmethod
+    def save_many(cls, project_id, events, raw=False, assume_normalized=False):
+        """
+        Saves a batch of events that all belong to the same project.
+
+        This behaves like calling ``save`` for every event in order, but
+        duplicate checks, release/environment resolution and grouphash
+        lookups are done in bulk, and TSDB and buffer writes are merged and
+        sent out once for the whole batch.
+
+        Returns a list with the saved event for every payload in ``events``,
+        ``None`` for events that were discarded (see ``HashDiscarded``), or
+        the exception that was raised while saving an event.  A failing event
+        doesn't keep the rest of the batch from being saved; only failures
+        that affect the whole batch (e.g. the bulk lookups) are raised.
+        """
+        managers = [cls(data) for data in events]
+
+        project = Project.objects.get_from_cache(id=project_id)
+        project._organization_cache = Organization.objects.get_from_cache(
+            id=project.organization_id
+        )
+
+        batch = EventBatch(project)
+        rv = [None] * len(managers)
+        jobs = []
+        seen_event_ids = {}
+        duplicates = []
+
+        def failed(idx, error):
+            logger.error(
+                "save_many.event.failed",
+                exc_info=True,
+                extra={"event_uuid": managers[idx]._data.get("event_id"), "project_id": project_id},
+            )
+            rv[idx] = error
+
+        try:
+            pending = []
+            for idx, manager in enumerate(managers):
+                try:
+                    if not manager._normalized:
+                        if not assume_normalized:
+                            manager.normalize()
+                        manager._normalized = True
+                except Exception as e:
+                    failed(idx, e)
+                else:
+                    pending.append((idx, manager))
+            batch.fetch_existing_events(manager._data["event_id"] for _, manager in pending)
+
+            for idx, manager in pending:
+                event_id = manager._data["event_id"]
+                if event_id in seen_event_ids:
+                    duplicates.append((idx, seen_event_ids[event_id]))
+                    continue
+                seen_event_ids[event_id] = idx
+
+                try:
+                    job = manager._pre_save(project, batch=batch)
+                except Exception as e:
+                    failed(idx, e)
+                    continue
+                if isinstance(job, Event):
+                    rv[idx] = job
+                else:
+                    jobs.append((idx, manager, job))
+
+            batch.fetch_grouphashes(
+                hash for _, _, job in jobs if not job["issueless_event"] for hash in job["hashes"]
+            )
+
+            for idx, manager, job in jobs:
+                try:
+                    rv[idx] = manager._post_save(job, raw=raw, batch=batch)
+                except HashDiscarded:
+                    rv[idx] = None
+                except Exception as e:
+                    failed(idx, e)
+        finally:
+            batch.flush()
+
+        # Events that were sent more than once within the batch resolve to
+        # whatever the first occurrence was saved as.
+        for idx, original_idx in duplicates:
+            rv[idx] = rv[original_idx]
+
+        metrics.timing(
+            "events.save_many.batch_size", len(managers), tags={"project_id": project_id}
+        )
+
+        return rv
+
     def save(self, project_id, raw=False, assume_normalized=False):
         # Normalize if needed
         if not self._normalized:
@@ -504,23 +829,35 @@ class EventManager(object):
                 self.normalize()
             self._normalized = True
 
-        data = self._data
-
         project = Project.objects.get_from_cache(id=project_id)
         project._organization_cache = Organization.objects.get_from_cache(
             id=project.organization_id
         )
 
+        job = self._pre_save(project)
+        if isinstance(job, Event):
+            return job
+        return self._post_save(job, raw=raw)
+
+    def _pre_save(self, project, batch=None):
+        """
+        Runs everything up to and including hash calculation.  Returns the
+        already existing event if this event is a duplicate, otherwise the
+        state needed to continue saving in ``_post_save``.
+        """
+        data = self._data
+
         # Check to make sure we're not about to do a bunch of work that's
         # already been done if we've processed an event with this ID. (This
         # isn't a perfect solution -- this doesn't handle ``EventMapping`` and
         # there's a race condition between here and when the event is actually
         # saved, but it's an improvement. See GH-7677.)
-        try:
-            event = Event.objects.get(project_id=project.id, event_id=data["event_id"])
-        except Event.DoesNotExist:
-            pass
+        if batch is not None:
+            event = batch.existing_events.get(data["event_id"])
         else:
+            event = fetch_existing_events(project, [data["event_id"]]).get(data["event_id"])
+
+        if event is not None:
             # Make sure we cache on the project before returning
             event._project_cache = project
             logger.info(
@@ -556,14 +893,12 @@ class EventManager(object):
 
         # We need to swap out the data with the one internal to the newly
         # created event object
-        event = self._get_event_instance(project_id=project_id)
+        event = self._get_event_instance(project_id=project.id)
         self._data = data = event.data.data
 
         event._project_cache = project
 
         date = event.datetime
-        platform = event.platform
-        event_id = event.event_id
 
         if transaction_name:
             transaction_name = force_text(transaction_name)
@@ -591,7 +926,10 @@ class EventManager(object):
         if release:
             # dont allow a conflicting 'release' tag
             pop_tag(data, "release")
-            release = Release.get_or_create(project=project, version=release, date_added=date)
+            if batch is not None:
+                release = batch.get_release(release, date)
+            else:
+                release = Release.get_or_create(project=project, version=release, date_added=date)
             set_tag(data, "sentry:release", release.version)
 
         if dist and release:
@@ -649,6 +987,49 @@ class EventManager(object):
 
         data["hashes"] = hashes
 
+        return {
+            "project": project,
+            "event": event,
+            "culprit": culprit,
+            "level": level,
+            "logger_name": logger_name,
+            "release": release,
+            "environment": environment,
+            "recorded_timestamp": recorded_timestamp,
+            "issueless_event": issueless_event,
+            "event_user": event_user,
+            "hashes": hashes,
+        }
+
+    def _post_save(self, job, raw=False, batch=None):
+        """
+        Stores the event prepared by ``_pre_save``: updates (or creates) the
+        group, records counters and stores the event itself.
+        """
+        data = self._data
+        project = job["project"]
+        event = job["event"]
+        culprit = job["culprit"]
+        level = job["level"]
+        logger_name = job["logger_name"]
+        release = job["release"]
+        environment = job["environment"]
+        recorded_timestamp = job["recorded_timestamp"]
+        issueless_event = job["issueless_event"]
+        event_user = job["event_user"]
+        hashes = job["hashes"]
+
+        date = event.datetime
+        platform = event.platform
+        event_id = event.event_id
+
+        if batch is not None:
+            tsdb_client = batch
+            buffer_incr = batch.buffer_incr
+        else:
+            tsdb_client = tsdb
+            buffer_incr = buffer.incr
+
         # we want to freeze not just the metadata and type in but also the
         # derived attributes.  The reason for this is that we push this
         # data into kafka for snuba processing and our postprocessing
@@ -688,7 +1069,7 @@ class EventManager(object):
 
             try:
                 group, is_new, is_regression, is_sample = self._save_aggregate(
-                    event=event, hashes=hashes, release=release, **kwargs
+                    event=event, hashes=hashes, release=release, batch=batch, **kwargs
                 )
             except HashDiscarded:
                 event_discarded.send_robust(project=project, sender=EventManager)
@@ -712,31 +1093,68 @@ class EventManager(object):
         # store a reference to the group id to guarantee validation of isolation
         event.data.bind_ref(event)
 
-        environment = Environment.get_or_create(project=project, name=environment)
+        if batch is not None:
+            environment = batch.get_environment(environment)
+        else:
+            environment = Environment.get_or_create(project=project, name=environment)
 
         if group:
-            group_environment, is_new_group_environment = GroupEnvironment.get_or_create(
-                group_id=group.id,
-                environment_id=environment.id,
-                defaults={"first_release": release if release else None},
-            )
+            if batch is not None:
+                group_environment, is_new_group_environment = batch.get_group_environment(
+                    group, environment, release
+                )
+            else:
+                group_environment, is_new_group_environment = GroupEnvironment.get_or_create(
+                    group_id=group.id,
+                    environment_id=environment.id,
+                    defaults={"first_release": release if release else None},
+                )
         else:
             is_new_group_environment = False
 
         if release:
-            ReleaseEnvironment.get_or_create(
-                project=project, release=release, environment=environment, datetime=date
-            )
+            if batch is not None:
+                batch.get_or_create_seen(
+                    ReleaseEnvironment,
+                    (release.id, environment.id),
+                    project=project,
+                    release=release,
+                    environment=environment,
+                    datetime=date,
+                )
 
-            ReleaseProjectEnvironment.get_or_create(
-                project=project, release=release, environment=environment, datetime=date
-            )
+                batch.get_or_create_seen(
+                    ReleaseProjectEnvironment,
+                    (release.id, environment.id),
+                    project=project,
+                    release=release,
+                    environment=environment,
+                    datetime=date,
+                )
 
-            if group:
-                grouprelease = GroupRelease.get_or_create(
-                    group=group, release=release, environment=environment, datetime=date
+                if group:
+                    grouprelease = batch.get_or_create_seen(
+                        GroupRelease,
+                        (group.id, release.id, environment.id),
+                        group=group,
+                        release=release,
+                        environment=environment,
+                        datetime=date,
+                    )
+            else:
+                ReleaseEnvironment.get_or_create(
+                    project=project, release=release, environment=environment, datetime=date
+                )
+
+                ReleaseProjectEnvironment.get_or_create(
+                    project=project, release=release, environment=environment, datetime=date
                 )
 
+                if group:
+                    grouprelease = GroupRelease.get_or_create(
+                        group=group, release=release, environment=environment, datetime=date
+                    )
+
         counters = [(tsdb.models.project, project.id)]
 
         if group:
@@ -745,7 +1163,7 @@ class EventManager(object):
         if release:
             counters.append((tsdb.models.release, release.id))
 
-        tsdb.incr_multi(counters, timestamp=event.datetime, environment_id=environment.id)
+        tsdb_client.incr_multi(counters, timestamp=event.datetime, environment_id=environment.id)
 
         frequencies = [
             # (tsdb.models.frequent_projects_by_organization, {
@@ -770,7 +1188,7 @@ class EventManager(object):
                     (tsdb.models.frequent_releases_by_group, {group.id: {grouprelease.id: 1}})
                 )
         if frequencies:
-            tsdb.record_frequency_multi(frequencies, timestamp=event.datetime)
+            tsdb_client.record_frequency_multi(frequencies, timestamp=event.datetime)
 
         if group:
             UserReport.objects.filter(project=project, event_id=event_id).update(
@@ -815,17 +1233,19 @@ class EventManager(object):
                     (tsdb.models.users_affected_by_group, group.id, (event_user.tag_value,))
                 )
 
-            tsdb.record_multi(counters, timestamp=event.datetime, environment_id=environment.id)
+            tsdb_client.record_multi(
+                counters, timestamp=event.datetime, environment_id=environment.id
+            )
 
         if release:
             if is_new:
-                buffer.incr(
+                buffer_incr(
                     ReleaseProject,
                     {"new_groups": 1},
                     {"release_id": release.id, "project_id": project.id},
                 )
             if is_new_group_environment:
-                buffer.incr(
+                buffer_incr(
                     ReleaseProjectEnvironment,
                     {"new_issues_count": 1},
                     {
@@ -911,16 +1331,28 @@ class EventManager(object):
                 cache.set(cache_key, e_userid, 3600)
         return euser
 
-    def _find_hashes(self, project, hash_list):
-        return map(
-            lambda hash: GroupHash.objects.get_or_create(project=project, hash=hash)[0], hash_list
-        )
+    def _find_hashes(self, project, hash_list, batch=None):
+        if batch is None:
+            return map(
+                lambda hash: GroupHash.objects.get_or_create(project=project, hash=hash)[0],
+                hash_list,
+            )
 
-    def _save_aggregate(self, event, hashes, release, **kwargs):
+        rv = []
+        for hash in hash_list:
+            grouphash = batch.grouphashes.get(hash)
+            if grouphash is None:
+                grouphash = batch.grouphashes[hash] = GroupHash.objects.get_or_create(
+                    project=project, hash=hash
+                )[0]
+            rv.append(grouphash)
+        return rv
+
+    def _save_aggregate(self, event, hashes, release, batch=None, **kwargs):
         project = event.project
 
         # attempt to find a matching hash
-        all_hashes = self._find_hashes(project, hashes)
+        all_hashes = self._find_hashes(project, hashes, batch=batch)
 
         existing_group_id = None
         for h in all_hashes:
@@ -960,7 +1392,10 @@ class EventManager(object):
             )
 
         else:
-            group = Group.objects.get(id=existing_group_id)
+            if batch is not None:
+                group = batch.get_group(existing_group_id)
+            else:
+                group = Group.objects.get(id=existing_group_id)
 
             group_is_new = False
 
@@ -984,6 +1419,14 @@ class EventManager(object):
             if group_is_new and len(new_hashes) == len(all_hashes):
                 is_new = True
 
+            if batch is not None:
+                # Keep the grouphashes memoized for the batch in sync so that
+                # later events of the batch find this group.
+                for h in new_hashes:
+                    if h.state != GroupHash.State.LOCKED_IN_MIGRATION:
+                        h.group_id = group.id
+                batch.groups[group.id] = group
+
         # XXX(dcramer): it's important this gets called **before** the aggregate
         # is processed as otherwise values like last_seen will get mutated
         can_sample = features.has("projects:sample-events", project=project) and should_sample(
@@ -994,7 +1437,7 @@ class EventManager(object):
 
         if not is_new:
             is_regression = self._process_existing_aggregate(
-                group=group, event=event, data=kwargs, release=release
+                group=group, event=event, data=kwargs, release=release, batch=batch
             )
         else:
             is_regression = False
@@ -1091,9 +1534,11 @@ class EventManager(object):
 
         return is_regression
 
-    def _process_existing_aggregate(self, group, event, data, release):
+    def _process_existing_aggregate(self, group, event, data, release, batch=None):
         date = max(event.datetime, group.last_seen)
-        extra = {"last_seen": date, "score": ScoreClause(group), "data": data["data"]}
+        # ``score`` isn't buffered, ``Buffer.process`` derives it from ``times_seen`` and
+        # ``last_seen`` when the increment is flushed
+        extra = {"last_seen": date, "data": data["data"]}
         if event.message and event.message != group.message:
             extra["message"] = event.message
         if group.level != data["level"]:
@@ -1107,6 +1552,9 @@ class EventManager(object):
 
         update_kwargs = {"times_seen": 1}
 
-        buffer.incr(Group, update_kwargs, {"id": group.id}, extra)
+        if batch is not None:
+            batch.buffer_incr(Group, update_kwargs, {"id": group.id}, extra)
+        else:
+            buffer.incr(Group, update_kwargs, {"id": group.id}, extra)
 
         return is_regression
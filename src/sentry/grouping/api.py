@@ -18,10 +18,17 @@ from sentry.grouping.utils import (
     hash_from_values,
     resolve_fingerprint_values,
 )
+from sentry.utils.cache import LocalCache
 
 
 HASH_RE = re.compile(r"^[0-9a-f]{32}$")
 
+# Decoded grouping configs and fingerprinting rules, keyed by their serialized
+# form.  The values are shared between all events of the process and must not
+# be modified.
+_grouping_configs = LocalCache("grouping-configs", max_size=500)
+_fingerprinting_rules = LocalCache("fingerprinting-rules", max_size=500)
+
 
 class GroupingConfigNotFound(LookupError):
     pass
@@ -89,7 +96,9 @@ def get_default_grouping_config_dict(id=None):
 
 
 def load_grouping_config(config_dict=None):
-    """Loads the given grouping config."""
+    """Loads the given grouping config.  Configs are shared per process, so
+    the returned config must not be modified.
+    """
     if config_dict is None:
         config_dict = get_default_grouping_config_dict()
     elif "id" not in config_dict:
@@ -98,7 +107,14 @@ def load_grouping_config(config_dict=None):
     config_id = config_dict.pop("id")
     if config_id not in CONFIGURATIONS:
         raise GroupingConfigNotFound(config_id)
-    return CONFIGURATIONS[config_id](**config_dict)
+
+    # the enhancements are the only setting strategy configurations consider
+    cache_key = (config_id, config_dict.get("enhancements"))
+    rv = _grouping_configs.get(cache_key)
+    if rv is None:
+        rv = CONFIGURATIONS[config_id](**config_dict)
+        _grouping_configs.set(cache_key, rv)
+    return rv
 
 
 def load_default_grouping_config():
@@ -116,15 +132,20 @@ def get_fingerprinting_config_for_project(project):
     from sentry.utils.hashlib import md5_text
 
     cache_key = "fingerprinting-rules:" + md5_text(rules).hexdigest()
-    rv = cache.get(cache_key)
+    rv = _fingerprinting_rules.get(cache_key)
     if rv is not None:
-        return FingerprintingRules.from_json(rv)
+        return rv
 
-    try:
-        rv = FingerprintingRules.from_config_string(rules)
-    except InvalidFingerprintingConfig:
-        rv = FingerprintingRules([])
-    cache.set(cache_key, rv.to_json())
+    value = cache.get(cache_key)
+    if value is not None:
+        rv = FingerprintingRules.from_json(value)
+    else:
+        try:
+            rv = FingerprintingRules.from_config_string(rules)
+        except InvalidFingerprintingConfig:
+            rv = FingerprintingRules([])
+        cache.set(cache_key, rv.to_json())
+    _fingerprinting_rules.set(cache_key, rv)
     return rv
 
 
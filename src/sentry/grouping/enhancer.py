@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import os
+import re
 import six
 import base64
 import msgpack
@@ -15,8 +16,9 @@ from sentry.stacktraces.functions import set_in_app
 from sentry.stacktraces.platform import get_behavior_family_for_platform
 from sentry.grouping.component import GroupingComponent
 from sentry.grouping.utils import get_rule_bool
+from sentry.utils.cache import LocalCache, memoize
 from sentry.utils.compat import implements_to_string
-from sentry.utils.glob import glob_match
+from sentry.utils.glob import compile_glob, glob_match
 from sentry.utils.safe import get_path
 
 
@@ -86,6 +88,9 @@ ACTION_FLAGS = {
 }
 REVERSE_ACTION_FLAGS = dict((v, k) for k, v in six.iteritems(ACTION_FLAGS))
 
+# Compiled enhancements are shared by all configs with the same rules.
+_compiled_enhancements = LocalCache("grouping-enhancements", max_size=100, ttl=3600)
+
 
 class InvalidEnhancerConfig(Exception):
     pass
@@ -302,26 +307,32 @@ class Enhancements(object):
             bases = []
         self.bases = bases
 
+    @memoize
+    def compiled(self):
+        """The rules of this config and its bases in their compiled form."""
+        key = self.dumps()
+        rv = _compiled_enhancements.get(key)
+        if rv is None:
+            rv = CompiledEnhancements(list(self.iter_rules()))
+            _compiled_enhancements.set(key, rv)
+        return rv
+
     def apply_modifications_to_frame(self, frames, platform):
         """This applies the frame modifications to the frames itself.  This
         does not affect grouping.
         """
-        for rule in self.iter_rules():
-            for idx, frame in enumerate(frames):
-                actions = rule.get_matching_frame_actions(frame, platform)
-                for action in actions or ():
-                    action.apply_modifications_to_frame(frames, idx)
+        for rule, idx in self.compiled.iter_matches(frames, platform):
+            for action in rule.actions:
+                action.apply_modifications_to_frame(frames, idx)
 
     def update_frame_components_contributions(self, components, frames, platform):
         stacktrace_state = StacktraceState()
 
         # Apply direct frame actions and update the stack state alongside
-        for rule in self.iter_rules():
-            for idx, (component, frame) in enumerate(izip(components, frames)):
-                actions = rule.get_matching_frame_actions(frame, platform)
-                for action in actions or ():
-                    action.update_frame_components_contributions(components, frames, idx, rule=rule)
-                    action.modify_stacktrace_state(stacktrace_state, rule)
+        for rule, idx in self.compiled.iter_matches(frames[: len(components)], platform):
+            for action in rule.actions:
+                action.update_frame_components_contributions(components, frames, idx, rule=rule)
+                action.modify_stacktrace_state(stacktrace_state, rule)
 
         # Use the stack state to update frame contributions again to trim
         # down to max-frames.  min-frames is handled on the other hand for
@@ -475,6 +486,122 @@ class Rule(object):
         )
 
 
+class CompiledEnhancements(object):
+    """Matches a list of rules against frames.
+
+    All glob patterns of the rules are compiled once and, per match key, also
+    combined into a single regular expression, so that frames which don't
+    match any pattern of a key are rejected with one regex search.  The
+    values the patterns are matched against (paths, function names etc.) are
+    only extracted once per frame instead of once per rule.
+
+    ``app`` matchers are not precomputed since the ``in_app`` flag of frames
+    is changed by earlier rules while applying modifications.
+    """
+
+    # match keys whose patterns are (case insensitive) path globs
+    PATH_KEYS = ("path", "package")
+
+    def __init__(self, rules):
+        self.rules = []
+        self.patterns = {}
+        self.families = []
+        matchers = {}
+
+        for rule in rules:
+            if not rule.matchers:
+                continue
+            static = set()
+            app_values = []
+            for match in rule.matchers:
+                if match.key == "app":
+                    app_values.append(get_rule_bool(match.pattern))
+                    continue
+                index = matchers.get((match.key, match.pattern))
+                if index is None:
+                    index = matchers[match.key, match.pattern] = len(matchers)
+                    if match.key == "family":
+                        self.families.append((index, frozenset(match.pattern.split(","))))
+                    else:
+                        self.patterns.setdefault(match.key, []).append(
+                            (index, self._compile(match.key, match.pattern))
+                        )
+                static.add(index)
+            self.rules.append((rule, frozenset(static), app_values))
+
+        self.combined = {}
+        for key, patterns in six.iteritems(self.patterns):
+            # the patterns end in `\Z(?ms)` where the flags apply to the
+            # entire expression, hence they are moved to the front
+            self.combined[key] = re.compile(
+                "(?ms)"
+                + "|".join("(?:%s)" % regex.pattern[: -len("(?ms)")] for _, regex in patterns)
+            )
+
+    def _compile(self, key, pattern):
+        if key in self.PATH_KEYS:
+            return compile_glob(pattern, ignorecase=True, doublestar=True, path_normalize=True)
+        return compile_glob(pattern)
+
+    def _get_values(self, key, frame, platform):
+        # Mirrors the value extraction in `Match.matches_frame`
+        if key in self.PATH_KEYS:
+            if key == "package":
+                value = frame.get("package") or ""
+            else:
+                value = frame.get("abs_path") or frame.get("filename") or ""
+            rv = [value.lower().replace("\\", "/")]
+            if not value.startswith("/"):
+                rv.append("/" + rv[0])
+            return rv
+
+        if key == "function":
+            from sentry.stacktraces.functions import get_function_name_for_frame
+
+            return [get_function_name_for_frame(frame, platform) or "<unknown>"]
+        if key == "module":
+            return [frame.get("module") or "<unknown>"]
+        return ["<unknown>"]
+
+    def get_matching_indexes(self, frame, platform):
+        """Returns the set of all (non ``app``) matchers matching the frame."""
+        rv = set()
+
+        if self.families:
+            family = get_behavior_family_for_platform(frame.get("platform") or platform)
+            for index, flags in self.families:
+                if "all" in flags or family in flags:
+                    rv.add(index)
+
+        for key, patterns in six.iteritems(self.patterns):
+            values = self._get_values(key, frame, platform)
+            combined = self.combined[key]
+            if not any(combined.match(value) is not None for value in values):
+                continue
+            for index, regex in patterns:
+                if any(regex.match(value) is not None for value in values):
+                    rv.add(index)
+
+        return rv
+
+    def iter_matches(self, frames, platform):
+        """Yields ``(rule, idx)`` for every rule and every frame it matches in
+        the same order as checking every rule against every frame would.
+        """
+        candidates = [[] for _ in self.rules]
+        for idx, frame in enumerate(frames):
+            indexes = self.get_matching_indexes(frame, platform)
+            for rule_idx, (_, static, _) in enumerate(self.rules):
+                if static <= indexes:
+                    candidates[rule_idx].append(idx)
+
+        for (rule, _, app_values), frame_indexes in izip(self.rules, candidates):
+            for idx in frame_indexes:
+                in_app = frames[idx].get("in_app")
+                if all(value is not None and value == in_app for value in app_values):
+                    yield rule, idx
+
+
 class EnhancmentsVisitor(NodeVisitor):
     visit_comment = visit_empty = lambda *a: None
 
@@ -1,11 +1,36 @@
 from __future__ import absolute_import, print_function
 
+import hashlib
+
+from django.conf import settings
 from six import text_type
 from symbolic import SourceView
+from sentry.utils.cache import LocalCache
 from sentry.utils.strings import codec_lookup
 
 __all__ = ["SourceCache", "SourceMapCache"]
 
+# Parsed source and sourcemap views, shared by all events processed in this
+# process.  Views are keyed by the checksum of the file they were parsed
+# from, so a burst of events for the same release parses every file only
+# once.  The cache is bounded by the size of the parsed files.
+_view_cache = LocalCache(
+    "javascript-views", max_size=10000, ttl=60 * 60, max_weight=settings.SENTRY_JS_VIEW_CACHE_SIZE
+)
+
+
+def get_view(kind, body, parse):
+    """
+    Returns the view ``parse(body)``, reusing a view that was parsed from the
+    same contents before if there is one.
+    """
+    key = (kind, hashlib.sha1(body).hexdigest())
+    view = _view_cache.get(key)
+    if view is None:
+        view = parse(body)
+        _view_cache.set(key, view, weight=len(body))
+    return view
+
 
 def is_utf8(codec):
     name = codec_lookup(codec).name
@@ -52,7 +77,7 @@ class SourceCache(object):
                     source = source.decode(encoding).encode("utf-8")
                 except UnicodeError:
                     pass
-            source = SourceView.from_bytes(source)
+            source = get_view("source", source, SourceView.from_bytes)
         self._cache[url] = source
 
     def add_error(self, url, error):
@@ -9,11 +9,15 @@ import base64
 import six
 import zlib
 
+from collections import OrderedDict
 from django.conf import settings
+from django.db import connection
+from functools import partial
 from os.path import splitext
 from requests.utils import get_encoding_from_headers
 from six.moves.urllib.parse import urljoin, urlsplit
 from symbolic import SourceMapView
+from time import time
 
 # In case SSL is unavailable (light builds) we can't import this here.
 try:
@@ -26,16 +30,16 @@ except ImportError:
 
 from sentry import http
 from sentry.interfaces.stacktrace import Stacktrace
-from sentry.models import EventError, ReleaseFile, Organization
+from sentry.models import EventError, File, ReleaseFile, Organization
 from sentry.utils.cache import cache
-from sentry.utils.files import compress_file
+from sentry.utils.concurrent import SynchronousExecutor, ThreadedExecutor
 from sentry.utils.hashlib import md5_text
 from sentry.utils.http import is_valid_origin
 from sentry.utils.safe import get_path
 from sentry.utils import metrics
 from sentry.stacktraces.processing import StacktraceProcessor
 
-from .cache import SourceCache, SourceMapCache
+from .cache import SourceCache, SourceMapCache, get_view
 
 # number of surrounding lines (on each side) to fetch
 LINES_OF_CONTEXT = 5
@@ -65,6 +69,19 @@ CACHE_CONTROL_MIN = 60
 # the maximum number of remote resources (i.e. source files) that should be
 # fetched
 MAX_RESOURCE_FETCHES = 100
+FRAME_CACHE_VERSION = 1
+FRAME_CACHE_KEYS = (
+    "abs_path",
+    "filename",
+    "lineno",
+    "colno",
+    "function",
+    "module",
+    "in_app",
+    "context_line",
+    "pre_context",
+    "post_context",
+)
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +90,48 @@ class UnparseableSourcemap(http.BadSource):
     error_type = EventError.JS_INVALID_SOURCEMAP
 
 
+_fetch_executor = None
+
+
+def get_fetch_executor():
+    global _fetch_executor
+    if _fetch_executor is None:
+        if settings.SENTRY_SOURCE_FETCH_CONCURRENCY > 1:
+            _fetch_executor = ThreadedExecutor(
+                worker_count=settings.SENTRY_SOURCE_FETCH_CONCURRENCY
+            )
+        else:
+            _fetch_executor = SynchronousExecutor()
+    return _fetch_executor
+
+
+def submit_fetch(type, fetch):
+    """
+    Runs ``fetch`` in the fetch pool and returns a future for its result.
+    The duration of every fetch is recorded, tagged with ``type``.
+    """
+    executor = get_fetch_executor()
+    threaded = isinstance(executor, ThreadedExecutor)
+
+    def run():
+        start = time()
+        try:
+            return fetch()
+        finally:
+            if threaded:
+                # pool threads get their own database connection, don't keep
+                # it open (and idle) once the fetch is done
+                connection.close()
+            metrics.timing(
+                "sourcemaps.fetch.duration",
+                time() - start,
+                tags={"type": type, "threaded": threaded},
+                skip_internal=True,
+            )
+
+    return executor.submit(run)
+
+
 def trim_line(line, column=0):
     """
     Trims a line down to a goal of 140 characters, with a little
@@ -200,83 +259,160 @@ def discover_sourcemap(result):
     return sourcemap
 
 
-def fetch_release_file(filename, release, dist=None):
-    cache_key = "releasefile:v1:%s:%s" % (release.id, md5_text(filename).hexdigest())
+def get_release_file_cache_key(filename, release):
+    return "releasefile:v2:%s:%s" % (release.id, md5_text(filename).hexdigest())
 
-    logger.debug("Checking cache for release artifact %r (release_id=%s)", filename, release.id)
-    result = cache.get(cache_key)
 
-    dist_name = dist and dist.name or None
+def _read_mapped(mapped):
+    # copies the contents of a memory map from the release file cache
+    if mapped is None or isinstance(mapped, six.binary_type):
+        return mapped
+    try:
+        return mapped[:]
+    finally:
+        mapped.close()
 
-    if result is None:
-        filename_choices = ReleaseFile.normalize(filename)
-        filename_idents = [ReleaseFile.get_ident(f, dist_name) for f in filename_choices]
 
-        logger.debug(
-            "Checking database for release artifact %r (release_id=%s)", filename, release.id
-        )
+def lookup_release_files(filenames, release, dist=None):
+    """
+    Resolves the release artifacts for many files at once, with a single
+    cache lookup and at most one database query.
 
-        possible_files = list(
-            ReleaseFile.objects.filter(
-                release=release, dist=dist, ident__in=filename_idents
-            ).select_related("file")
-        )
+    Returns a dictionary that maps every filename to either a ``UrlResult``
+    (if the artifact was cached), the ``File`` of the artifact (which still
+    needs to be read with ``read_release_file``) or ``None`` if the release
+    doesn't have an artifact for the file.  Misses are cached for a minute.
+    """
+    cache_keys = {filename: get_release_file_cache_key(filename, release) for filename in filenames}
+
+    logger.debug(
+        "Checking cache for %d release artifacts (release_id=%s)", len(cache_keys), release.id
+    )
+    cached = cache.get_many(list(cache_keys.values()))
+
+    rv = {}
+    missing = []
+    uncached_files = {}
+    for filename, cache_key in six.iteritems(cache_keys):
+        result = cached.get(cache_key)
+        if result is None:
+            missing.append(filename)
+        elif result == -1:
+            # We cached an error, so normalize
+            # it down to None
+            rv[filename] = None
+        else:
+            headers, encoding, file_id, checksum = result
+            body = _read_mapped(ReleaseFile.cache.get(checksum))
+            if body is None:
+                # the artifact was read on another host
+                uncached_files[filename] = file_id
+            else:
+                rv[filename] = http.UrlResult(filename, headers, body, 200, encoding)
+
+    if uncached_files:
+        files = File.objects.in_bulk(set(uncached_files.values()))
+        for filename, file_id in six.iteritems(uncached_files):
+            rv[filename] = files.get(file_id)
 
-        if len(possible_files) == 0:
+    if not missing:
+        return rv
+
+    dist_name = dist and dist.name or None
+    filename_idents = {
+        filename: [ReleaseFile.get_ident(f, dist_name) for f in ReleaseFile.normalize(filename)]
+        for filename in missing
+    }
+
+    logger.debug(
+        "Checking database for %d release artifacts (release_id=%s)", len(missing), release.id
+    )
+
+    possible_files = {
+        releasefile.ident: releasefile
+        for releasefile in ReleaseFile.objects.filter(
+            release=release,
+            dist=dist,
+            ident__in=set(ident for idents in filename_idents.values() for ident in idents),
+        ).select_related("file")
+    }
+
+    misses = {}
+    for filename in missing:
+        # Pick first one that matches in priority order.
+        releasefile = next(
+            (possible_files[i] for i in filename_idents[filename] if i in possible_files), None
+        )
+        if releasefile is None:
             logger.debug(
                 "Release artifact %r not found in database (release_id=%s)", filename, release.id
             )
-            cache.set(cache_key, -1, 60)
-            return None
-        elif len(possible_files) == 1:
-            releasefile = possible_files[0]
+            misses[cache_keys[filename]] = -1
+            rv[filename] = None
         else:
-            # Pick first one that matches in priority order.
-            # This is O(N*M) but there are only ever at most 4 things here
-            # so not really worth optimizing.
-            releasefile = next(
-                (rf for ident in filename_idents for rf in possible_files if rf.ident == ident)
+            logger.debug(
+                "Found release artifact %r (id=%s, release_id=%s)",
+                filename,
+                releasefile.id,
+                release.id,
             )
+            rv[filename] = releasefile.file
 
-        logger.debug(
-            "Found release artifact %r (id=%s, release_id=%s)", filename, releasefile.id, release.id
-        )
-        try:
-            with metrics.timer("sourcemaps.release_file_read"):
-                with releasefile.file.getfile() as fp:
-                    z_body, body = compress_file(fp)
-        except Exception:
-            logger.error("sourcemap.compress_read_failed", exc_info=sys.exc_info())
-            result = None
-        else:
-            headers = {k.lower(): v for k, v in releasefile.file.headers.items()}
-            encoding = get_encoding_from_headers(headers)
-            result = http.UrlResult(filename, headers, body, 200, encoding)
-            cache.set(cache_key, (headers, z_body, 200, encoding), 3600)
-
-    elif result == -1:
-        # We cached an error, so normalize
-        # it down to None
-        result = None
+    if misses:
+        cache.set_many(misses, 60)
+
+    return rv
+
+
+def read_release_file(filename, release, file):
+    """
+    Reads the contents of a release artifact's ``File`` into a ``UrlResult``.
+    The contents are stored in the local release file cache, and the shared
+    cache remembers which file was found for ``filename``.
+    """
+    try:
+        with metrics.timer("sourcemaps.release_file_read"):
+            body = _read_mapped(ReleaseFile.cache.getfile(file))
+            if body is None:
+                # files without a checksum cannot be cached locally
+                with file.getfile() as fp:
+                    body = fp.read()
+    except Exception:
+        logger.error("sourcemap.release_file_read_failed", exc_info=sys.exc_info())
+        return None
+
+    headers = {k.lower(): v for k, v in file.headers.items()}
+    encoding = get_encoding_from_headers(headers)
+    cache.set(
+        get_release_file_cache_key(filename, release),
+        (headers, encoding, file.id, file.checksum),
+        3600,
+    )
+    return http.UrlResult(filename, headers, body, 200, encoding)
+
+
+def fetch_release_file(filename, release, dist=None, release_files=None):
+    """
+    Returns the release artifact for ``filename`` as ``UrlResult`` or
+    ``None``.  ``release_files`` can hold the artifacts that were already
+    resolved with ``lookup_release_files``.
+    """
+    if release_files is not None and filename in release_files:
+        result = release_files[filename]
     else:
-        # Previous caches would be a 3-tuple instead of a 4-tuple,
-        # so this is being maintained for backwards compatibility
-        try:
-            encoding = result[3]
-        except IndexError:
-            encoding = None
-        result = http.UrlResult(
-            filename, result[0], zlib.decompress(result[1]), result[2], encoding
-        )
+        result = lookup_release_files([filename], release, dist)[filename]
 
+    if isinstance(result, File):
+        result = read_release_file(filename, release, result)
     return result
 
 
-def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
+def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True, release_files=None):
     """
     Pull down a URL, returning a UrlResult object.
 
-    Attempts to fetch from the cache.
+    Attempts to fetch from the cache.  ``release_files`` are the release
+    artifacts that were resolved upfront with ``lookup_release_files``.
     """
     # If our url has been truncated, it'd be impossible to fetch
     # so we check for this early and bail
@@ -284,7 +420,7 @@ def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
         raise http.CannotFetch({"type": EventError.JS_MISSING_SOURCE, "url": http.expose_url(url)})
     if release:
         with metrics.timer("sourcemaps.release_file"):
-            result = fetch_release_file(url, release, dist)
+            result = fetch_release_file(url, release, dist, release_files=release_files)
     else:
         result = None
 
@@ -388,7 +524,9 @@ def get_max_age(headers):
     return min(max_age, CACHE_CONTROL_MAX)
 
 
-def fetch_sourcemap(url, project=None, release=None, dist=None, allow_scraping=True):
+def fetch_sourcemap(
+    url, project=None, release=None, dist=None, allow_scraping=True, release_files=None
+):
     if is_data_uri(url):
         try:
             body = base64.b64decode(
@@ -398,11 +536,16 @@ def fetch_sourcemap(url, project=None, release=None, dist=None, allow_scraping=T
             raise UnparseableSourcemap({"url": "<base64>", "reason": e.message})
     else:
         result = fetch_file(
-            url, project=project, release=release, dist=dist, allow_scraping=allow_scraping
+            url,
+            project=project,
+            release=release,
+            dist=dist,
+            allow_scraping=allow_scraping,
+            release_files=release_files,
         )
         body = result.body
     try:
-        return SourceMapView.from_json_bytes(body)
+        return get_view("sourcemap", body, SourceMapView.from_json_bytes)
     except Exception as exc:
         # This is in debug because the product shows an error already.
         logger.debug(six.text_type(exc), exc_info=True)
@@ -440,6 +583,28 @@ def generate_module(src):
     return CLEAN_MODULE_RE.sub("", filename) or UNKNOWN_MODULE
 
 
+def get_frame_changes(frame, new_frame):
+    """
+    Returns the values that differ between ``frame`` and the processed
+    ``new_frame``.  Values in ``data`` are compared individually.
+    """
+    changes = {k: v for k, v in six.iteritems(new_frame) if k != "data" and frame.get(k) != v}
+    old_data = frame.get("data") or {}
+    data_changes = {
+        k: v for k, v in six.iteritems(new_frame.get("data") or {}) if old_data.get(k) != v
+    }
+    if data_changes:
+        changes["data"] = data_changes
+    return changes
+
+
+def apply_frame_changes(frame, changes):
+    rv = dict(frame, **changes)
+    if "data" in changes:
+        rv["data"] = dict(frame.get("data") or {}, **changes["data"])
+    return rv
+
+
 class JavaScriptStacktraceProcessor(StacktraceProcessor):
     """
     Attempts to fetch source code for javascript frames.
@@ -474,6 +639,7 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         self.sourcemaps = SourceMapCache()
         self.release = None
         self.dist = None
+        self.release_files = {}
 
     def get_stacktraces(self, data):
         exceptions = get_path(data, "exception", "values", filter=True, default=())
@@ -504,7 +670,13 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         if self.data.get("dist") and self.release:
             self.dist = self.release.get_dist(self.data["dist"])
 
-        self.populate_source_cache(frames)
+        # sources are only needed for frames that weren't processed before
+        cached_frames = set(
+            id(f.frame)
+            for f in processing_task.iter_processable_frames(self)
+            if f.cache_value is not None
+        )
+        self.populate_source_cache([f for f in frames if id(f) not in cached_frames])
         return True
 
     def handles_frame(self, frame, stacktrace_info):
@@ -512,11 +684,53 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         return settings.SENTRY_SCRAPE_JAVASCRIPT_CONTEXT and platform in ("javascript", "node")
 
     def preprocess_frame(self, processable_frame):
-        # Stores the resolved token.  This is used to cross refer to other
-        # frames for function name resolution by call site.
-        processable_frame.data = {"token": None}
+        # Stores the name of the resolved token.  This is used to cross refer
+        # to other frames for function name resolution by call site.
+        processable_frame.data = {"token_name": None}
+
+        # Only frames of events with a release are cached, as their sources
+        # are release artifacts and don't change between events.
+        release = self.data.get("release")
+        frame = processable_frame.frame
+        if not release or not frame.get("abs_path") or not frame.get("lineno"):
+            return
+
+        values = [
+            FRAME_CACHE_VERSION,
+            self.project.id,
+            release,
+            self.data.get("dist"),
+            self.data.get("platform"),
+        ]
+        # all values that processing reads or changes are part of the key,
+        # so a cached result can be applied to any frame with the same key
+        values.extend(frame.get(key) for key in FRAME_CACHE_KEYS)
+        values.append(get_path(frame, "data", "sourcemap"))
+        # the function name can be resolved from the previous frame
+        previous_frame = self.get_previous_frame(processable_frame) or {}
+        values.extend(
+            previous_frame.get(key) for key in ("abs_path", "lineno", "colno", "function")
+        )
+        processable_frame.set_cache_key_from_values(values)
+
+    def get_previous_frame(self, processable_frame):
+        previous_frame = processable_frame.previous_frame
+        if previous_frame is not None and previous_frame.processor is self:
+            return previous_frame.frame
+
+    def process_cached_frame(self, processable_frame):
+        frame = processable_frame.frame
+        frame_changes, raw_frame_changes, token_name = processable_frame.cache_value
+        processable_frame.data["token_name"] = token_name
+        raw_frame = None
+        if raw_frame_changes is not None:
+            raw_frame = [apply_frame_changes(frame, raw_frame_changes)]
+        return [apply_frame_changes(frame, frame_changes)], raw_frame, []
 
     def process_frame(self, processable_frame, processing_task):
+        if processable_frame.cache_value is not None:
+            return self.process_cached_frame(processable_frame)
+
         frame = processable_frame.frame
         token = None
 
@@ -589,7 +803,7 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                 )
 
             # persist the token so that we can find it later
-            processable_frame.data["token"] = token
+            processable_frame.data["token_name"] = token.name if token is not None else None
 
             # Store original data in annotation
             new_frame["data"] = dict(frame.get("data") or {}, sourcemap=sourcemap_label)
@@ -625,17 +839,15 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                 # frame and the location to resolve the original name
                 # through the heuristics in our sourcemap library.
                 if original_function_name is None:
-                    last_token = None
-
                     # Find the previous token for function name handling as a
                     # fallback.
                     if (
                         processable_frame.previous_frame
                         and processable_frame.previous_frame.processor is self
                     ):
-                        last_token = processable_frame.previous_frame.data.get("token")
-                        if last_token:
-                            original_function_name = last_token.name
+                        original_function_name = processable_frame.previous_frame.data.get(
+                            "token_name"
+                        )
 
                 if original_function_name is not None:
                     new_frame["function"] = original_function_name
@@ -716,6 +928,16 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
             if in_app is not None:
                 new_frame["in_app"] = in_app
                 raw_frame["in_app"] = in_app
+            if sourcemap_applied and not all_errors:
+                # errors (or a missing sourcemap) could be caused by artifacts
+                # that were not uploaded yet, so only clean results are cached
+                processable_frame.set_cache_value(
+                    (
+                        get_frame_changes(frame, new_frame),
+                        get_frame_changes(frame, raw_frame) if changed_raw else None,
+                        processable_frame.data["token_name"],
+                    )
+                )
             return [new_frame], [raw_frame] if changed_raw else None, all_errors
 
     def expand_frame(self, frame, source=None):
@@ -737,62 +959,119 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
             self.cache_source(filename)
         return self.cache.get(filename)
 
-    def cache_source(self, filename):
-        sourcemaps = self.sourcemaps
-        cache = self.cache
+    def _fetch_file(self, filename):
+        # TODO: respect cache-control/max-age headers to some extent
+        logger.debug("Fetching remote source %r", filename)
+        return fetch_file(
+            filename,
+            project=self.project,
+            release=self.release,
+            dist=self.dist,
+            allow_scraping=self.allow_scraping,
+            release_files=self.release_files,
+        )
 
-        self.fetch_count += 1
+    def _fetch_sourcemap(self, url):
+        return fetch_sourcemap(
+            url,
+            project=self.project,
+            release=self.release,
+            dist=self.dist,
+            allow_scraping=self.allow_scraping,
+            release_files=self.release_files,
+        )
 
-        if self.fetch_count > self.max_fetches:
-            cache.add_error(filename, {"type": EventError.JS_TOO_MANY_REMOTE_SOURCES})
+    def resolve_release_files(self, filenames):
+        """
+        Looks up the release artifacts for all given files at once, so the
+        fetches don't each need to query for them.
+        """
+        if self.release is None:
             return
+        filenames = [f for f in filenames if f not in self.release_files]
+        if filenames:
+            self.release_files.update(lookup_release_files(filenames, self.release, self.dist))
 
-        # TODO: respect cache-control/max-age headers to some extent
-        logger.debug("Fetching remote source %r", filename)
-        try:
-            result = fetch_file(
-                filename,
-                project=self.project,
-                release=self.release,
-                dist=self.dist,
-                allow_scraping=self.allow_scraping,
-            )
-        except http.BadSource as exc:
-            cache.add_error(filename, exc.data)
-            return
+    def cache_source(self, filename):
+        self.cache_sources([filename])
 
-        cache.add(filename, result.body, result.encoding)
-        cache.alias(result.url, filename)
+    def cache_sources(self, filenames):
+        """
+        Fetches the given source files and their sourcemaps and adds them to
+        the caches.  The release artifacts for all files (and the ``.map``
+        files next to them) are looked up at once, the fetches run
+        concurrently in the fetch pool, and a sourcemap that is referenced by
+        several files is only fetched once, as soon as the first of them has
+        been fetched.
+        """
+        sourcemaps = self.sourcemaps
+        cache = self.cache
 
-        sourcemap_url = discover_sourcemap(result)
-        if not sourcemap_url:
-            return
+        to_fetch = []
+        for filename in filenames:
+            self.fetch_count += 1
+            if self.fetch_count > self.max_fetches:
+                cache.add_error(filename, {"type": EventError.JS_TOO_MANY_REMOTE_SOURCES})
+                continue
+            to_fetch.append(filename)
+
+        # most sourcemaps live next to their minified file, so their release
+        # artifacts are resolved together with the sources
+        self.resolve_release_files(to_fetch + [filename + ".map" for filename in to_fetch])
+        pending_sources = [
+            (filename, submit_fetch("source", partial(self._fetch_file, filename)))
+            for filename in to_fetch
+        ]
+
+        sourcemap_users = OrderedDict()
+        pending_sourcemaps = []
+        for filename, future in pending_sources:
+            try:
+                result = future.result()
+            except http.BadSource as exc:
+                cache.add_error(filename, exc.data)
+                continue
 
-        logger.debug("Found sourcemap %r for minified script %r", sourcemap_url[:256], result.url)
-        sourcemaps.link(filename, sourcemap_url)
-        if sourcemap_url in sourcemaps:
-            return
+            cache.add(filename, result.body, result.encoding)
+            cache.alias(result.url, filename)
 
-        # pull down sourcemap
-        try:
-            sourcemap_view = fetch_sourcemap(
-                sourcemap_url,
-                project=self.project,
-                release=self.release,
-                dist=self.dist,
-                allow_scraping=self.allow_scraping,
+            sourcemap_url = discover_sourcemap(result)
+            if not sourcemap_url:
+                continue
+
+            logger.debug(
+                "Found sourcemap %r for minified script %r", sourcemap_url[:256], result.url
             )
-        except http.BadSource as exc:
-            cache.add_error(filename, exc.data)
-            return
+            sourcemaps.link(filename, sourcemap_url)
+            if sourcemap_url in sourcemaps:
+                continue
+
+            # pull down sourcemap (once for all files that reference it) while
+            # the remaining sources are still being fetched
+            if sourcemap_url not in sourcemap_users:
+                pending_sourcemaps.append(
+                    (
+                        sourcemap_url,
+                        submit_fetch("sourcemap", partial(self._fetch_sourcemap, sourcemap_url)),
+                    )
+                )
+            sourcemap_users.setdefault(sourcemap_url, []).append(filename)
+
+        for sourcemap_url, future in pending_sourcemaps:
+            try:
+                sourcemap_view = future.result()
+            except http.BadSource as exc:
+                for filename in sourcemap_users[sourcemap_url]:
+                    cache.add_error(filename, exc.data)
+                continue
 
-        sourcemaps.add(sourcemap_url, sourcemap_view)
+            sourcemaps.add(sourcemap_url, sourcemap_view)
 
-        # cache any inlined sources
-        for src_id, source_name in sourcemap_view.iter_sources():
-            source_view = sourcemap_view.get_sourceview(src_id)
-            if source_view is not None:
-                self.cache.add(urljoin(sourcemap_url, source_name), source_view)
+            # cache any inlined sources
+            for src_id, source_name in sourcemap_view.iter_sources():
+                source_view = sourcemap_view.get_sourceview(src_id)
+                if source_view is not None:
+                    cache.add(urljoin(sourcemap_url, source_name), source_view)
 
     def populate_source_cache(self, frames):
         """
@@ -815,8 +1094,7 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                 continue
             pending_file_list.add(f["abs_path"])
 
-        for idx, filename in enumerate(pending_file_list):
-            self.cache_source(filename=filename)
+        self.cache_sources(pending_file_list)
 
     def close(self):
         StacktraceProcessor.close(self)
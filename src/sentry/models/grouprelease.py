@@ -4,10 +4,12 @@ from datetime import timedelta
 from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
-from sentry.utils.cache import cache
+from sentry.utils.cache import cache, LocalCache
 from sentry.utils.hashlib import md5_text
 from sentry.db.models import BoundedPositiveIntegerField, Model, sane_repr
 
+_local_cache = LocalCache("grouprelease", max_size=10000, ttl=60)
+
 
 class GroupRelease(Model):
     __core__ = False
@@ -36,7 +38,9 @@ class GroupRelease(Model):
     def get_or_create(cls, group, release, environment, datetime, **kwargs):
         cache_key = cls.get_cache_key(group.id, release.id, environment.name)
 
-        instance = cache.get(cache_key)
+        instance = _local_cache.get(cache_key)
+        if instance is None:
+            instance = cache.get(cache_key)
         if instance is None:
             try:
                 with transaction.atomic():
@@ -71,4 +75,13 @@ class GroupRelease(Model):
             ).update(last_seen=datetime)
             instance.last_seen = datetime
             cache.set(cache_key, instance, 3600)
+        _local_cache.set(cache_key, instance)
         return instance
+
+
+_local_cache.invalidate_on_change(
+    GroupRelease,
+    lambda instance: GroupRelease.get_cache_key(
+        instance.group_id, instance.release_id, instance.environment
+    ),
+)
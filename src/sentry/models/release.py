@@ -24,7 +24,7 @@ from sentry.constants import BAD_RELEASE_CHARS, COMMIT_RANGE_DELIMITER
 from sentry.models import CommitFileChange
 from sentry.signals import issue_resolved, release_commits_updated
 from sentry.utils import metrics
-from sentry.utils.cache import cache
+from sentry.utils.cache import cache, LocalCache
 from sentry.utils.hashlib import md5_text
 from sentry.utils.retries import TimedRetryPolicy
 
@@ -34,6 +34,10 @@ _sha1_re = re.compile(r"^[a-f0-9]{40}$")
 _dotted_path_prefix_re = re.compile(r"^([a-zA-Z][a-zA-Z0-9-]+)(\.[a-zA-Z][a-zA-Z0-9-]+)+-")
 DB_VERSION_LENGTH = 250
 
+# Releases are looked up for every event that has one, keep the hot ones
+# around in process so we only go to the shared cache on a miss.
+_local_cache = LocalCache("release", max_size=1000, ttl=60)
+
 
 class ReleaseProject(Model):
     __core__ = False
@@ -135,6 +139,10 @@ class Release(Model):
 
         cache_key = cls.get_cache_key(project.organization_id, version)
 
+        release = _local_cache.get(cache_key)
+        if release is not None:
+            return release
+
         release = cache.get(cache_key)
         if release in (None, -1):
             # TODO(dcramer): if the cache result is -1 we could attempt a
@@ -174,6 +182,7 @@ class Release(Model):
             # the new "latest release" for this project
             cache.set(cache_key, release, 3600)
 
+        _local_cache.set(cache_key, release)
         return release
 
     @classmethod
@@ -615,3 +624,8 @@ class Release(Model):
             kick_off_status_syncs.apply_async(
                 kwargs={"project_id": group_project_lookup[group_id], "group_id": group_id}
             )
+
+
+_local_cache.invalidate_on_change(
+    Release, lambda instance: Release.get_cache_key(instance.organization_id, instance.version)
+)
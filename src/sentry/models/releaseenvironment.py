@@ -4,9 +4,11 @@ from datetime import timedelta
 from django.db import models
 from django.utils import timezone
 
-from sentry.utils.cache import cache
+from sentry.utils.cache import cache, LocalCache
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model, sane_repr
 
+_local_cache = LocalCache("releaseenvironment", max_size=5000, ttl=60)
+
 
 class ReleaseEnvironment(Model):
     __core__ = False
@@ -33,8 +35,13 @@ class ReleaseEnvironment(Model):
     @classmethod
     def get_or_create(cls, project, release, environment, datetime, **kwargs):
         cache_key = cls.get_cache_key(project.id, release.id, environment.id)
+        # the shared cache is keyed by the project, which isn't known when an
+        # instance changes, so the local cache uses the organization instead
+        local_cache_key = cls.get_cache_key(project.organization_id, release.id, environment.id)
 
-        instance = cache.get(cache_key)
+        instance = _local_cache.get(local_cache_key)
+        if instance is None:
+            instance = cache.get(cache_key)
         if instance is None:
             instance, created = cls.objects.get_or_create(
                 release_id=release.id,
@@ -55,4 +62,13 @@ class ReleaseEnvironment(Model):
             ).update(last_seen=datetime)
             instance.last_seen = datetime
             cache.set(cache_key, instance, 3600)
+        _local_cache.set(local_cache_key, instance)
         return instance
+
+
+_local_cache.invalidate_on_change(
+    ReleaseEnvironment,
+    lambda instance: ReleaseEnvironment.get_cache_key(
+        instance.organization_id, instance.release_id, instance.environment_id
+    ),
+)
@@ -1,11 +1,25 @@
 from __future__ import absolute_import
 
+import errno
+import mmap
+import os
+import re
+import time
+
 from django.db import models
 from six.moves.urllib.parse import urlsplit, urlunsplit
 
+from sentry import options
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model, sane_repr
+from sentry.utils import metrics
 from sentry.utils.hashlib import sha1_text
 
+_checksum_re = re.compile(r"^[a-f0-9]{40}$")
+
+# Temporary files of downloads into the cache that are older than this are
+# left over from workers that died while downloading and are removed.
+TEMPFILE_GRACE_PERIOD = 60 * 60
+
 
 class ReleaseFile(Model):
     r"""
@@ -77,3 +91,106 @@ class ReleaseFile(Model):
         if query:
             urls.append("~" + urlunsplit(uri_relative_without_query))
         return urls
+
+
+class ReleaseFileCache(object):
+    """
+    A local on-disk cache of release file contents, keyed by the checksum
+    of the file.  Contents are served as read-only memory maps, so the
+    page cache is shared by all processes on the host.  The cache is
+    trimmed to ``releasefile.cache-limit`` bytes by evicting the least
+    recently used files.
+    """
+
+    @property
+    def cache_path(self):
+        return options.get("releasefile.cache-path")
+
+    def _map(self, checksum):
+        path = os.path.join(self.cache_path, checksum)
+        try:
+            fp = open(path, "rb")
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+        with fp:
+            try:
+                # mark the file as recently used
+                os.utime(path, None)
+            except OSError:
+                pass
+            if not os.fstat(fp.fileno()).st_size:
+                # empty files cannot be mapped
+                return b""
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, checksum):
+        """
+        Returns the cached contents of the file with the given checksum as a
+        read-only memory map, or ``None`` if they are not in the cache.
+        """
+        rv = self._map(checksum) if checksum else None
+        metrics.incr(
+            "releasefile.cache.hit" if rv is not None else "releasefile.cache.miss",
+            skip_internal=True,
+        )
+        return rv
+
+    def getfile(self, file):
+        """
+        Returns the contents of ``file`` as a read-only memory map, fetching
+        them into the cache first if necessary.  Returns ``None`` for files
+        without a checksum.
+        """
+        if not file.checksum:
+            return None
+
+        rv = self.get(file.checksum)
+        if rv is None:
+            file.save_to(os.path.join(self.cache_path, file.checksum))
+            rv = self._map(file.checksum)
+        return rv
+
+    def clear_old_entries(self):
+        try:
+            cached_files = os.listdir(self.cache_path)
+        except OSError:
+            return
+
+        tempfile_cutoff = time.time() - TEMPFILE_GRACE_PERIOD
+
+        entries = []
+        total_size = 0
+        for cached_file in cached_files:
+            is_tempfile = not _checksum_re.match(cached_file)
+            cached_file = os.path.join(self.cache_path, cached_file)
+            try:
+                stat = os.stat(cached_file)
+            except OSError:
+                continue
+            if is_tempfile:
+                # downloads that are in progress are left alone
+                if stat.st_mtime < tempfile_cutoff:
+                    try:
+                        os.remove(cached_file)
+                    except OSError:
+                        pass
+                continue
+            entries.append((stat.st_mtime, stat.st_size, cached_file))
+            total_size += stat.st_size
+
+        limit = options.get("releasefile.cache-limit")
+        for _, size, cached_file in sorted(entries):
+            if total_size <= limit:
+                break
+            try:
+                os.remove(cached_file)
+            except OSError:
+                continue
+            total_size -= size
+            metrics.incr("releasefile.cache.evicted", skip_internal=True)
+
+
+ReleaseFile.cache = ReleaseFileCache()
@@ -4,9 +4,11 @@ from datetime import timedelta
 from django.db import models
 from django.utils import timezone
 
-from sentry.utils.cache import cache
+from sentry.utils.cache import cache, LocalCache
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model, sane_repr
 
+_local_cache = LocalCache("releaseprojectenvironment", max_size=5000, ttl=60)
+
 
 class ReleaseProjectEnvironment(Model):
     __core__ = False
@@ -33,8 +35,13 @@ class ReleaseProjectEnvironment(Model):
     @classmethod
     def get_or_create(cls, release, project, environment, datetime, **kwargs):
         cache_key = cls.get_cache_key(project.id, release.id, environment.id)
+        # the shared cache key has the release and project swapped, the local
+        # cache uses the right order so an instance can find its own entry
+        local_cache_key = cls.get_cache_key(release.id, project.id, environment.id)
 
-        instance = cache.get(cache_key)
+        instance = _local_cache.get(local_cache_key)
+        if instance is None:
+            instance = cache.get(cache_key)
         if instance is None:
             instance, created = cls.objects.get_or_create(
                 release=release,
@@ -53,4 +60,13 @@ class ReleaseProjectEnvironment(Model):
             ).update(last_seen=datetime)
             instance.last_seen = datetime
             cache.set(cache_key, instance, 3600)
+        _local_cache.set(local_cache_key, instance)
         return instance
+
+
+_local_cache.invalidate_on_change(
+    ReleaseProjectEnvironment,
+    lambda instance: ReleaseProjectEnvironment.get_cache_key(
+        instance.release_id, instance.project_id, instance.environment_id
+    ),
+)
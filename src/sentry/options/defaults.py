@@ -47,6 +47,15 @@ register(
     "dsym.cache-path", type=String, default="/tmp/sentry-dsym-cache", flags=FLAG_PRIORITIZE_DISK
 )
 
+# Local cache of release artifacts (e.g. JavaScript sources and sourcemaps)
+register(
+    "releasefile.cache-path",
+    type=String,
+    default="/tmp/sentry-releasefile-cache",
+    flags=FLAG_PRIORITIZE_DISK,
+)
+register("releasefile.cache-limit", default=10 * 1024 ** 3, flags=FLAG_PRIORITIZE_DISK)
+
 # Mail
 register("mail.backend", default="smtp", flags=FLAG_NOSTORE)
 register("mail.host", default="localhost", flags=FLAG_REQUIRED | FLAG_PRIORITIZE_DISK)
@@ -156,6 +165,27 @@ register("store.projects-normalize-in-rust-percent-opt-in", default=0.0)  # unus
 # From 0.0 to 1.0: Randomly disable normalization code in interfaces when loading from db
 register("store.empty-interface-sample-rate", default=0.0)
 
+# Write event payloads between the store tasks as sectioned, compressed
+# envelopes (see sentry.cache.events). Readers understand both formats.
+register("store.use-payload-envelope", default=False)
+
+# Save events that need no processing right in the preprocess task instead of
+# sending them through save_event. The percentage is stable per project.
+register("store.inline-save-projects-opt-in", type=Sequence, default=[])
+register("store.inline-save-percent-opt-in", default=0.0)
+
+# Record saved event ids in a Bloom filter (write) and only look up events
+# the filter may have seen when checking for duplicates (read). Enable
+# reading once the filter covers its whole time window.
+register("store.event-id-filter.write", default=False)
+register("store.event-id-filter.read", default=False)
+
+# Save events in micro-batches of up to this many events of the same project
+# (see EventManager.save_many). Batches that don't fill up are saved after
+# the window (in seconds) has passed.
+register("store.save-event-batch-size", default=1)
+register("store.save-event-batch-window", default=1)
+
 # Symbolicator refactors
 # - Disabling minidump stackwalking in endpoints
 register("symbolicator.minidump-refactor-projects-opt-in", type=Sequence, default=[])  # unused
@@ -7,6 +7,7 @@ from time import time
 
 from sentry.exceptions import InvalidConfiguration
 from sentry.quotas.base import NotRateLimited, Quota, RateLimited
+from sentry.utils.cache import LocalCache
 from sentry.utils.redis import get_cluster_from_options, load_script
 
 is_rate_limited = load_script("quotas/is_rate_limited.lua")
@@ -33,10 +34,16 @@ class RedisQuota(Quota):
     #: metrics may not be in sync with the computer running this code.
     grace = 60
 
-    def __init__(self, **options):
+    def __init__(self, quota_cache_ttl=10, **options):
         self.cluster, options = get_cluster_from_options("SENTRY_QUOTA_OPTIONS", options)
         super(RedisQuota, self).__init__(**options)
         self.namespace = "quota"
+        # Computing the quotas for a project key takes several (cached)
+        # option and feature lookups, which adds up on the store endpoint. The
+        # definitions are kept in process memory for ``quota_cache_ttl``
+        # seconds so that checking them is a single script call.
+        self.quota_cache_ttl = quota_cache_ttl
+        self._quota_cache = LocalCache("quotas", max_size=10000, ttl=quota_cache_ttl)
 
     def validate(self):
         try:
@@ -56,6 +63,17 @@ class RedisQuota(Quota):
             if quota.limit > 0  # a zero limit means "no limit", not "reject all"
         ]
 
+    def get_cached_quotas_with_limits(self, project, key=None):
+        if not self.quota_cache_ttl:
+            return self.get_quotas_with_limits(project, key=key)
+
+        cache_key = (project.id, key.id if key else None)
+        quotas = self._quota_cache.get(cache_key)
+        if quotas is None:
+            quotas = self.get_quotas_with_limits(project, key=key)
+            self._quota_cache.set(cache_key, quotas)
+        return quotas
+
     def get_quotas(self, project, key=None):
         if key:
             key.project = project
@@ -125,7 +143,7 @@ class RedisQuota(Quota):
         if timestamp is None:
             timestamp = time()
 
-        quotas = self.get_quotas_with_limits(project, key=key)
+        quotas = self.get_cached_quotas_with_limits(project, key=key)
 
         if not quotas:
             return
@@ -154,7 +172,7 @@ class RedisQuota(Quota):
         if timestamp is None:
             timestamp = time()
 
-        quotas = self.get_quotas_with_limits(project, key=key)
+        quotas = self.get_cached_quotas_with_limits(project, key=key)
 
         # If there are no quotas to actually check, skip the trip to the database.
         if not quotas:
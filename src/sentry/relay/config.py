@@ -17,12 +17,18 @@ from sentry.models.organization import Organization
 from sentry.models.organizationoption import OrganizationOption
 from sentry.models.project import Project
 from sentry.models.projectoption import ProjectOption
-from sentry.utils.data_filters import FilterTypes, FilterStatKeys
+from sentry.utils.cache import LocalCache
+from sentry.utils.data_filters import FilterTypes, FilterStatKeys, compile_filter_matchers
+from sentry.utils.data_scrubber import SensitiveDataFilter
 from sentry.utils.http import get_origins
 from sentry.utils.outcomes import track_outcome, Outcome
 from sentry.models.projectkey import ProjectKey
 from sentry.utils.sdk import configure_scope
 
+# Compiled store configs by project and relay revision, see
+# ``_get_cached_store_config``.
+_store_config_cache = LocalCache("relay-projectconfig", max_size=10000, ttl=60)
+
 
 def get_project_key_config(project_key):
     """Returns a dict containing the information for a specific project key"""
@@ -40,7 +46,8 @@ def get_project_config(project_id, full_config=True, for_store=False):
     :param for_store: If set to true, this omits all parameters that are not
         needed for store normalization. This is a temporary flag that should
         be removed once store has been moved to Relay. Most importantly, this
-        avoids database accesses.
+        avoids database accesses. Store configs are cached in process
+        until the project's options change.
 
     :return: a ProjectConfig object for the given project
     """
@@ -52,6 +59,42 @@ def get_project_config(project_id, full_config=True, for_store=False):
     with configure_scope() as scope:
         scope.set_tag("project", project.id)
 
+    if for_store:
+        return _get_cached_store_config(project, full_config)
+
+    return _build_project_config(project, full_config=full_config, for_store=for_store)
+
+
+def _get_cached_store_config(project, full_config):
+    """
+    Returns the store config for ``project`` from the process local cache.
+
+    Entries are keyed by the ``sentry:relay-rev`` revision, which is bumped
+    whenever options are updated through the project. As not all writes go
+    through there (filter states, organization options), the options an
+    entry was built from are compared on every hit as well.
+    """
+    project_options = ProjectOption.objects.get_all_values(project)
+    state = (
+        project.status,
+        project.slug,
+        project_options,
+        OrganizationOption.objects.get_all_values(project.organization_id),
+    )
+    cache_key = (project.id, full_config, project_options.get("sentry:relay-rev"))
+
+    cached = _store_config_cache.get(cache_key)
+    if cached is not None and cached[0] == state:
+        if full_config:
+            project.organization = Organization.objects.get_from_cache(id=project.organization_id)
+        return cached[1].with_project(project)
+
+    config = _build_project_config(project, full_config=full_config, for_store=True)
+    _store_config_cache.set(cache_key, (state, config))
+    return config
+
+
+def _build_project_config(project, full_config=True, for_store=False):
     if for_store:
         project_keys = []
     else:
@@ -94,11 +137,6 @@ def get_project_config(project_id, full_config=True, for_store=False):
     # implicitly fetched from database.
     project.organization = Organization.objects.get_from_cache(id=project.organization_id)
 
-    if project.organization is not None:
-        org_options = OrganizationOption.objects.get_all_values(project.organization_id)
-    else:
-        org_options = {}
-
     project_cfg = cfg["config"]
 
     # get the filter settings for this project
@@ -283,9 +321,47 @@ class ProjectConfig(_ConfigBase):
 
     def __init__(self, project, **kwargs):
         object.__setattr__(self, "project", project)
+        # compiled filters, built on first use and shared with the copies
+        # made by ``with_project``
+        object.__setattr__(self, "_compiled", {})
 
         super(ProjectConfig, self).__init__(**kwargs)
 
+    @property
+    def filter_matchers(self):
+        compiled = self._compiled
+        if "filter_matchers" not in compiled:
+            config = self.config or {}
+            compiled["filter_matchers"] = compile_filter_matchers(config.get("filter_settings"))
+        return compiled["filter_matchers"]
+
+    @property
+    def sensitive_data_filter(self):
+        compiled = self._compiled
+        if "sensitive_data_filter" not in compiled:
+            config = self.config or {}
+            if config.get("scrub_data"):
+                sensitive_data_filter = SensitiveDataFilter(
+                    fields=config.get("sensitive_fields"),
+                    include_defaults=config.get("scrub_defaults"),
+                    exclude_fields=config.get("exclude_fields"),
+                )
+            else:
+                sensitive_data_filter = None
+            compiled["sensitive_data_filter"] = sensitive_data_filter
+        return compiled["sensitive_data_filter"]
+
+    def with_project(self, project):
+        """
+        Returns a copy of this config bound to another instance of the same
+        project. The configuration and compiled filters are shared.
+        """
+        rv = object.__new__(type(self))
+        for (key, val) in six.iteritems(self.__dict__):
+            object.__setattr__(rv, key, val)
+        object.__setattr__(rv, "project", project)
+        return rv
+
 
 def _generate_pii_config(project, org_options):
     scrub_ip_address = org_options.get(
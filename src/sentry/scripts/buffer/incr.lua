@@ -0,0 +1,41 @@
+-- Apply an increment to a buffer hash and mark the hash as pending, in one
+-- atomic step. This replaces a pipeline of HSETNX/HINCRBY/HSET/EXPIRE/ZADD
+-- calls for every increment.
+--
+-- KEYS = {buffer key, pending key}
+-- ARGV = {
+--   expiry (seconds), pending score (timestamp of the increment), model path,
+--   serialized filters,
+--   number of counter columns N,
+--   column 1, amount 1, ..., column N, amount N,
+--   extra column 1, serialized value 1, ...
+-- }
+--
+-- Counter columns are stored with the "i+" prefix and incremented, extra
+-- columns are stored with the "e+" prefix (last write wins), matching the
+-- layout read back by ``RedisBuffer._process_single_incr``.
+--
+-- A hash that is already pending keeps its score, so the score is the time of
+-- the oldest increment that wasn't flushed yet (used for ``buffer.pending-lag``).
+local key = KEYS[1]
+local pending_key = KEYS[2]
+local column_count = tonumber(ARGV[5])
+
+redis.call('HSETNX', key, 'm', ARGV[3])
+redis.call('HSETNX', key, 'f', ARGV[4])
+
+local i = 6
+for _ = 1, column_count do
+    redis.call('HINCRBY', key, 'i+' .. ARGV[i], ARGV[i + 1])
+    i = i + 2
+end
+
+while i < #ARGV do
+    redis.call('HSET', key, 'e+' .. ARGV[i], ARGV[i + 1])
+    i = i + 2
+end
+
+redis.call('EXPIRE', key, ARGV[1])
+if not redis.call('ZSCORE', pending_key, key) then
+    redis.call('ZADD', pending_key, ARGV[2], key)
+end
@@ -604,6 +604,21 @@ local function search(configuration, parameters, limit)
 end
 
 
+local function record(configuration, key, signatures)
+    return table.imap(
+        signatures,
+        function (signature)
+            set_frequencies(configuration, signature.index, key, signature.frequencies)
+            for band, buckets in ipairs(signature.frequencies) do
+                for bucket in pairs(buckets) do
+                    get_bucket_membership_set(configuration, signature.index, band, bucket):add(key)
+                end
+            end
+        end
+    )
+end
+
+
 -- Command Parsing
 
 local commands = {
@@ -618,15 +633,36 @@ local commands = {
             )
         )(cursor, arguments)
 
+        return record(configuration, key, signatures)
+    end,
+    RECORD_MULTI = function (configuration, cursor, arguments)
+        --[[
+        Records signatures for multiple keys (within the same scope) at once.
+        Every key is followed by the timestamp it is recorded at and the
+        number of signatures provided for it, which are encoded the same way
+        as for the ``RECORD`` command. A key may occur more than once.
+        ]]--
+        local cursor, entries = variadic_argument_parser(
+            object_argument_parser({
+                {"key", argument_parser(validate_value)},
+                {"timestamp", argument_parser(validate_number)},
+                {"signatures", repeated_argument_parser(
+                    object_argument_parser({
+                        {"index", argument_parser(validate_value)},
+                        {"frequencies", frequencies_argument_parser(configuration)},
+                    })
+                )},
+            })
+        )(cursor, arguments)
+
         return table.imap(
-            signatures,
-            function (signature)
-                set_frequencies(configuration, signature.index, key, signature.frequencies)
-                for band, buckets in ipairs(signature.frequencies) do
-                    for bucket in pairs(buckets) do
-                        get_bucket_membership_set(configuration, signature.index, band, bucket):add(key)
-                    end
-                end
+            entries,
+            function (entry)
+                return record(
+                    setmetatable({timestamp = entry.timestamp}, {__index = configuration}),
+                    entry.key,
+                    entry.signatures
+                )
             end
         )
     end,
@@ -0,0 +1,43 @@
+-- Check a batch of items against a time bucketed Bloom filter shard and add
+-- them to the current bucket, in one step. This replaces a pipeline of
+-- GETBIT calls for every bucket and SETBIT calls for every item.
+--
+-- KEYS = {current bucket key, previous bucket key, ...}
+-- ARGV = {
+--   expiry (seconds), number of hashes N,
+--   position 1 of item 1, ..., position N of item 1,
+--   position 1 of item 2, ...
+-- }
+--
+-- Returns a list with 1 for every item that may have been added before and
+-- 0 for every item that is new.
+local expiry = tonumber(ARGV[1])
+local hashes = tonumber(ARGV[2])
+
+local function contains(key, offset)
+    for i = offset, offset + hashes - 1 do
+        if redis.call('GETBIT', key, ARGV[i]) == 0 then
+            return false
+        end
+    end
+    return true
+end
+
+local rv = {}
+for offset = 3, #ARGV, hashes do
+    local seen = 0
+    for _, key in ipairs(KEYS) do
+        if contains(key, offset) then
+            seen = 1
+            break
+        end
+    end
+    for i = offset, offset + hashes - 1 do
+        redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+    end
+    table.insert(rv, seen)
+end
+
+redis.call('EXPIRE', KEYS[1], expiry)
+
+return rv
@@ -7,7 +7,9 @@ from django.conf import settings
 
 from sentry.interfaces.stacktrace import Frame
 from sentry.similarity.backends.dummy import DummyIndexBackend
+from sentry.similarity.backends.local import LocalIndexBackend
 from sentry.similarity.backends.metrics import MetricsWrapper
+from sentry.similarity.backends.migrating import MigratingIndexBackend
 from sentry.similarity.backends.redis import RedisScriptMinHashIndexBackend
 from sentry.similarity.encoder import Encoder
 from sentry.similarity.features import (
@@ -17,13 +19,28 @@ from sentry.similarity.features import (
     MessageFeature,
     get_application_chunks,
 )
-from sentry.similarity.signatures import MinHashSignatureBuilder
+from sentry.similarity.signatures import BatchedMinHashSignatureBuilder, MinHashSignatureBuilder
 from sentry.utils import redis
 from sentry.utils.datastructures import BidirectionalMapping
 from sentry.utils.iterators import shingle
 
 logger = logging.getLogger(__name__)
 
+# Signatures of different versions are not comparable, so every version is
+# indexed in a namespace of its own.
+SIGNATURE_BUILDERS = {
+    1: MinHashSignatureBuilder(16, 0xFFFF),
+    2: BatchedMinHashSignatureBuilder(16, 0xFFFF),
+}
+
+# Events are recorded in the indexes of all versions in
+# ``SENTRY_SIMILARITY_INDEX_VERSIONS``, similar issues are looked up in the
+# first one.  Writing to more than one index doubles the similarity writes, so
+# it's only meant for migrations: to move to version 2, set the versions to
+# ``(1, 2)`` until the version 2 index covers the retention period (30 days),
+# then to ``(2,)``.
+DEFAULT_INDEX_VERSIONS = (1,)
+
 
 def text_shingle(n, value):
     return itertools.imap(u"".join, shingle(n, value))
@@ -70,10 +87,28 @@ def _make_index_backend(cluster=None):
             logger.info(u"No redis cluster provided for similarity, using {!r}.".format(index))
             return index
 
-    return MetricsWrapper(
+    versions = getattr(settings, "SENTRY_SIMILARITY_INDEX_VERSIONS", DEFAULT_INDEX_VERSIONS)
+    backends = [
         RedisScriptMinHashIndexBackend(
-            cluster, "sim:1", MinHashSignatureBuilder(16, 0xFFFF), 8, 60 * 60 * 24 * 30, 3, 5000
-        ),
+            cluster,
+            u"sim:{}".format(version),
+            SIGNATURE_BUILDERS[version],
+            8,
+            60 * 60 * 24 * 30,
+            3,
+            5000,
+        )
+        for version in versions
+    ]
+
+    # Searches can be answered from copies of the indices of hot scopes in
+    # process memory, writes still go to Redis.
+    local_index_ttl = getattr(settings, "SENTRY_SIMILARITY_LOCAL_INDEX_TTL", None)
+    if local_index_ttl:
+        backends[0] = LocalIndexBackend(backends[0], ttl=local_index_ttl)
+
+    return MetricsWrapper(
+        backends[0] if len(backends) == 1 else MigratingIndexBackend(backends),
         scope_tag_name="project_id",
     )
 
@@ -0,0 +1,238 @@
+from __future__ import absolute_import
+
+from array import array
+from itertools import izip
+
+import msgpack
+
+from sentry.similarity.backends.abstract import AbstractIndexBackend
+from sentry.similarity.backends.redis import band
+from sentry.utils.cache import LocalCache
+from sentry.utils.iterators import chunked
+
+# Marks indices of scopes that have too many keys to be copied.
+TOO_LARGE = False
+
+
+def scale_to_total(values):
+    total = float(sum(values.itervalues()))
+    if not total:
+        return {}
+    return {key: value / total for key, value in values.iteritems()}
+
+
+def get_manhattan_distance(target, other):
+    return sum(abs(target.get(key, 0) - other.get(key, 0)) for key in set(target).union(other))
+
+
+def calculate_similarity(item_frequencies, candidate_frequencies):
+    # Mirrors `calculate_similarity` in `scripts/similarity/index.lua`
+    if not item_frequencies[0] and not candidate_frequencies[0]:
+        return -1
+    elif not item_frequencies[0] or not candidate_frequencies[0]:
+        return -2
+
+    distances = [
+        1 - get_manhattan_distance(scale_to_total(a), scale_to_total(b)) / 2
+        for a, b in izip(item_frequencies, candidate_frequencies)
+    ]
+    return sum(distances) / len(distances)
+
+
+class LocalIndex(object):
+    """
+    The band buckets of all keys of one index of a scope.  Keys are stored by
+    their position in ``keys``, bucket members as arrays of these positions.
+    """
+
+    def __init__(self, bands):
+        self.bands = bands
+        self.keys = []
+        self.positions = {}
+        self.frequencies = []
+        self.members = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, data):
+        position = len(self.keys)
+        self.keys.append(key)
+        self.positions[key] = position
+
+        frequencies = []
+        for members, buckets in izip(self.members, data):
+            counts = {}
+            for bucket, (count, intervals) in (buckets or {}).iteritems():
+                counts[bucket] = count
+                if intervals:
+                    members.setdefault(bucket, array("I")).append(position)
+            frequencies.append(counts)
+        self.frequencies.append(frequencies)
+
+    def get_frequencies(self, key):
+        position = self.positions.get(key)
+        if position is None:
+            return [{} for _ in range(self.bands)]
+        return self.frequencies[position]
+
+    def get_candidates(self, frequencies):
+        """Returns the number of bands every key shares a bucket with."""
+        hits = {}
+        for members, buckets in izip(self.members, frequencies):
+            positions = set()
+            for bucket in buckets:
+                positions.update(members.get(bucket, ()))
+            for position in positions:
+                hits[position] = hits.get(position, 0) + 1
+        return {self.keys[position]: count for position, count in hits.iteritems()}
+
+
+class LocalIndexBackend(AbstractIndexBackend):
+    """
+    Answers ``classify`` and ``compare`` from in-process copies of the
+    indices of a scope, instead of running the search on Redis.  An index is
+    copied from the wrapped ``RedisScriptMinHashIndexBackend`` (with
+    ``scan`` and ``export``) when it is first searched and then kept for
+    ``ttl`` seconds, so frequently searched scopes are scored locally.
+
+    Writes go to the wrapped backend and drop the copies of the affected
+    indices of the current process, other processes see them once their
+    copies expired.  Indices with more than ``max_keys`` keys are not copied
+    but searched on the wrapped backend.
+
+    Unlike on Redis, candidates are not sampled (``candidate_set_limit`` is
+    not applied), and when ``limit`` is given they are ranked by their
+    average number of band hits across all searched indices.
+    """
+
+    def __init__(self, backend, ttl=60, max_indices=100, max_keys=10000, batch=1000):
+        self.backend = backend
+        self.max_keys = max_keys
+        self.batch = batch
+        self.__indices = LocalCache("similarity-index", max_size=max_indices, ttl=ttl)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def __invalidate(self, scope, indices):
+        for idx in set(indices):
+            self.__indices.delete((scope, idx))
+
+    def __load(self, scope, idx):
+        prefix = u"{}:{{{}}}:{}:f:".format(self.backend.namespace, scope, idx).encode("utf-8")
+
+        keys = []
+        for _, chunk in self.backend.scan(scope, [idx], batch=self.batch):
+            keys.extend(key[len(prefix) :] for key in chunk if key.startswith(prefix))
+            if len(keys) > self.max_keys:
+                return TOO_LARGE
+
+        index = LocalIndex(self.backend.bands)
+        for chunk in chunked(keys, self.batch):
+            exported = self.backend.export(scope, [(idx, key) for key in chunk])
+            for key, data in izip(chunk, exported):
+                data = msgpack.unpackb(data)
+                if data:
+                    index.add(key, data[0])
+        return index
+
+    def __get_indices(self, scope, indices):
+        rv = {}
+        for idx in indices:
+            index = self.__indices.get((scope, idx))
+            if index is None:
+                index = self.__load(scope, idx)
+                self.__indices.set((scope, idx), index)
+            if index is TOO_LARGE:
+                return None
+            rv[idx] = index
+        return rv
+
+    def __get_signature_frequencies(self, features):
+        if not features:
+            return [{} for _ in range(self.backend.bands)]
+        return [
+            {",".join(map("{}".format, bucket)): 1}
+            for bucket in band(self.backend.bands, self.backend.signature_builder(features))
+        ]
+
+    def __search(self, parameters, limit):
+        candidates = {}
+        for i, (index, threshold, frequencies) in enumerate(parameters):
+            for key, hits in index.get_candidates(frequencies).iteritems():
+                if hits >= threshold:
+                    candidates.setdefault(key, {})[i] = hits
+
+        keys = list(candidates)
+        if limit is not None and limit >= 0 and len(keys) > limit:
+
+            def get_rank(key):
+                hits = candidates[key]
+                return (-sum(hits.values()) / float(len(parameters)), -len(hits), key)
+
+            keys = sorted(keys, key=get_rank)[:limit]
+
+        results = []
+        for key in keys:
+            scores = []
+            for index, _, frequencies in parameters:
+                score = calculate_similarity(frequencies, index.get_frequencies(key))
+                scores.append("%f" % score)
+            results.append((key, scores))
+        return self.backend._as_search_result(results)
+
+    def classify(self, scope, items, limit=None, timestamp=None):
+        indices = self.__get_indices(scope, [idx for idx, _, _ in items])
+        if indices is None:
+            return self.backend.classify(scope, items, limit=limit, timestamp=timestamp)
+
+        parameters = [
+            (indices[idx], threshold, self.__get_signature_frequencies(features))
+            for idx, threshold, features in items
+        ]
+        return self.__search(parameters, limit)
+
+    def compare(self, scope, key, items, limit=None, timestamp=None):
+        indices = self.__get_indices(scope, [idx for idx, _ in items])
+        if indices is None:
+            return self.backend.compare(scope, key, items, limit=limit, timestamp=timestamp)
+
+        parameters = [
+            (indices[idx], threshold, indices[idx].get_frequencies(key)) for idx, threshold in items
+        ]
+        return self.__search(parameters, limit)
+
+    def record(self, scope, key, items, timestamp=None):
+        self.__invalidate(scope, [idx for idx, _ in items])
+        return self.backend.record(scope, key, items, timestamp=timestamp)
+
+    def record_multi(self, scope, items, timestamp=None):
+        items = list(items)
+        self.__invalidate(scope, [idx for item in items for idx, _ in item[1]])
+        return self.backend.record_multi(scope, items, timestamp=timestamp)
+
+    def merge(self, scope, destination, items, timestamp=None):
+        self.__invalidate(scope, [idx for idx, _ in items])
+        return self.backend.merge(scope, destination, items, timestamp=timestamp)
+
+    def delete(self, scope, items, timestamp=None):
+        self.__invalidate(scope, [idx for idx, _ in items])
+        return self.backend.delete(scope, items, timestamp=timestamp)
+
+    def scan(self, scope, indices, batch=1000, timestamp=None):
+        return self.backend.scan(scope, indices, batch=batch, timestamp=timestamp)
+
+    def flush(self, scope, indices, batch=1000, timestamp=None):
+        if scope == "*":
+            self.__indices.clear()
+        else:
+            self.__invalidate(scope, indices)
+        return self.backend.flush(scope, indices, batch=batch, timestamp=timestamp)
+
+    def export(self, scope, items, timestamp=None):
+        return self.backend.export(scope, items, timestamp=timestamp)
+
+    def import_(self, scope, items, timestamp=None):
+        self.__invalidate(scope, [idx for idx, _, _ in items])
+        return self.backend.import_(scope, items, timestamp=timestamp)
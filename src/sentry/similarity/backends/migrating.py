@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+
+from sentry.similarity.backends.abstract import AbstractIndexBackend
+
+
+class MigratingIndexBackend(AbstractIndexBackend):
+    """
+    Writes to several indexes while reading from the first one only.  This
+    allows populating a new index (e.g. one with a different signature
+    version) alongside the existing one until it holds enough data to
+    replace it.
+
+    Exported data contains the data of every index, so it can only be
+    imported into a backend with the same indexes.
+    """
+
+    def __init__(self, backends):
+        assert backends, "at least one backend is required"
+        self.backends = backends
+
+    def __getattr__(self, name):
+        return getattr(self.backends[0], name)
+
+    def __call_all(self, method, *args, **kwargs):
+        results = [getattr(backend, method)(*args, **kwargs) for backend in self.backends]
+        return results[0]
+
+    def classify(self, scope, items, limit=None, timestamp=None):
+        return self.backends[0].classify(scope, items, limit=limit, timestamp=timestamp)
+
+    def compare(self, scope, key, items, limit=None, timestamp=None):
+        return self.backends[0].compare(scope, key, items, limit=limit, timestamp=timestamp)
+
+    def record(self, scope, key, items, timestamp=None):
+        return self.__call_all("record", scope, key, items, timestamp=timestamp)
+
+    def record_multi(self, scope, items, timestamp=None):
+        return self.__call_all("record_multi", scope, items, timestamp=timestamp)
+
+    def merge(self, scope, destination, items, timestamp=None):
+        return self.__call_all("merge", scope, destination, items, timestamp=timestamp)
+
+    def delete(self, scope, items, timestamp=None):
+        return self.__call_all("delete", scope, items, timestamp=timestamp)
+
+    def scan(self, scope, indices, batch=1000, timestamp=None):
+        return self.backends[0].scan(scope, indices, batch=batch, timestamp=timestamp)
+
+    def flush(self, scope, indices, batch=1000, timestamp=None):
+        return self.__call_all("flush", scope, indices, batch=batch, timestamp=timestamp)
+
+    def export(self, scope, items, timestamp=None):
+        return zip(
+            *[backend.export(scope, items, timestamp=timestamp) for backend in self.backends]
+        )
+
+    def import_(self, scope, items, timestamp=None):
+        results = []
+        for i, backend in enumerate(self.backends):
+            results.append(
+                backend.import_(
+                    scope,
+                    [(index, key, data[i]) for index, key, data in items],
+                    timestamp=timestamp,
+                )
+            )
+        return results[0]
@@ -143,6 +143,43 @@ class RedisScriptMinHashIndexBackend(AbstractIndexBackend):
 
         return self.__index(scope, arguments)
 
+    def record_multi(self, scope, items, timestamp=None):
+        """
+        Records the features of multiple keys with a single script call.
+        ``items`` is a sequence of ``(key, items)`` pairs, where ``items`` are
+        the same as for ``record``, or ``(key, items, timestamp)`` triples for
+        keys that are recorded at a timestamp of their own.
+        """
+        if timestamp is None:
+            timestamp = int(time.time())
+
+        items = [
+            (item[0], item[1], item[2] if len(item) > 2 else timestamp)
+            for item in items
+            if item[1]
+        ]
+        if not items:
+            return  # nothing to do
+
+        arguments = [
+            "RECORD_MULTI",
+            timestamp,
+            self.namespace,
+            self.bands,
+            self.interval,
+            self.retention,
+            self.candidate_set_limit,
+            scope,
+        ]
+
+        for key, key_items, key_timestamp in items:
+            arguments.extend([key, key_timestamp, len(key_items)])
+            for idx, features in key_items:
+                arguments.append(idx)
+                arguments.extend(self._build_signature_arguments(features))
+
+        return self.__index(scope, arguments)
+
     def merge(self, scope, destination, items, timestamp=None):
         if timestamp is None:
             timestamp = int(time.time())
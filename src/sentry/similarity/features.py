@@ -4,6 +4,8 @@ import functools
 import itertools
 import logging
 
+from collections import OrderedDict
+
 from sentry.utils.dates import to_timestamp
 
 logger = logging.getLogger("sentry.similarity")
@@ -97,13 +99,18 @@ class FeatureSet(object):
         return results
 
     def record(self, events):
+        """
+        Records the features of the given events, which may belong to
+        different groups (of the same project), with a single index call.
+        """
         if not events:
             return []
 
         scope = None
-        key = None
 
-        items = []
+        # the timestamp decides the interval the features are stored in and
+        # when they expire, so every event is recorded at its own timestamp
+        items = OrderedDict()
         for event in events:
             if not event.group_id:
                 continue
@@ -115,13 +122,6 @@ class FeatureSet(object):
                         self.__get_scope(event.project) == scope
                     ), "all events must be associated with the same project"
 
-                if key is None:
-                    key = self.__get_key(event.group)
-                else:
-                    assert (
-                        self.__get_key(event.group) == key
-                    ), "all events must be associated with the same group"
-
                 try:
                     features = map(self.encoder.dumps, features)
                 except Exception as error:
@@ -138,9 +138,13 @@ class FeatureSet(object):
                     )
                 else:
                     if features:
-                        items.append((self.aliases[label], features))
+                        items.setdefault(
+                            (self.__get_key(event.group), int(to_timestamp(event.datetime))), []
+                        ).append((self.aliases[label], features))
 
-        return self.index.record(scope, key, items, timestamp=int(to_timestamp(event.datetime)))
+        return self.index.record_multi(
+            scope, [(key, key_items, timestamp) for (key, timestamp), key_items in items.items()]
+        )
 
     def classify(self, events, limit=None, thresholds=None):
         if not events:
@@ -1,6 +1,11 @@
 from __future__ import absolute_import
 
+import math
 import mmh3
+import struct
+
+# splits a 128 bit hash into four 32 bit values
+unpack_hash = struct.Struct("<4I").unpack
 
 
 class MinHashSignatureBuilder(object):
@@ -15,3 +20,30 @@ class MinHashSignatureBuilder(object):
             ),
             range(self.columns),
         )
+
+
+class BatchedMinHashSignatureBuilder(object):
+    """
+    Builds MinHash signatures with far fewer hash calls than
+    ``MinHashSignatureBuilder``: a 128 bit hash of a feature provides the
+    (32 bit) hash values of four columns at once, so every distinct feature
+    is hashed ``columns / 4`` times instead of ``columns`` times.  The hashes
+    are unpacked and reduced to the minimum of every column with builtins
+    rather than per feature Python code.
+
+    The signatures are not comparable with the ones built by
+    ``MinHashSignatureBuilder``.
+    """
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.seeds = range(int(math.ceil(columns / 4.0)))
+
+    def __call__(self, features):
+        features = list(set(features))
+        columns = []
+        for seed in self.seeds:
+            hashes = [mmh3.hash_bytes(feature, seed, x64arch=True) for feature in features]
+            columns.extend(zip(*map(unpack_hash, hashes)))
+        return [min(column) % self.rows for column in columns[: self.columns]]
@@ -8,6 +8,7 @@ from django.utils import timezone
 from collections import namedtuple, OrderedDict
 
 from sentry.models import Project, Release
+from sentry.utils import metrics
 from sentry.utils.cache import cache
 from sentry.utils.hashlib import hash_values
 from sentry.utils.safe import get_path, safe_execute
@@ -31,6 +32,7 @@ class ProcessableFrame(object):
         self.data = None
         self.cache_key = None
         self.cache_value = None
+        self.new_cache_value = None
         self.processable_frames = processable_frames
 
     def __repr__(self):
@@ -63,9 +65,16 @@ class ProcessableFrame(object):
             return
         return self.processable_frames[last_idx]
 
+    @property
+    def platform(self):
+        return self.frame.get("platform") or self.processor.data.get("platform")
+
     def set_cache_value(self, value):
+        """Remembers the value for the cache key of the frame.  Values of all
+        frames are written at once after the stacktraces were processed.
+        """
         if self.cache_key is not None:
-            cache.set(self.cache_key, value, 3600)
+            self.new_cache_value = value
             return True
         return False
 
@@ -100,6 +109,14 @@ class StacktraceProcessingTask(object):
                 if processor is None or frame.processor == processor:
                     yield frame
 
+    def store_frame_cache(self):
+        """Writes the cache values that were set on frames while processing."""
+        values = {}
+        for frame in self.iter_processable_frames():
+            if frame.new_cache_value is not None:
+                values[frame.cache_key] = frame.new_cache_value
+        store_frame_cache(values)
+
 
 class StacktraceProcessor(object):
     def __init__(self, data, stacktrace_infos, project=None):
@@ -411,10 +428,12 @@ def get_crash_frame_from_event_data(data, frame_filter=None):
 
 
 def lookup_frame_cache(keys):
-    rv = {}
-    for key in keys:
-        rv[key] = cache.get(key)
-    return rv
+    return cache.get_many(list(keys))
+
+
+def store_frame_cache(values):
+    if values:
+        cache.set_many(values, 3600)
 
 
 def get_stacktrace_processing_task(infos, processors):
@@ -438,11 +457,25 @@ def get_stacktrace_processing_task(infos, processors):
                 processable_frame
             )
             if processable_frame.cache_key is not None:
-                to_lookup[processable_frame.cache_key] = processable_frame
+                to_lookup.setdefault(processable_frame.cache_key, []).append(processable_frame)
 
     frame_cache = lookup_frame_cache(to_lookup)
-    for cache_key, processable_frame in six.iteritems(to_lookup):
-        processable_frame.cache_value = frame_cache.get(cache_key)
+    hits = {}
+    misses = {}
+    for cache_key, processable_frames in six.iteritems(to_lookup):
+        for processable_frame in processable_frames:
+            processable_frame.cache_value = frame_cache.get(cache_key)
+            counts = misses if processable_frame.cache_value is None else hits
+            counts[processable_frame.platform] = counts.get(processable_frame.platform, 0) + 1
+
+    for name, counts in (("hit", hits), ("miss", misses)):
+        for platform, count in six.iteritems(counts):
+            metrics.incr(
+                "process.frame_cache.%s" % name,
+                count,
+                tags={"platform": platform},
+                skip_internal=True,
+            )
 
     return StacktraceProcessingTask(
         processable_stacktraces=by_stacktrace_info, processors=by_processor
@@ -503,6 +536,8 @@ def process_stacktraces(data, make_processors=None, set_raw_stacktrace=True):
                 data.setdefault("errors", []).extend(dedup_errors(errors))
                 changed = True
 
+        processing_task.store_frame_cache()
+
     finally:
         for processor in processors:
             processor.close()
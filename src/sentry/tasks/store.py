@@ -9,12 +9,12 @@ from django.utils import timezone
 
 from semaphore.processing import StoreNormalizer
 
-from sentry import features, reprocessing
+from sentry import features, options, reprocessing
 from sentry.constants import DEFAULT_STORE_NORMALIZER_ARGS
 from sentry.attachments import attachment_cache
-from sentry.cache import default_cache
+from sentry.cache import event_cache
 from sentry.tasks.base import instrumented_task
-from sentry.utils import metrics
+from sentry.utils import json, metrics, redis
 from sentry.utils.safe import safe_execute
 from sentry.stacktraces.processing import process_stacktraces, should_process_for_stacktraces
 from sentry.utils.data_filters import FilterStatKeys
@@ -32,6 +32,10 @@ REPROCESSING_DEFAULT = False
 # Attachment file types that are considered a crash report (PII relevant)
 CRASH_REPORT_TYPES = ("event.minidump",)
 
+# Events that wait for a save batch are dropped after this many seconds,
+# their payloads expire from the event cache at the same time.
+SAVE_BATCH_TTL = 60 * 60
+
 
 class RetryProcessing(Exception):
     pass
@@ -63,6 +67,18 @@ def should_process(data):
     return False
 
 
+def should_save_inline(project_id):
+    """
+    Returns whether events of this project that need no processing are saved
+    right in the preprocess task.
+    """
+    if project_id in options.get("store.inline-save-projects-opt-in"):
+        return True
+
+    rate = options.get("store.inline-save-percent-opt-in")
+    return rate > 0 and project_id % 1000 < rate * 1000
+
+
 def submit_process(project, from_reprocessing, cache_key, event_id, start_time, data):
     task = process_event_from_reprocessing if from_reprocessing else process_event
     task.delay(cache_key=cache_key, start_time=start_time, event_id=event_id)
@@ -72,6 +88,15 @@ def submit_save_event(project, cache_key, event_id, start_time, data):
     if cache_key:
         data = None
 
+        batch_size = options.get("store.save-event-batch-size")
+        if batch_size > 1:
+            _submit_save_event_batched(
+                project.id,
+                batch_size,
+                {"cache_key": cache_key, "start_time": start_time, "event_id": event_id},
+            )
+            return
+
     save_event.delay(
         cache_key=cache_key,
         data=data,
@@ -81,9 +106,54 @@ def submit_save_event(project, cache_key, event_id, start_time, data):
     )
 
 
+def _get_save_batch_client(project_id):
+    key = u"save-event-batch:{}".format(project_id)
+    return key, redis.clusters.get("default").get_local_client_for_key(key)
+
+
+def _submit_save_event_batched(project_id, batch_size, kwargs):
+    """
+    Adds an event to the pending save batch of its project.  The batch is
+    sent to ``save_event_batch`` once it has ``batch_size`` events, or by
+    ``flush_save_event_batch`` after ``store.save-event-batch-window``
+    seconds, whichever comes first.
+    """
+    key, client = _get_save_batch_client(project_id)
+    with client.pipeline() as pipe:
+        pipe.rpush(key, json.dumps(kwargs))
+        pipe.expire(key, SAVE_BATCH_TTL)
+        length = pipe.execute()[0]
+
+    if length == 1:
+        flush_save_event_batch.apply_async(
+            kwargs={"project_id": project_id},
+            countdown=options.get("store.save-event-batch-window"),
+        )
+    elif length >= batch_size:
+        _flush_save_event_batch(project_id, batch_size)
+
+
+def _flush_save_event_batch(project_id, batch_size):
+    key, client = _get_save_batch_client(project_id)
+    while True:
+        with client.pipeline() as pipe:
+            pipe.lrange(key, 0, batch_size - 1)
+            pipe.ltrim(key, batch_size, -1)
+            events = pipe.execute()[0]
+
+        if not events:
+            return
+
+        metrics.timing("events.save-batch-size", len(events))
+        save_event_batch.delay(project_id=project_id, events=[json.loads(e) for e in events])
+
+        if len(events) < batch_size:
+            return
+
+
 def _do_preprocess_event(cache_key, data, start_time, event_id, process_task):
     if cache_key and data is None:
-        data = default_cache.get(cache_key)
+        data = event_cache.get(cache_key)
 
     if data is None:
         metrics.incr("events.failed", tags={"reason": "cache", "stage": "pre"}, skip_internal=False)
@@ -104,6 +174,13 @@ def _do_preprocess_event(cache_key, data, start_time, event_id, process_task):
         submit_process(project, from_reprocessing, cache_key, event_id, start_time, original_data)
         return
 
+    if should_save_inline(project.id):
+        # Skip the round trip through the broker and the cache, we already
+        # have everything that is needed to save the event.
+        metrics.incr("events.save-inline", skip_internal=False)
+        _do_save_event(cache_key, original_data, start_time, event_id, project.id)
+        return
+
     submit_save_event(project, cache_key, event_id, start_time, original_data)
 
 
@@ -159,7 +236,7 @@ def _do_process_event(cache_key, start_time, event_id, process_task, data=None):
     from sentry.plugins import plugins
 
     if data is None:
-        data = default_cache.get(cache_key)
+        data = event_cache.get(cache_key)
 
     if data is None:
         metrics.incr(
@@ -240,7 +317,7 @@ def _do_process_event(cache_key, start_time, event_id, process_task, data=None):
         normalizer = StoreNormalizer(
             remove_other=False, is_renormalize=True, **DEFAULT_STORE_NORMALIZER_ARGS
         )
-        data = normalizer.normalize_event(dict(data))
+        data = normalizer.normalize_event(data)
 
         issues = data.get("processing_issues")
 
@@ -263,7 +340,7 @@ def _do_process_event(cache_key, start_time, event_id, process_task, data=None):
             process_task.delay(cache_key, start_time=start_time, event_id=event_id)
             return
 
-        default_cache.set(cache_key, data, 3600)
+        event_cache.set(cache_key, data, 3600)
 
     submit_save_event(project, cache_key, event_id, start_time, data)
 
@@ -364,7 +441,7 @@ def create_failed_event(
     # from the last processing step because we do not want any
     # modifications to take place.
     delete_raw_event(project_id, event_id)
-    data = default_cache.get(cache_key)
+    data = event_cache.get(cache_key)
     if data is None:
         metrics.incr("events.failed", tags={"reason": "cache", "stage": "raw"}, skip_internal=False)
         error_logger.error("process.failed_raw.empty", extra={"cache_key": cache_key})
@@ -389,7 +466,7 @@ def create_failed_event(
             data=issue["data"],
         )
 
-    default_cache.delete(cache_key)
+    event_cache.delete(cache_key)
 
     return True
 
@@ -420,19 +497,14 @@ def save_attachment(event, attachment):
     )
 
 
-def _do_save_event(
-    cache_key=None, data=None, start_time=None, event_id=None, project_id=None, **kwargs
-):
+def _load_event_for_save(cache_key, data, event_id, project_id):
     """
-    Saves an event to the database.
+    Fetches the payload of an event that is about to be saved.  Returns a
+    tuple of ``(data, event_id, project_id, key_id)`` where ``data`` is empty
+    if the event can no longer be saved.
     """
-    from sentry.event_manager import HashDiscarded, EventManager
-    from sentry import quotas
-    from sentry.models import ProjectKey
-    from sentry.utils.outcomes import Outcome, track_outcome
-
     if cache_key and data is None:
-        data = default_cache.get(cache_key)
+        data = event_cache.get(cache_key)
 
     if data is not None:
         data = CanonicalKeyDict(data)
@@ -448,7 +520,6 @@ def _do_save_event(
     key_id = None if data is None else data.get("key_id")
     if key_id is not None:
         key_id = int(key_id)
-    timestamp = to_datetime(start_time) if start_time is not None else None
 
     delete_raw_event(project_id, event_id, allow_hint_clear=True)
 
@@ -466,8 +537,81 @@ def _do_save_event(
         metrics.incr(
             "events.failed", tags={"reason": "cache", "stage": "post"}, skip_internal=False
         )
+
+    return data, event_id, project_id, key_id
+
+
+def _track_saved_event(event, cache_key, key_id, timestamp, event_id):
+    from sentry.utils.outcomes import Outcome, track_outcome
+
+    # Always load attachments from the cache so we can later prune them.
+    # Only save them if the event-attachments feature is active, though.
+    if features.has("organizations:event-attachments", event.project.organization, actor=None):
+        attachments = attachment_cache.get(cache_key) or []
+        for attachment in attachments:
+            save_attachment(event, attachment)
+
+    # This is where we can finally say that we have accepted the event.
+    track_outcome(
+        event.project.organization_id,
+        event.project.id,
+        key_id,
+        Outcome.ACCEPTED,
+        None,
+        timestamp,
+        event_id,
+    )
+
+
+def _track_discarded_event(project_id, key_id, start_time, timestamp, event_id):
+    from sentry import quotas
+    from sentry.models import ProjectKey
+    from sentry.utils.outcomes import Outcome, track_outcome
+
+    project = Project.objects.get_from_cache(id=project_id)
+    reason = FilterStatKeys.DISCARDED_HASH
+    project_key = None
+    try:
+        if key_id is not None:
+            project_key = ProjectKey.objects.get_from_cache(id=key_id)
+    except ProjectKey.DoesNotExist:
+        pass
+
+    quotas.refund(project, key=project_key, timestamp=start_time)
+    track_outcome(
+        project.organization_id, project_id, key_id, Outcome.FILTERED, reason, timestamp, event_id
+    )
+
+
+def _cleanup_saved_event(event, cache_key, start_time, data):
+    if cache_key:
+        event_cache.delete(cache_key)
+
+        # For the unlikely case that we did not manage to persist the
+        # event we also delete the key always.
+        if event is None or features.has(
+            "organizations:event-attachments", event.project.organization, actor=None
+        ):
+            attachment_cache.delete(cache_key)
+
+    if start_time:
+        metrics.timing("events.time-to-process", time() - start_time, instance=data["platform"])
+
+
+def _do_save_event(
+    cache_key=None, data=None, start_time=None, event_id=None, project_id=None, **kwargs
+):
+    """
+    Saves an event to the database.
+    """
+    from sentry.event_manager import HashDiscarded, EventManager
+
+    data, event_id, project_id, key_id = _load_event_for_save(cache_key, data, event_id, project_id)
+    if not data:
         return
 
+    timestamp = to_datetime(start_time) if start_time is not None else None
+
     with configure_scope() as scope:
         scope.set_tag("project", project_id)
 
@@ -475,59 +619,62 @@ def _do_save_event(
     try:
         manager = EventManager(data)
         event = manager.save(project_id, assume_normalized=True)
-
-        # Always load attachments from the cache so we can later prune them.
-        # Only save them if the event-attachments feature is active, though.
-        if features.has("organizations:event-attachments", event.project.organization, actor=None):
-            attachments = attachment_cache.get(cache_key) or []
-            for attachment in attachments:
-                save_attachment(event, attachment)
-
-        # This is where we can finally say that we have accepted the event.
-        track_outcome(
-            event.project.organization_id,
-            event.project.id,
-            key_id,
-            Outcome.ACCEPTED,
-            None,
-            timestamp,
-            event_id,
-        )
+        _track_saved_event(event, cache_key, key_id, timestamp, event_id)
 
     except HashDiscarded:
-        project = Project.objects.get_from_cache(id=project_id)
-        reason = FilterStatKeys.DISCARDED_HASH
-        project_key = None
-        try:
-            if key_id is not None:
-                project_key = ProjectKey.objects.get_from_cache(id=key_id)
-        except ProjectKey.DoesNotExist:
-            pass
-
-        quotas.refund(project, key=project_key, timestamp=start_time)
-        track_outcome(
-            project.organization_id,
-            project_id,
-            key_id,
-            Outcome.FILTERED,
-            reason,
-            timestamp,
-            event_id,
-        )
+        _track_discarded_event(project_id, key_id, start_time, timestamp, event_id)
 
     finally:
-        if cache_key:
-            default_cache.delete(cache_key)
+        _cleanup_saved_event(event, cache_key, start_time, data)
 
-            # For the unlikely case that we did not manage to persist the
-            # event we also delete the key always.
-            if event is None or features.has(
-                "organizations:event-attachments", event.project.organization, actor=None
-            ):
-                attachment_cache.delete(cache_key)
 
-        if start_time:
-            metrics.timing("events.time-to-process", time() - start_time, instance=data["platform"])
+def _do_save_event_batch(project_id, events):
+    """
+    Saves a micro-batch of events of the same project to the database.
+    Every item in ``events`` is a dictionary with the keyword arguments a
+    single ``save_event`` task would receive.
+    """
+    from sentry.event_manager import EventManager
+
+    pending = []
+    for kwargs in events:
+        cache_key = kwargs.get("cache_key")
+        start_time = kwargs.get("start_time")
+        data, event_id, _, key_id = _load_event_for_save(
+            cache_key, kwargs.get("data"), kwargs.get("event_id"), project_id
+        )
+        if data:
+            pending.append((cache_key, start_time, event_id, key_id, data))
+
+    if not pending:
+        return
+
+    with configure_scope() as scope:
+        scope.set_tag("project", project_id)
+
+    # Failures that affect the whole batch are raised before any event is
+    # tracked or cleaned up. Failures of single events are returned in place
+    # of the event (and were logged already).
+    saved = EventManager.save_many(
+        project_id, [data for _, _, _, _, data in pending], assume_normalized=True
+    )
+
+    for event, (cache_key, start_time, event_id, key_id, data) in zip(saved, pending):
+        if isinstance(event, Exception):
+            # same as a failing ``save_event``, the payload is not kept
+            _cleanup_saved_event(None, cache_key, start_time, data)
+            continue
+
+        timestamp = to_datetime(start_time) if start_time is not None else None
+        try:
+            if event is None:
+                _track_discarded_event(project_id, key_id, start_time, timestamp, event_id)
+            else:
+                _track_saved_event(event, cache_key, key_id, timestamp, event_id)
+        except Exception:
+            error_logger.exception("save_event_batch.track.failed", extra={"event_id": event_id})
+        finally:
+            _cleanup_saved_event(event, cache_key, start_time, data)
 
 
 @instrumented_task(name="sentry.tasks.store.save_event", queue="events.save_event")
@@ -535,3 +682,13 @@ def save_event(
     cache_key=None, data=None, start_time=None, event_id=None, project_id=None, **kwargs
 ):
     _do_save_event(cache_key, data, start_time, event_id, project_id, **kwargs)
+
+
+@instrumented_task(name="sentry.tasks.store.save_event_batch", queue="events.save_event")
+def save_event_batch(project_id=None, events=None, **kwargs):
+    _do_save_event_batch(project_id, events or [])
+
+
+@instrumented_task(name="sentry.tasks.store.flush_save_event_batch", queue="events.save_event")
+def flush_save_event_batch(project_id=None, **kwargs):
+    _flush_save_event_batch(project_id, max(options.get("store.save-event-batch-size"), 1))
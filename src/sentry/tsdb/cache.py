@@ -0,0 +1,109 @@
+"""
+Read-through cache for ``get_range`` results.
+
+Buckets that have been closed don't change anymore (except for events that
+arrive late), so they are cached per ``(backend, model, key, rollup,
+environment)`` and only the buckets that are still open, or that aren't cached (anymore),
+are fetched from the TSDB backend.
+"""
+from __future__ import absolute_import
+
+import inspect
+import six
+
+from collections import defaultdict
+from django.core.cache import cache
+from django.utils import timezone
+
+from sentry.utils import metrics
+from sentry.utils.dates import to_datetime, to_timestamp
+
+# A bucket is cached for as long as it has been closed for, within these
+# bounds. Recently closed buckets are the most likely to still receive late
+# events, so they are refreshed more often.
+MIN_BUCKET_TTL = 60
+MAX_BUCKET_TTL = 60 * 60
+
+
+def get_backend_name(backend):
+    # the configured TSDB is exposed as the functions of the ``sentry.tsdb``
+    # module, other backends are passed as instances
+    if inspect.ismodule(backend):
+        return backend.__name__
+    return type(backend).__name__
+
+
+def make_cache_key(backend, model, key, rollup, environment_ids):
+    return u"tsdb-series:{}:{}:{}:{}:{}".format(
+        get_backend_name(backend),
+        model.value,
+        rollup,
+        ",".join(six.text_type(e) for e in sorted(environment_ids or ())),
+        key,
+    )
+
+
+def get_range(backend, model, keys, start, end, rollup=None, environment_ids=None):
+    """
+    Same as ``backend.get_range``, but closed buckets are read from (and
+    written to) the cache.
+    """
+    rollup, series = backend.get_optimal_rollup_series(start, end, rollup)
+    now = to_timestamp(timezone.now())
+
+    cache_keys = {
+        key: make_cache_key(backend, model, key, rollup, environment_ids) for key in keys
+    }
+    cached = cache.get_many(cache_keys.values())
+
+    results = {}
+    buckets = {}
+    keys_by_start = defaultdict(list)
+    for key in keys:
+        # cached values are a mapping of timestamp => (count, expires)
+        buckets[key] = {
+            ts: value
+            for ts, value in six.iteritems(cached.get(cache_keys[key]) or {})
+            if value[1] > now
+        }
+        results[key] = {ts: buckets[key][ts][0] for ts in series if ts in buckets[key]}
+
+        missing = [ts for ts in series if ts not in results[key]]
+        if missing:
+            # fetch everything from the first bucket we don't have, this is
+            # usually either the open bucket or the one that was just closed
+            keys_by_start[missing[0]].append(key)
+
+    updates = {}
+    for first, start_keys in six.iteritems(keys_by_start):
+        if first + rollup <= now:
+            metrics.incr("tsdb.series-cache.miss", len(start_keys), skip_internal=True)
+        fetched = backend.get_range(
+            model=model,
+            keys=start_keys,
+            start=to_datetime(first),
+            end=end,
+            rollup=rollup,
+            environment_ids=environment_ids,
+        )
+        for key, points in six.iteritems(fetched):
+            changed = False
+            for ts, count in points:
+                ts = int(ts)
+                results[key][ts] = count
+                age = now - (ts + rollup)
+                if age >= 0:
+                    ttl = min(max(age, MIN_BUCKET_TTL), MAX_BUCKET_TTL)
+                    buckets[key][ts] = (count, now + ttl)
+                    changed = True
+            if changed:
+                updates[cache_keys[key]] = {
+                    ts: value for ts, value in six.iteritems(buckets[key]) if ts >= series[0]
+                }
+
+    if updates:
+        cache.set_many(updates, MAX_BUCKET_TTL)
+
+    return {
+        key: [(ts, points.get(ts, 0)) for ts in series] for key, points in six.iteritems(results)
+    }
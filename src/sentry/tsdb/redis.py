@@ -4,17 +4,24 @@ import itertools
 import logging
 import operator
 import random
+import threading
 import uuid
 from binascii import crc32
 from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from fractions import gcd
 from hashlib import md5
+from time import time
 
 import six
+from celery.signals import task_postrun, worker_process_shutdown
+from django.core.signals import request_finished
 from django.utils import timezone
 from pkg_resources import resource_string
 from redis.client import Script
 
 from sentry.tsdb.base import BaseTSDB
+from sentry.utils import metrics
 from sentry.utils.dates import to_datetime, to_timestamp
 from sentry.utils.redis import check_cluster_versions, get_cluster_from_options
 from sentry.utils.versioning import Version
@@ -53,6 +60,28 @@ class SuppressionWrapper(object):
         return True
 
 
+class PendingWrites(object):
+    """\
+    Writes that have been accumulated in this process but not yet sent to
+    Redis. All three structures are keyed by ``(model, key, timestamp,
+    environment_id)``, with the timestamp normalized to the finest
+    granularity shared by all rollups, so that writes landing in the same
+    buckets are merged:
+
+        * counters are summed,
+        * distinct counter values are unioned,
+        * frequency table scores are summed per member.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.distinct = defaultdict(set)
+        self.frequencies = defaultdict(lambda: defaultdict(int))
+
+    def __len__(self):
+        return len(self.counters) + len(self.distinct) + len(self.frequencies)
+
+
 class RedisTSDB(BaseTSDB):
     """
     A time series storage backend for Redis.
@@ -110,13 +139,41 @@ class RedisTSDB(BaseTSDB):
 
     DEFAULT_SKETCH_PARAMETERS = SketchParameters(3, 128, 50)
 
-    def __init__(self, prefix="ts:", vnodes=64, **options):
+    def __init__(
+        self,
+        prefix="ts:",
+        vnodes=64,
+        write_coalesce_window=0,
+        write_coalesce_max_keys=1000,
+        **options
+    ):
         self.cluster, options = get_cluster_from_options("SENTRY_TSDB_OPTIONS", options)
         self.prefix = prefix
         self.vnodes = vnodes
         self.enable_frequency_sketches = options.pop("enable_frequency_sketches", False)
         super(RedisTSDB, self).__init__(**options)
 
+        # When ``write_coalesce_window`` is set, writes are accumulated in
+        # process (see ``PendingWrites``) for up to that many seconds or until
+        # ``write_coalesce_max_keys`` distinct buckets are pending, and then
+        # written with a single batch of commands.
+        self.write_coalesce_window = write_coalesce_window
+        self.write_coalesce_max_keys = write_coalesce_max_keys
+        assert self.write_coalesce_window >= 0
+        assert self.write_coalesce_max_keys > 0
+
+        # Rollup intervals are multiples of each other, so bucketing writes by
+        # their greatest common divisor never moves a write between buckets.
+        self._pending_writes_resolution = reduce(gcd, self.rollups)
+        self._pending_writes = PendingWrites()
+        self._pending_writes_deadline = None
+        self._pending_writes_lock = threading.Lock()
+
+        if self.write_coalesce_window:
+            task_postrun.connect(self._flush_expired_writes, weak=False)
+            request_finished.connect(self._flush_expired_writes, weak=False)
+            worker_process_shutdown.connect(self.flush_writes, weak=False)
+
     def validate(self):
         logger.debug("Validating Redis version...")
         version = Version((2, 8, 18)) if self.enable_frequency_sketches else Version((2, 8, 9))
@@ -197,6 +254,105 @@ class RedisTSDB(BaseTSDB):
             return md5(repr(key)).hexdigest()
         return key
 
+    @contextmanager
+    def _coalesce_writes(self, timestamp, environment_id):
+        """\
+        Yields the pending writes of this process, along with a function that
+        returns the ``PendingWrites`` keys a write for a model and key should
+        be added to. The writes are flushed afterwards if one of the
+        thresholds was reached.
+        """
+        ts = self.normalize_to_epoch(timestamp, self._pending_writes_resolution)
+        environment_ids = set([None, environment_id])
+
+        def make_key(model, key):
+            return [(model, key, ts, e) for e in environment_ids]
+
+        now = time()
+        with self._pending_writes_lock:
+            yield self._pending_writes, make_key
+
+            if self._pending_writes_deadline is None:
+                self._pending_writes_deadline = now + self.write_coalesce_window
+
+            should_flush = (
+                self._pending_writes_deadline <= now
+                or len(self._pending_writes) >= self.write_coalesce_max_keys
+            )
+
+        if should_flush:
+            self.flush_writes()
+
+    def _flush_expired_writes(self, **kwargs):
+        deadline = self._pending_writes_deadline
+        if deadline is not None and deadline <= time():
+            self.flush_writes()
+
+    def flush_writes(self, **kwargs):
+        """\
+        Writes everything that was accumulated by this process to Redis.
+        """
+        with self._pending_writes_lock:
+            if not self._pending_writes:
+                return
+            pending = self._pending_writes
+            self._pending_writes = PendingWrites()
+            self._pending_writes_deadline = None
+
+        metrics.timing("tsdb.coalesced-keys", len(pending))
+
+        # Commands are routed the same way as they are for unbuffered writes:
+        # counters by their hash key, distinct counters and frequency tables
+        # by the model key. Every Redis key is only expired once per flush.
+        commands = defaultdict(lambda: defaultdict(list))
+        expirations = defaultdict(lambda: defaultdict(dict))
+
+        for (model, key, ts, environment_id), count in six.iteritems(pending.counters):
+            cluster = self.get_cluster(environment_id)
+            timestamp = to_datetime(ts)
+            for rollup, max_values in six.iteritems(self.rollups):
+                hash_key, hash_field = self.make_counter_key(
+                    model, rollup, timestamp, key, environment_id
+                )
+                commands[cluster][hash_key].append(("HINCRBY", hash_key, hash_field, count))
+                expirations[cluster][hash_key][hash_key] = self.calculate_expiry(
+                    rollup, max_values, timestamp
+                )
+
+        for (model, key, ts, environment_id), values in six.iteritems(pending.distinct):
+            cluster = self.get_cluster(environment_id)
+            timestamp = to_datetime(ts)
+            for rollup, max_values in six.iteritems(self.rollups):
+                k = self.make_key(model, rollup, ts, key, environment_id)
+                commands[cluster][key].append(("PFADD", k) + tuple(values))
+                expirations[cluster][key][k] = self.calculate_expiry(rollup, max_values, timestamp)
+
+        for (model, key, ts, environment_id), scores in six.iteritems(pending.frequencies):
+            cluster = self.get_cluster(environment_id)
+            timestamp = to_datetime(ts)
+            keys = []
+            for rollup, max_values in six.iteritems(self.rollups):
+                expiry = self.calculate_expiry(rollup, max_values, timestamp)
+                for k in self.make_frequency_table_keys(model, rollup, ts, key, environment_id):
+                    keys.append(k)
+                    expirations[cluster][key][k] = expiry
+
+            arguments = ["INCR"] + list(self.DEFAULT_SKETCH_PARAMETERS)
+            for member, score in six.iteritems(scores):
+                arguments.extend((score, member))
+            commands[cluster][key].append((CountMinScript, keys, arguments))
+
+        for (cluster, durable), cluster_commands in six.iteritems(commands):
+            for routing_key, keys in six.iteritems(expirations[(cluster, durable)]):
+                for k, expiry in six.iteritems(keys):
+                    cluster_commands[routing_key].append(("EXPIREAT", k, expiry))
+
+            try:
+                cluster.execute_commands(cluster_commands)
+            except Exception:
+                if durable:
+                    raise
+
     def incr(self, model, key, timestamp=None, count=1, environment_id=None):
         self.validate_arguments([model], [environment_id])
 
@@ -213,6 +369,13 @@ class RedisTSDB(BaseTSDB):
         if timestamp is None:
             timestamp = timezone.now()
 
+        if self.write_coalesce_window:
+            with self._coalesce_writes(timestamp, environment_id) as (pending, make_key):
+                for model, key in items:
+                    for k in make_key(model, key):
+                        pending.counters[k] += count
+            return
+
         for (cluster, durable), environment_ids in self.get_cluster_groups(
             set([None, environment_id])
         ):
@@ -356,6 +519,13 @@ class RedisTSDB(BaseTSDB):
         if timestamp is None:
             timestamp = timezone.now()
 
+        if self.write_coalesce_window:
+            with self._coalesce_writes(timestamp, environment_id) as (pending, make_key):
+                for model, key, values in items:
+                    for k in make_key(model, key):
+                        pending.distinct[k].update(values)
+            return
+
         ts = int(to_timestamp(timestamp))  # ``timestamp`` is not actually a timestamp :(
 
         for (cluster, durable), environment_ids in self.get_cluster_groups(
@@ -624,6 +794,16 @@ class RedisTSDB(BaseTSDB):
         if timestamp is None:
             timestamp = timezone.now()
 
+        if self.write_coalesce_window:
+            with self._coalesce_writes(timestamp, environment_id) as (pending, make_key):
+                for model, request in requests:
+                    for key, items in six.iteritems(request):
+                        for k in make_key(model, key):
+                            scores = pending.frequencies[k]
+                            for member, score in six.iteritems(items):
+                                scores[member] += score
+            return
+
         ts = int(to_timestamp(timestamp))  # ``timestamp`` is not actually a timestamp :(
 
         for (cluster, durable), environment_ids in self.get_cluster_groups(
@@ -0,0 +1,120 @@
+from __future__ import absolute_import
+
+import math
+import mmh3
+import six
+
+from collections import defaultdict
+from django.utils.encoding import force_bytes
+from pkg_resources import resource_string
+from redis.client import Script
+from time import time
+
+from sentry.utils.cache import LocalCache
+from sentry.utils.redis import clusters
+
+CheckAndAddScript = Script(None, resource_string("sentry", "scripts/utils/bloom/check_and_add.lua"))
+
+
+class RedisBloomFilter(object):
+    """
+    A Bloom filter over a sliding time window, held in Redis.
+
+    Items are added to the bucket of the current time (``bucket_size``
+    seconds long) and looked up in the last ``buckets`` buckets, so entries
+    are forgotten after at most ``bucket_size * buckets`` seconds.  Every
+    bucket is split into ``shards`` keys to spread the filter over the
+    cluster.  The bit array of a shard is sized for ``capacity / shards``
+    items at the given ``error_rate``.  All buckets of a shard are stored on
+    the host of the shard, so a batch of items is checked and added with one
+    script call per shard.
+
+    A negative answer is definite, a positive one is only probable.  Items
+    that were added by the current process are also remembered in process
+    memory, so looking them up again doesn't need to go to Redis.
+
+    >>> seen = RedisBloomFilter('events', capacity=1000000)
+    >>> seen.check_and_add_many(['a', 'b'])
+    [False, False]
+    >>> seen.check_and_add('a')
+    True
+    """
+
+    def __init__(
+        self,
+        namespace,
+        capacity=10000000,
+        error_rate=0.001,
+        bucket_size=60 * 60,
+        buckets=2,
+        shards=64,
+        cluster="default",
+        local_cache_size=10000,
+    ):
+        self.namespace = namespace
+        self.bucket_size = bucket_size
+        self.buckets = buckets
+        self.shards = shards
+        self.cluster = clusters.get(cluster)
+
+        shard_capacity = float(capacity) / shards
+        self.size = int(math.ceil(-shard_capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / shard_capacity * math.log(2))))
+
+        self._local = LocalCache(
+            u"bloom:{}".format(namespace), max_size=local_cache_size, ttl=bucket_size
+        )
+
+    def make_key(self, bucket, shard):
+        return u"bloom:{}:{}:{}".format(self.namespace, bucket, shard)
+
+    def make_routing_key(self, shard):
+        return u"bloom:{}:{}".format(self.namespace, shard)
+
+    def get_positions(self, item):
+        item = force_bytes(item)
+        # double hashing, see Kirsch and Mitzenmacher, "Less Hashing, Same
+        # Performance: Building a Better Bloom Filter"
+        h1, h2 = mmh3.hash64(item)
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def get_shard(self, item):
+        return mmh3.hash(force_bytes(item)) % self.shards
+
+    def check_and_add(self, item, timestamp=None):
+        return self.check_and_add_many([item], timestamp=timestamp)[0]
+
+    def check_and_add_many(self, items, timestamp=None):
+        """
+        Adds all ``items`` to the filter. Returns a list with a flag for
+        every item that tells whether it may have been added before.
+        """
+        if timestamp is None:
+            timestamp = time()
+        bucket = int(timestamp // self.bucket_size)
+
+        rv = [self._local.get(item) is not None for item in items]
+        pending = [(idx, item) for idx, item in enumerate(items) if not rv[idx]]
+        if not pending:
+            return rv
+
+        by_shard = defaultdict(list)
+        for idx, item in pending:
+            by_shard[self.get_shard(item)].append(idx)
+
+        commands = {}
+        for shard, indexes in six.iteritems(by_shard):
+            keys = [self.make_key(bucket - offset, shard) for offset in range(self.buckets)]
+            args = [self.bucket_size * self.buckets, self.hashes]
+            for idx in indexes:
+                args.extend(self.get_positions(items[idx]))
+            commands[self.make_routing_key(shard)] = [(CheckAndAddScript, keys, args)]
+
+        results = self.cluster.execute_commands(commands)
+        for shard, indexes in six.iteritems(by_shard):
+            flags = results[self.make_routing_key(shard)][0].value
+            for idx, seen in zip(indexes, flags):
+                rv[idx] = bool(seen)
+                self._local.set(items[idx], True)
+
+        return rv
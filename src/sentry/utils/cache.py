@@ -1,11 +1,19 @@
 from __future__ import absolute_import, print_function
 
 import functools
+import threading
+import weakref
+
+from collections import OrderedDict
+from time import time
 
 from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
 
 default_cache = cache
 
+_local_caches = weakref.WeakSet()
+
 
 class memoize(object):
     """
@@ -72,3 +80,124 @@ class cached_for_request(memoize):
 
     def __get__(self, obj, type=None):
         return functools.partial(self.__call__, obj)
+
+
+class LocalCache(object):
+    """
+    A bounded, process local LRU cache with an optional per-entry time to
+    live.  This is meant to sit in front of the shared cache for values that
+    are read very often but rarely change.  Entries are not shared between
+    processes, so invalidation (e.g. from model signals) only affects the
+    current process and the time to live bounds how stale a value can get.
+
+    Besides the number of entries, the cache can be bounded by the total
+    ``weight`` of its entries (e.g. their approximate size in bytes) with
+    ``max_weight``.
+
+    Hits and misses are reported as ``local_cache.hit`` and
+    ``local_cache.miss`` metrics, entries that had to make room for others
+    as ``local_cache.evicted``, all tagged with the name of the cache.
+
+    >>> releases = LocalCache('release', max_size=1000, ttl=60)
+    >>> releases.set('release:1', release)
+    >>> releases.get('release:1')
+    """
+
+    def __init__(self, name, max_size=1000, ttl=None, max_weight=None):
+        self.name = name
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self.ttl = ttl
+        self.weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _local_caches.add(self)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _record(self, hit):
+        from sentry.utils import metrics
+
+        metrics.incr(
+            "local_cache.hit" if hit else "local_cache.miss",
+            tags={"cache": self.name},
+            skip_internal=True,
+        )
+
+    def _pop(self, key):
+        value, expires, weight = self._data.pop(key)
+        self.weight -= weight
+        return value, expires, weight
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires, weight = self._pop(key)
+            except KeyError:
+                value = None
+            else:
+                if expires is not None and expires <= time():
+                    value = None
+                else:
+                    # re-insert to mark the entry as most recently used
+                    self._data[key] = (value, expires, weight)
+                    self.weight += weight
+
+        self._record(value is not None)
+        return default if value is None else value
+
+    def set(self, key, value, ttl=None, weight=1):
+        if ttl is None:
+            ttl = self.ttl
+        expires = time() + ttl if ttl is not None else None
+
+        evicted = 0
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires, weight)
+            self.weight += weight
+            while len(self._data) > self.max_size or (
+                self.max_weight is not None and self.weight > self.max_weight
+            ):
+                self._pop(next(iter(self._data)))
+                evicted += 1
+
+        if evicted:
+            from sentry.utils import metrics
+
+            metrics.incr(
+                "local_cache.evicted", evicted, tags={"cache": self.name}, skip_internal=True
+            )
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def invalidate_on_change(self, model, key_func):
+        """
+        Evicts the entry at ``key_func(instance)`` whenever an existing
+        instance of ``model`` is saved or deleted by this process.
+        """
+
+        def invalidate(instance, created=False, **kwargs):
+            if not created:
+                self.delete(key_func(instance))
+
+        post_save.connect(invalidate, sender=model, weak=False)
+        post_delete.connect(invalidate, sender=model, weak=False)
+
+
+def clear_local_caches():
+    """
+    Clears all ``LocalCache`` instances of this process.
+    """
+    for local_cache in list(_local_caches):
+        local_cache.clear()
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 import fnmatch
 import ipaddress
+import re
 import six
 
 from django.utils.encoding import force_text
@@ -47,53 +48,96 @@ class FilterTypes(object):
     RELEASES = "releases"
 
 
+def _compile_ip_blacklist(blacklist):
+    addresses = set()
+    networks = []
+    for addr in blacklist or ():
+        addresses.add(addr)
+        # Check to make sure it's actually a range before
+        if "/" in addr:
+            try:
+                networks.append(ipaddress.ip_network(six.text_type(addr), strict=False))
+            except ValueError:
+                # Ignore invalid values here
+                pass
+    return frozenset(addresses), tuple(networks)
+
+
+def _compile_patterns(patterns):
+    compiled = []
+    for pattern in patterns or ():
+        try:
+            compiled.append(re.compile(fnmatch.translate(pattern.lower())))
+        except Exception:
+            # Patterns come from end users and can be full of mistakes.
+            pass
+    return tuple(compiled)
+
+
+def compile_filter_matchers(filter_settings):
+    """
+    Precompiles the IP, release and error message filters from the
+    ``filter_settings`` of a project config, so that they don't have to be
+    parsed again for every event.
+    """
+    return {
+        "client_ips": _compile_ip_blacklist(
+            get_path(filter_settings, "client_ips", "blacklisted_ips")
+        ),
+        FilterTypes.RELEASES: _compile_patterns(
+            get_path(filter_settings, FilterTypes.RELEASES, "releases")
+        ),
+        FilterTypes.ERROR_MESSAGES: _compile_patterns(
+            get_path(filter_settings, FilterTypes.ERROR_MESSAGES, "patterns")
+        ),
+    }
+
+
+def _get_filter_matcher(project_config, filter_type):
+    matchers = project_config.filter_matchers
+    if matchers is None:
+        matchers = compile_filter_matchers(get_path(project_config.config, "filter_settings"))
+    return matchers[filter_type]
+
+
 def is_valid_ip(project_config, ip_address):
     """
     Verify that an IP address is not being blacklisted
     for the given project.
     """
-    blacklist = get_path(project_config.config, "filter_settings", "client_ips", "blacklisted_ips")
-    if not blacklist:
-        return True
+    addresses, networks = _get_filter_matcher(project_config, "client_ips")
 
-    for addr in blacklist:
-        # We want to error fast if it's an exact match
-        if ip_address == addr:
-            return False
+    # We want to error fast if it's an exact match
+    if ip_address in addresses:
+        return False
 
-        # Check to make sure it's actually a range before
+    if networks:
         try:
-            if "/" in addr and (
-                ipaddress.ip_address(six.text_type(ip_address))
-                in ipaddress.ip_network(six.text_type(addr), strict=False)
-            ):
-                return False
+            ip_address = ipaddress.ip_address(six.text_type(ip_address))
         except ValueError:
             # Ignore invalid values here
-            pass
+            return True
+        for network in networks:
+            if ip_address in network:
+                return False
 
     return True
 
 
+def _matches_any(value, patterns):
+    if not patterns:
+        return False
+
+    value = force_text(value).lower()
+    return any(pattern.match(value) for pattern in patterns)
+
+
 def is_valid_release(project_config, release):
     """
     Verify that a release is not being filtered
     for the given project.
     """
-    invalid_versions = get_path(
-        project_config.config, "filter_settings", FilterTypes.RELEASES, "releases"
-    )
-
-    if not invalid_versions:
-        return True
-
-    release = force_text(release).lower()
-
-    for version in invalid_versions:
-        if fnmatch.fnmatch(release, version.lower()):
-            return False
-
-    return True
+    return not _matches_any(release, _get_filter_matcher(project_config, FilterTypes.RELEASES))
 
 
 def is_valid_error_message(project_config, message):
@@ -101,22 +145,6 @@ def is_valid_error_message(project_config, message):
     Verify that an error message is not being filtered
     for the given project.
     """
-    filtered_errors = get_path(
-        project_config.config, "filter_settings", FilterTypes.ERROR_MESSAGES, "patterns"
+    return not _matches_any(
+        message, _get_filter_matcher(project_config, FilterTypes.ERROR_MESSAGES)
     )
-
-    if not filtered_errors:
-        return True
-
-    message = force_text(message).lower()
-
-    for error in filtered_errors:
-        try:
-            if fnmatch.fnmatch(message, error.lower()):
-                return False
-        except Exception:
-            # fnmatch raises a string when the pattern is bad.
-            # Patterns come from end users and can be full of mistakes.
-            pass
-
-    return True
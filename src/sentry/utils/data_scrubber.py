@@ -7,6 +7,8 @@ from six.moves.urllib.parse import urlsplit, urlunsplit
 from sentry.constants import DEFAULT_SCRUBBED_FIELDS, FILTER_MASK, NOT_SCRUBBED_VALUES
 from sentry.utils.safe import get_path
 
+_CONTAINER_TYPES = (dict, list, tuple)
+
 
 def varmap(func, var, context=None, name=None):
     """
@@ -66,6 +68,14 @@ class SensitiveDataFilter(object):
             fields += DEFAULT_SCRUBBED_FIELDS
         self.exclude_fields = {f.lower() for f in exclude_fields}
         self.fields = set(fields)
+        # a single alternation finds any of the fields in one scan of a
+        # string instead of one substring check per field
+        if self.fields:
+            self._fields_re = re.compile(
+                u"|".join(re.escape(f) for f in sorted(self.fields, key=len, reverse=True))
+            )
+        else:
+            self._fields_re = None
 
     def apply(self, data):
         # TODO(dcramer): move this into each interface
@@ -93,12 +103,12 @@ class SensitiveDataFilter(object):
             self.filter_csp(data["csp"])
 
         if data.get("extra"):
-            data["extra"] = varmap(self.sanitize, data["extra"])
+            data["extra"] = self._scrub(data["extra"])
 
         if data.get("contexts"):
             for key, value in six.iteritems(data["contexts"]):
                 if value:
-                    data["contexts"][key] = varmap(self.sanitize, value)
+                    data["contexts"][key] = self._scrub(value)
 
     def sanitize(self, key, value):
         if value is None or value == "":
@@ -122,25 +132,79 @@ class SensitiveDataFilter(object):
             if "//" in value and "@" in value:
                 value = self.URL_PASSWORD_RE.sub(r"\1" + FILTER_MASK + "@", value)
 
-        if isinstance(value, six.string_types):
             str_value = value.lower()
         else:
             str_value = ""
 
-        for field in self.fields:
-            if field in str_value:
+        fields_re = self._fields_re
+        if fields_re is not None:
+            if str_value and fields_re.search(str_value):
                 return FILTER_MASK
-            if field in key and value not in NOT_SCRUBBED_VALUES:
+            if key and fields_re.search(key) and value not in NOT_SCRUBBED_VALUES:
                 return FILTER_MASK
         return value
 
+    def _scrub(self, var, name=None, context=None):
+        """
+        Applies ``sanitize`` to all values nested in ``var``. This is the
+        same as ``varmap(self.sanitize, var)``, except that dicts and lists
+        are updated in place rather than copied (tuples are still replaced
+        by lists).
+        """
+        if isinstance(var, dict):
+            items = six.iteritems(var)
+        elif isinstance(var, (list, tuple)):
+            items = None
+        else:
+            return self.sanitize(name, var)
+
+        if context is None:
+            context = set()
+
+        objid = id(var)
+        if objid in context:
+            return self.sanitize(name, "<...>")
+        context.add(objid)
+
+        # leaves are sanitized right here to save a call per value
+        sanitize = self.sanitize
+        if items is not None:
+            for key, value in items:
+                if isinstance(value, _CONTAINER_TYPES):
+                    var[key] = self._scrub(value, key, context)
+                else:
+                    var[key] = sanitize(key, value)
+        else:
+            if isinstance(var, tuple):
+                var = list(var)
+            # treat it like a mapping
+            if all(isinstance(v, (list, tuple)) and len(v) == 2 for v in var):
+                for idx, (key, value) in enumerate(var):
+                    if isinstance(value, _CONTAINER_TYPES):
+                        value = self._scrub(value, key, context)
+                    else:
+                        value = sanitize(key, value)
+                    if isinstance(var[idx], list):
+                        var[idx][1] = value
+                    else:
+                        var[idx] = [key, value]
+            else:
+                for idx, value in enumerate(var):
+                    if isinstance(value, _CONTAINER_TYPES):
+                        var[idx] = self._scrub(value, name, context)
+                    else:
+                        var[idx] = sanitize(name, value)
+
+        context.remove(objid)
+        return var
+
     def filter_stacktrace(self, data):
         if not data.get("frames"):
             return
         for frame in data["frames"]:
             if not frame or not frame.get("vars"):
                 continue
-            frame["vars"] = varmap(self.sanitize, frame["vars"])
+            frame["vars"] = self._scrub(frame["vars"])
 
     def filter_http(self, data):
         for n in ("data", "cookies", "headers", "env", "query_string"):
@@ -161,18 +225,18 @@ class SensitiveDataFilter(object):
             else:
                 # Encoded structured data (HTTP bodies, headers) would have
                 # already been decoded by the request interface.
-                data[n] = varmap(self.sanitize, data[n])
+                data[n] = self._scrub(data[n])
 
     def filter_user(self, data):
         if not data.get("data"):
             return
-        data["data"] = varmap(self.sanitize, data["data"])
+        data["data"] = self._scrub(data["data"])
 
     def filter_crumb(self, data):
         for key in "data", "message":
             val = data.get(key)
             if val:
-                data[key] = varmap(self.sanitize, val)
+                data[key] = self._scrub(val)
 
     def filter_csp(self, data):
         for key in "blocked_uri", "document_uri":
@@ -46,6 +46,18 @@ def _translate(pat, doublestar=False):
     return re.compile("".join(res))
 
 
+def compile_glob(pat, doublestar=False, ignorecase=False, path_normalize=False):
+    """Returns the compiled regular expression ``glob_match`` matches values
+    against.  ``ignorecase`` and ``path_normalize`` are only applied to the
+    pattern, values have to be normalized by the caller.
+    """
+    if ignorecase:
+        pat = pat.lower()
+    if path_normalize:
+        pat = pat.replace("\\", "/")
+    return _translate(pat, doublestar=doublestar)
+
+
 def glob_match(value, pat, doublestar=False, ignorecase=False, path_normalize=False):
     """A beefed up version of fnmatch.fnmatch"""
     if ignorecase:
@@ -96,6 +96,9 @@ def pytest_configure(config):
 
     settings.DISABLE_RAVEN = True
 
+    # fetch pool threads can't see data of the test's transaction
+    settings.SENTRY_SOURCE_FETCH_CONCURRENCY = 1
+
     settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
     if os.environ.get("USE_SNUBA", False):
@@ -239,4 +242,8 @@ def pytest_runtest_teardown(item):
     for model in (OrganizationOption, ProjectOption, UserOption):
         model.objects.clear_local_cache()
 
+    from sentry.utils.cache import clear_local_caches
+
+    clear_local_caches()
+
     Hub.main.bind_client(None)
@@ -271,14 +271,13 @@ def zerofill(data, start, end, rollup, orderby):
             data_by_time[obj["time"]] = [obj]
 
     for key in six.moves.xrange(start, end, rollup):
-        if key in data_by_time and len(data_by_time[key]) > 0:
-            rv = rv + data_by_time[key]
-            data_by_time[key] = []
+        if data_by_time.get(key):
+            rv.extend(data_by_time.pop(key))
         else:
             rv.append({"time": key})
 
     if "-time" in orderby:
-        return list(reversed(rv))
+        rv.reverse()
 
     return rv
 
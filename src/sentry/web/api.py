@@ -65,7 +65,6 @@ from sentry.signals import event_accepted, event_dropped, event_filtered, event_
 from sentry.quotas.base import RateLimit
 from sentry.utils import json, metrics
 from sentry.utils.data_filters import FilterStatKeys
-from sentry.utils.data_scrubber import SensitiveDataFilter
 from sentry.utils.http import is_valid_origin, get_origins, is_same_domain, origin_from_request
 from sentry.utils.outcomes import Outcome, track_outcome
 from sentry.utils.pubsub import QueuedPublisherService, KafkaPublisher
@@ -258,19 +257,9 @@ def process_event(event_manager, project, key, remote_addr, helper, attachments,
     config = project_config.config
     scrub_ip_address = config.get("scrub_ip_addresses")
 
-    scrub_data = config.get("scrub_data")
-
-    if scrub_data:
+    if project_config.sensitive_data_filter is not None:
         # We filter data immediately before it ever gets into the queue
-        sensitive_fields = config.get("sensitive_fields")
-
-        exclude_fields = config.get("exclude_fields")
-
-        scrub_defaults = config.get("scrub_defaults")
-
-        SensitiveDataFilter(
-            fields=sensitive_fields, include_defaults=scrub_defaults, exclude_fields=exclude_fields
-        ).apply(data)
+        project_config.sensitive_data_filter.apply(data)
 
     if scrub_ip_address:
         # We filter data immediately before it ever gets into the queue
@@ -65,3 +65,37 @@ class BufferTest(TestCase):
         self.buf.process(ReleaseProject, columns, filters)
         release_project_ = ReleaseProject.objects.get(id=release_project.id)
         assert release_project_.new_groups == 1
+
+    def test_process_batch(self):
+        project = Project(id=1)
+        group = Group.objects.create(project=project, times_seen=1)
+        group2 = Group.objects.create(project=project, times_seen=1)
+        the_date = timezone.now() + timedelta(days=5)
+        self.buf.process_batch(
+            [
+                (Group, {"times_seen": 1}, {"id": group.id}, {"last_seen": the_date}),
+                (Group, {"times_seen": 2}, {"id": group2.id}, {"last_seen": the_date}),
+                (Group, {"times_seen": 3}, {"id": group.id}, {"last_seen": the_date}),
+                (Group, {"times_seen": 1}, {"message": "foo bar", "project_id": 1}, None),
+            ]
+        )
+
+        group_ = Group.objects.get(id=group.id)
+        assert group_.times_seen == 5
+        assert group_.last_seen == the_date
+        assert Group.objects.get(id=group2.id).times_seen == 3
+        # rows that don't exist yet are created
+        assert Group.objects.get(message="foo bar").times_seen == 2
+
+    @mock.patch("sentry.buffer.base.buffer_incr_complete")
+    def test_process_batch_sends_signal(self, buffer_incr_complete):
+        group = Group.objects.create(project=Project(id=1))
+        self.buf.process_batch([(Group, {"times_seen": 1}, {"id": group.id}, None)])
+        buffer_incr_complete.send_robust.assert_called_once_with(
+            model=Group,
+            columns={"times_seen": 1},
+            filters={"id": group.id},
+            extra=None,
+            created=False,
+            sender=Group,
+        )
@@ -6,10 +6,13 @@ import pytest
 import mock
 
 from datetime import datetime
+from time import time
 from django.utils import timezone
+from sentry.buffer import codec
 from sentry.buffer.redis import RedisBuffer
 from sentry.models import Group, Project
 from sentry.testutils import TestCase
+from sentry.utils.compat import pickle
 
 
 class RedisBufferTest(TestCase):
@@ -89,6 +92,114 @@ class RedisBufferTest(TestCase):
         self.buf.process("foo")
         process.assert_called_once_with(Group, columns, filters, extra)
 
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    def test_incr_writes_hash_and_pending(self):
+        client = self.buf.cluster.get_routing_client()
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": 1}, extra={"foo": "bar"})
+        self.buf.incr(Group, {"times_seen": 2}, {"pk": 1}, extra={"foo": "baz"})
+
+        result = client.hgetall("foo")
+        assert result["m"] == "sentry.models.group.Group"
+        assert result["i+times_seen"] == "3"
+        assert codec.loads(result["f"]) == {"pk": 1}
+        assert codec.loads(result["e+foo"]) == "baz"
+        assert client.zrange("b:p", 0, -1) == ["foo"]
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    @mock.patch("sentry.buffer.redis.time")
+    def test_incr_keeps_first_pending_score(self, time):
+        client = self.buf.cluster.get_routing_client()
+        time.return_value = 100
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": 1})
+        time.return_value = 200
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": 1})
+
+        assert client.zrange("b:p", 0, -1, withscores=True) == [("foo", 100.0)]
+        assert client.hget("foo", "i+times_seen") == "2"
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    @mock.patch("sentry.buffer.base.Buffer.process")
+    def test_incr_legacy_codec(self, process):
+        self.buf.incr_codec_version = 0
+        client = self.buf.cluster.get_routing_client()
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": 1}, extra={"foo": "bar"})
+
+        result = client.hgetall("foo")
+        assert pickle.loads(result["f"]) == {"pk": 1}
+        assert pickle.loads(result["e+foo"]) == "bar"
+
+        self.buf.process("foo")
+        process.assert_called_once_with(Group, {"times_seen": 1}, {"pk": 1}, {"foo": "bar"})
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    @mock.patch("sentry.buffer.base.Buffer.process")
+    def test_incr_coalesces(self, process):
+        self.buf.incr_coalesce_window = 60
+        client = self.buf.cluster.get_routing_client()
+
+        with mock.patch.object(self.buf.cluster, "execute_commands") as execute_commands:
+            for i in range(10):
+                self.buf.incr(Group, {"times_seen": 1}, {"pk": 1}, extra={"foo": i})
+            assert not execute_commands.called
+            assert client.hgetall("foo") == {}
+
+        self.buf.flush_incrs()
+        assert client.zrange("b:p", 0, -1) == ["foo"]
+
+        self.buf.process("foo")
+        process.assert_called_once_with(Group, {"times_seen": 10}, {"pk": 1}, {"foo": 9})
+
+    @mock.patch(
+        "sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(side_effect=lambda m, f: f["pk"])
+    )
+    @mock.patch("sentry.buffer.base.Buffer.process_batch")
+    def test_process_bulk_flush(self, process_batch):
+        self.buf.incr_bulk_flush = True
+        client = self.buf.cluster.get_routing_client()
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": "a"}, extra={"foo": "bar"})
+        self.buf.incr(Group, {"times_seen": 2}, {"pk": "b"})
+
+        self.buf.process(batch_keys=["a", "b", "c"])
+        assert sorted(process_batch.call_args[0][0]) == [
+            (Group, {"times_seen": 1}, {"pk": "a"}, {"foo": "bar"}),
+            (Group, {"times_seen": 2}, {"pk": "b"}, {}),
+        ]
+        assert client.zrange("b:p", 0, -1) == []
+        assert client.hgetall("a") == {}
+        assert client.get("l:a") is None
+
+    @mock.patch(
+        "sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(side_effect=lambda m, f: f["pk"])
+    )
+    def test_incr_coalesce_max_keys(self):
+        self.buf.incr_coalesce_window = 60
+        self.buf.incr_coalesce_max_keys = 2
+        client = self.buf.cluster.get_routing_client()
+
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": "a"})
+        assert client.zrange("b:p", 0, -1) == []
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": "b"})
+        assert sorted(client.zrange("b:p", 0, -1)) == ["a", "b"]
+
+    @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
+    @mock.patch("sentry.buffer.redis.time")
+    def test_incr_coalesces_across_tasks(self, mock_time):
+        self.buf.incr_coalesce_window = 60
+        client = self.buf.cluster.get_routing_client()
+        mock_time.return_value = 1000
+
+        # the end of a task only flushes once the window has passed
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": 1})
+        self.buf._flush_expired_incrs()
+        self.buf.incr(Group, {"times_seen": 1}, {"pk": 1})
+        self.buf._flush_expired_incrs()
+        assert client.zrange("b:p", 0, -1) == []
+
+        mock_time.return_value = 1060
+        self.buf._flush_expired_incrs()
+        assert client.zrange("b:p", 0, -1) == ["foo"]
+        assert client.hget("foo", "i+times_seen") == "2"
+
     # this test should be passing once we no longer serialize using pickle
     @pytest.mark.xfail
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
@@ -123,6 +234,39 @@ class RedisBufferTest(TestCase):
         pending = client.zrange("b:p", 0, -1)
         assert pending == ["foo"]
 
+    @mock.patch("sentry.buffer.redis.process_incr")
+    def test_process_pending_chunks(self, process_incr):
+        self.buf.pending_chunk_size = 2
+        with self.buf.cluster.map() as client:
+            for i in range(5):
+                client.zadd("b:p", i, "foo%d" % i)
+            # added after the run started, left for the next one
+            client.zadd("b:p", time() + 60, "bar")
+
+        self.buf.process_pending()
+        assert process_incr.apply_async.mock_calls == [
+            mock.call(kwargs={"batch_keys": ["foo0", "foo1"]}),
+            mock.call(kwargs={"batch_keys": ["foo2", "foo3"]}),
+            mock.call(kwargs={"batch_keys": ["foo4"]}),
+        ]
+        client = self.buf.cluster.get_routing_client()
+        assert client.zrange("b:p", 0, -1) == ["bar"]
+
+    @mock.patch("sentry.buffer.redis.process_incr")
+    @mock.patch("sentry.buffer.redis.time")
+    def test_process_pending_deadline(self, time, process_incr):
+        time.side_effect = [100, 200]
+        self.buf.pending_chunk_size = 2
+        with self.buf.cluster.map() as client:
+            for i in range(5):
+                client.zadd("b:p", i, "foo%d" % i)
+
+        self.buf.process_pending()
+        process_incr.apply_async.assert_called_once_with(kwargs={"batch_keys": ["foo0", "foo1"]})
+        client = self.buf.cluster.get_routing_client()
+        assert client.zrange("b:p", 0, -1) == ["foo2", "foo3", "foo4"]
+        assert client.get("l:b:p") is None
+
     @mock.patch("sentry.buffer.redis.RedisBuffer._make_key", mock.Mock(return_value="foo"))
     @mock.patch("sentry.buffer.redis.process_incr")
     @mock.patch("sentry.buffer.redis.process_pending")
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from datetime import datetime
+from django.utils import timezone
+
+from sentry.buffer import codec
+from sentry.models import Group
+from sentry.testutils import TestCase
+from sentry.utils import json
+from sentry.utils.compat import pickle
+
+
+class CodecTest(TestCase):
+    def test_roundtrip(self):
+        now = datetime(2017, 5, 3, 6, 6, 6, 123456, tzinfo=timezone.utc)
+        for value in (
+            1,
+            1.5,
+            None,
+            u"☃",
+            now,
+            now.replace(tzinfo=None),
+            {"pk": 1, "datetime": now},
+            {"metadata": {"type": u"Error", "value": [1, 2]}},
+        ):
+            assert codec.loads(codec.dumps(value)) == value
+
+    def test_model_reference(self):
+        group = self.create_group()
+        result = codec.loads(codec.dumps({"group": group}))["group"]
+        assert isinstance(result, Group)
+        assert result.pk == group.pk
+
+    def test_pickle_fallback(self):
+        value = {"set": set([1, 2])}
+        assert codec.loads(codec.dumps(value)) == value
+
+    def test_smaller_than_pickle(self):
+        value = {"id": 1, "last_seen": datetime(2017, 5, 3, 6, 6, 6, tzinfo=timezone.utc)}
+        assert len(codec.dumps(value)) < len(pickle.dumps(value))
+
+    def test_loads_legacy_pickle(self):
+        assert codec.loads(pickle.dumps({"pk": 1})) == {"pk": 1}
+        assert codec.loads(pickle.dumps("bar")) == "bar"
+
+    def test_loads_legacy_json(self):
+        now = datetime(2017, 5, 3, 6, 6, 6, tzinfo=timezone.utc)
+        assert codec.loads(json.dumps({"pk": ["i", "1"], "name": ["s", "foo"]})) == {
+            "pk": 1,
+            "name": "foo",
+        }
+        assert codec.loads(json.dumps(["d", "1493791566.000000"])) == now
+        assert codec.loads(json.dumps(["f", "1.5"])) == 1.5
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import mock
+import zlib
+
+from sentry.cache.events import EventPayloadCache, SECTION_MIN_SIZE
+from sentry.cache.redis import RedisCache
+from sentry.testutils import TestCase
+from sentry.testutils.helpers import override_options
+from sentry.utils import json
+
+
+class EventPayloadCacheTest(TestCase):
+    def setUp(self):
+        self.inner = RedisCache()
+        self.cache = EventPayloadCache(self.inner)
+        self.data = {
+            "event_id": "a" * 32,
+            "platform": "native",
+            "exception": {"values": [{"type": "Crash", "value": "x" * SECTION_MIN_SIZE}]},
+            "debug_meta": {"images": [{"code_file": "y" * SECTION_MIN_SIZE}]},
+        }
+
+    def test_legacy_payload(self):
+        self.inner.set("e:1", self.data, 60)
+        assert self.cache.get("e:1") == self.data
+
+        with override_options({"store.use-payload-envelope": False}):
+            self.cache.set("e:1", self.data, 60)
+        assert self.inner.get("e:1") == self.data
+        assert self.cache.get("e:1") == self.data
+
+    @override_options({"store.use-payload-envelope": True})
+    def test_sections(self):
+        self.cache.set("e:1", self.data, 60)
+        assert self.cache.get("e:1") == self.data
+        section = self.inner.get(self.cache.make_section_key("e:1", "debug_meta"), raw=True)
+        assert json.loads(zlib.decompress(section)) == self.data["debug_meta"]
+
+        # only the section that changed is written again
+        self.data["exception"]["values"][0]["type"] = "SIGSEGV"
+        with mock.patch.object(self.inner, "set", wraps=self.inner.set) as inner_set:
+            self.cache.set("e:1", self.data, 60)
+        assert [call[0][0] for call in inner_set.call_args_list] == [
+            self.cache.make_section_key("e:1", "exception"),
+            "e:1",
+        ]
+        assert self.cache.get("e:1") == self.data
+
+        # sections that became small are inlined and their keys removed
+        self.data["debug_meta"] = {"images": []}
+        self.cache.set("e:1", self.data, 60)
+        assert self.cache.get("e:1") == self.data
+        assert self.inner.get(self.cache.make_section_key("e:1", "debug_meta")) is None
+
+        self.cache.delete("e:1")
+        assert self.cache.get("e:1") is None
+        assert self.inner.get(self.cache.make_section_key("e:1", "exception")) is None
+
+    @override_options({"store.use-payload-envelope": True})
+    def test_missing_section(self):
+        self.cache.set("e:1", self.data, 60)
+        self.inner.delete(self.cache.make_section_key("e:1", "exception"))
+        assert self.cache.get("e:1") is None
+
+    @override_options({"store.use-payload-envelope": True})
+    def test_unchanged_sections_timeout_renewed(self):
+        section_key = self.inner.make_key(self.cache.make_section_key("e:1", "debug_meta"))
+        self.cache.set("e:1", self.data, 5)
+
+        # the manifest is written again close to the end of the section's
+        # timeout, the section has to live as long as the new manifest
+        self.data["exception"]["values"][0]["type"] = "SIGSEGV"
+        with mock.patch.object(self.inner, "set", wraps=self.inner.set) as inner_set:
+            self.cache.set("e:1", self.data, 3600)
+        assert self.cache.make_section_key("e:1", "debug_meta") not in [
+            call[0][0] for call in inner_set.call_args_list
+        ]
+        assert self.inner.client.ttl(section_key) > 5
+
+        # a section that expired in between is written again
+        self.inner.client.delete(section_key)
+        self.cache.set("e:1", self.data, 3600)
+        assert self.cache.get("e:1") == self.data
@@ -13,6 +13,7 @@ from django.utils import timezone
 from time import time
 
 from sentry.app import tsdb
+from sentry.buffer import codec
 from sentry.constants import MAX_VERSION_LENGTH
 from sentry.event_manager import HashDiscarded, EventManager, EventUser
 from sentry.grouping.utils import hash_from_values
@@ -118,6 +119,28 @@ class EventManagerTest(TestCase):
 
         assert Event.objects.count() == 1
 
+    def test_dupe_message_id_filter(self):
+        event_id = "a" * 32
+
+        with self.options(
+            {"store.event-id-filter.write": True, "store.event-id-filter.read": True}
+        ):
+            manager = EventManager(make_event(event_id=event_id))
+            manager.normalize()
+            with mock.patch.object(
+                Event.objects, "filter", wraps=Event.objects.filter
+            ) as mock_filter:
+                event = manager.save(1)
+
+            # the filter hasn't seen the id, so there is no duplicate lookup
+            assert not any("event_id__in" in kwargs for _, kwargs in mock_filter.call_args_list)
+
+            manager = EventManager(make_event(event_id=event_id))
+            manager.normalize()
+            assert manager.save(1).id == event.id
+
+        assert Event.objects.count() == 1
+
     def test_updates_group(self):
         timestamp = time() - 300
         manager = EventManager(
@@ -144,6 +167,22 @@ class EventManagerTest(TestCase):
         assert group.data.get("type") == "default"
         assert group.data.get("metadata") == {"title": "foo bar"}
 
+    @mock.patch("sentry.event_manager.buffer.incr")
+    def test_updates_group_without_pickled_extra(self, buffer_incr):
+        timestamp = time() - 300
+        for offset in (0, 2.0):
+            manager = EventManager(make_event(checksum="a" * 32, timestamp=timestamp + offset))
+            manager.normalize()
+            manager.save(1)
+
+        (model, columns, filters, extra), _ = buffer_incr.call_args
+        assert model is Group
+        # ``score`` is computed by ``Buffer.process`` when the increment is flushed
+        assert "score" not in extra
+        with mock.patch("sentry.buffer.codec.pickle.dumps") as pickle_dumps:
+            codec.dumps(extra)
+        assert not pickle_dumps.called
+
     def test_updates_group_with_fingerprint(self):
         ts = time() - 200
         manager = EventManager(
@@ -1163,6 +1202,69 @@ class EventManagerTest(TestCase):
             == 1
         )
 
+    def test_save_many(self):
+        ts = time() - 100
+        events = [
+            make_event(event_id="a" * 32, checksum="a" * 32, release="1.0", timestamp=ts),
+            make_event(event_id="b" * 32, checksum="a" * 32, release="1.0", timestamp=ts + 1),
+            make_event(event_id="c" * 32, checksum="c" * 32, release="1.0", timestamp=ts + 2),
+        ]
+
+        with self.tasks():
+            event1, event2, event3 = EventManager.save_many(self.project.id, events)
+
+        assert Event.objects.filter(project_id=self.project.id).count() == 3
+        assert event1.group_id == event2.group_id
+        assert event1.group_id != event3.group_id
+        assert Release.objects.filter(version="1.0").count() == 1
+        assert Group.objects.get(id=event1.group_id).times_seen == 2
+
+        def query(model, key):
+            return tsdb.get_sums(model, [key], event1.datetime, event3.datetime)[key]
+
+        assert query(tsdb.models.project, self.project.id) == 3
+        assert query(tsdb.models.group, event1.group_id) == 2
+        assert query(tsdb.models.group, event3.group_id) == 1
+
+    def test_save_many_duplicates(self):
+        manager = EventManager(make_event(event_id="a" * 32))
+        manager.normalize()
+        existing = manager.save(self.project.id)
+
+        events = [make_event(event_id="a" * 32), make_event(event_id="b" * 32)]
+        events.append(make_event(event_id="b" * 32))
+        event1, event2, event3 = EventManager.save_many(self.project.id, events)
+
+        assert event1.id == existing.id
+        assert event2 is event3
+        assert Event.objects.filter(project_id=self.project.id).count() == 2
+
+    @mock.patch("sentry.event_manager.EventManager._save_aggregate")
+    def test_save_many_discarded(self, mock_save_aggregate):
+        mock_save_aggregate.side_effect = HashDiscarded
+        (event,) = EventManager.save_many(self.project.id, [make_event()])
+
+        assert event is None
+        assert not Event.objects.filter(project_id=self.project.id).exists()
+
+    def test_save_many_failing_event(self):
+        save_aggregate = EventManager._save_aggregate
+
+        def failing_save_aggregate(manager, *args, **kwargs):
+            if manager._data["event_id"] == "a" * 32:
+                raise ValueError("boom")
+            return save_aggregate(manager, *args, **kwargs)
+
+        events = [make_event(event_id="a" * 32), make_event(event_id="b" * 32)]
+        with mock.patch.object(EventManager, "_save_aggregate", failing_save_aggregate):
+            failed, event = EventManager.save_many(self.project.id, events)
+
+        assert isinstance(failed, ValueError)
+        assert event.event_id == "b" * 32
+        assert list(
+            Event.objects.filter(project_id=self.project.id).values_list("event_id", flat=True)
+        ) == ["b" * 32]
+
 
 class ReleaseIssueTest(TestCase):
     def setUp(self):
@@ -199,3 +199,36 @@ def test_package_matching():
     assert not bool(
         bundled_rule.get_matching_frame_actions({"package": "/usr/lib/linux-gate.so"}, "native")
     )
+
+
+def test_compiled_matching():
+    enhancement = Enhancements.from_config_string(
+        """
+        family:native package:/var/**/Frameworks/**    -app
+        family:native function:std::*                  -app
+        family:javascript path:**/test.js app:no       +app
+        family:javascript path:**/test.js app:yes      -group
+        module:core::*                                 -group
+        app:no                                         -group
+    """,
+        bases=["common:v1"],
+    )
+    frames = [
+        {"function": "std::whatever", "platform": "native"},
+        {"package": "/var/containers/MyApp/Frameworks/libsomething", "in_app": True},
+        {"abs_path": "http://example.com/foo/TEST.js", "platform": "javascript", "in_app": False},
+        {"abs_path": "http://example.com/foo/bar.js", "platform": "javascript"},
+        {"module": "core::panicking", "filename": "C:\\core\\panicking.rs"},
+        {"filename": "main.c", "in_app": False},
+    ]
+
+    for platform in ("native", "javascript"):
+        expected = [
+            (rule, idx)
+            for rule in enhancement.iter_rules()
+            for idx, frame in enumerate(frames)
+            if rule.get_matching_frame_actions(frame, platform)
+        ]
+        assert list(enhancement.compiled.iter_matches(frames, platform)) == expected
+
+    assert Enhancements.loads(enhancement.dumps()).compiled is enhancement.compiled
@@ -8,10 +8,25 @@ import pytest
 
 from sentry.models import Event
 from sentry.event_manager import EventManager
-from sentry.grouping.api import apply_server_fingerprinting
+from sentry.grouping.api import apply_server_fingerprinting, get_fingerprinting_config_for_project
 from sentry.grouping.fingerprinting import FingerprintingRules
 
 
+@pytest.mark.django_db
+def test_project_config_is_shared(default_project):
+    default_project.update_option(
+        "sentry:fingerprinting_rules", "type:DatabaseUnavailable -> DatabaseUnavailable"
+    )
+    rules = get_fingerprinting_config_for_project(default_project)
+    assert rules.to_json() == {
+        "version": 1,
+        "rules": [
+            {"matchers": [["type", "DatabaseUnavailable"]], "fingerprint": ["DatabaseUnavailable"]}
+        ],
+    }
+    assert get_fingerprinting_config_for_project(default_project) is rules
+
+
 def test_basic_parsing(insta_snapshot):
     rules = FingerprintingRules.from_config_string(
         """
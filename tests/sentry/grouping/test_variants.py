@@ -51,6 +51,12 @@ def dump_variant(variant, lines=None, indent=0):
     return lines
 
 
+def test_loaded_config_is_shared():
+    config = load_grouping_config(get_default_grouping_config_dict())
+    assert load_grouping_config(get_default_grouping_config_dict()) is config
+    assert load_grouping_config(get_default_grouping_config_dict("legacy:2019-03-12")) is not config
+
+
 _fixture_path = os.path.join(os.path.dirname(__file__), "grouping_inputs")
 
 
@@ -190,6 +190,7 @@ class JavascriptIntegrationTest(TestCase, SnubaTestCase):
             release=None,
             dist=None,
             allow_scraping=True,
+            release_files={},
         )
 
         event = self.get_event()
@@ -250,6 +251,7 @@ class JavascriptIntegrationTest(TestCase, SnubaTestCase):
             release=None,
             dist=None,
             allow_scraping=True,
+            release_files={},
         )
 
         event = self.get_event()
@@ -764,6 +766,21 @@ class JavascriptIntegrationTest(TestCase, SnubaTestCase):
             "\t\treturn multiply(add(a, b), a, b) / c;",
         ]
 
+        # the frames of the next event are taken from the frame cache
+        with patch("sentry.lang.javascript.processor.fetch_file") as mock_fetch_file:
+            resp = self._postWithHeader(data)
+            assert resp.status_code, 200
+
+        assert not mock_fetch_file.called
+
+        events = eventstore.get_events(filter_keys={"project_id": [self.project.id]})
+        assert len(events) == 2
+        for event in events:
+            assert "errors" not in event.data
+            frames = event.interfaces["exception"].values[0].stacktrace.frames
+            assert frames[0].context_line == u"\treturn a + b; // fôo"
+            assert frames[1].context_line == "\treturn a * b;"
+
     @responses.activate
     def test_expansion_via_distribution_release_artifacts(self):
         project = self.project
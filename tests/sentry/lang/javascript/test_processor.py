@@ -20,6 +20,8 @@ from sentry.lang.javascript.processor import (
     generate_module,
     trim_line,
     fetch_release_file,
+    lookup_release_files,
+    read_release_file,
     UnparseableSourcemap,
     get_max_age,
     CACHE_CONTROL_MAX,
@@ -58,6 +60,78 @@ class JavaScriptStacktraceProcessorTest(TestCase):
         r = JavaScriptStacktraceProcessor({}, None, project)
         assert not r.allow_scraping
 
+    @patch("sentry.lang.javascript.processor.fetch_sourcemap")
+    @patch("sentry.lang.javascript.processor.fetch_file")
+    def test_cache_sources(self, mock_fetch_file, mock_fetch_sourcemap):
+        def fetch_file(url, **kwargs):
+            if url == "http://example.com/broken.js":
+                raise http.BadSource({"type": EventError.FETCH_GENERIC_ERROR, "url": url})
+            body = u"console.log(1);\n//# sourceMappingURL=bundle.js.map"
+            return http.UrlResult(url, {}, body, 200, "utf-8")
+
+        mock_fetch_file.side_effect = fetch_file
+        mock_fetch_sourcemap.return_value.iter_sources.return_value = []
+
+        r = JavaScriptStacktraceProcessor({}, None, self.create_project())
+        r.max_fetches = 3
+        r.cache_sources(
+            [
+                "http://example.com/a.js",
+                "http://example.com/b.js",
+                "http://example.com/broken.js",
+                "http://example.com/c.js",
+            ]
+        )
+
+        assert mock_fetch_file.call_count == 3
+        # the sourcemap is shared by both files and only fetched once
+        assert mock_fetch_sourcemap.call_count == 1
+        assert mock_fetch_sourcemap.call_args[0] == ("http://example.com/bundle.js.map",)
+
+        assert r.cache.get("http://example.com/a.js") is not None
+        assert r.sourcemaps.get_link("http://example.com/b.js") == (
+            "http://example.com/bundle.js.map",
+            mock_fetch_sourcemap.return_value,
+        )
+        assert r.cache.get_errors("http://example.com/broken.js") == [
+            {"type": EventError.FETCH_GENERIC_ERROR, "url": "http://example.com/broken.js"}
+        ]
+        assert r.cache.get_errors("http://example.com/c.js") == [
+            {"type": EventError.JS_TOO_MANY_REMOTE_SOURCES}
+        ]
+
+
+    @patch("sentry.lang.javascript.processor.lookup_release_files")
+    @patch("sentry.lang.javascript.processor.fetch_sourcemap")
+    @patch("sentry.lang.javascript.processor.fetch_file")
+    def test_cache_sources_resolves_sourcemaps_upfront(
+        self, mock_fetch_file, mock_fetch_sourcemap, mock_lookup_release_files
+    ):
+        def fetch_file(url, **kwargs):
+            body = u"console.log(1);\n//# sourceMappingURL=%s.map" % url.rsplit("/", 1)[-1]
+            return http.UrlResult(url, {}, body, 200, "utf-8")
+
+        mock_fetch_file.side_effect = fetch_file
+        mock_fetch_sourcemap.return_value.iter_sources.return_value = []
+        mock_lookup_release_files.return_value = {}
+
+        project = self.create_project()
+        r = JavaScriptStacktraceProcessor({}, None, project)
+        r.release = Release.objects.create(organization_id=project.organization_id, version="abc")
+        r.cache_sources(["http://example.com/a.js", "http://example.com/b.js"])
+
+        # sources and their sourcemaps are looked up with a single query
+        assert mock_lookup_release_files.call_count == 1
+        assert sorted(mock_lookup_release_files.call_args[0][0]) == [
+            "http://example.com/a.js",
+            "http://example.com/a.js.map",
+            "http://example.com/b.js",
+            "http://example.com/b.js.map",
+        ]
+        assert sorted(call[0][0] for call in mock_fetch_sourcemap.call_args_list) == [
+            "http://example.com/a.js.map",
+            "http://example.com/b.js.map",
+        ]
 
 class FetchReleaseFileTest(TestCase):
     def test_unicode(self):
@@ -179,6 +253,45 @@ class FetchReleaseFileTest(TestCase):
             "utf-8",
         )
 
+    def test_lookup_many(self):
+        project = self.project
+        release = Release.objects.create(organization_id=project.organization_id, version="abc")
+        release.add_project(project)
+
+        for name in ("~/app.min.js", "~/app.min.js.map"):
+            file = File.objects.create(name=name, type="release.file", headers={})
+            file.putfile(six.BytesIO(b"foo"))
+            ReleaseFile.objects.create(
+                name=name, release=release, organization_id=project.organization_id, file=file
+            )
+
+        filenames = [
+            "http://example.com/app.min.js",
+            "http://example.com/app.min.js.map",
+            "http://example.com/missing.js",
+        ]
+        with self.assertNumQueries(1):
+            result = lookup_release_files(filenames, release)
+
+        assert result["http://example.com/app.min.js"].name == "~/app.min.js"
+        assert result["http://example.com/app.min.js.map"].name == "~/app.min.js.map"
+        assert result["http://example.com/missing.js"] is None
+
+        read_release_file(
+            "http://example.com/app.min.js", release, result["http://example.com/app.min.js"]
+        )
+
+        # the artifact that was read and the miss are cached now
+        with self.assertNumQueries(0):
+            result = lookup_release_files(
+                ["http://example.com/app.min.js", "http://example.com/missing.js"], release
+            )
+
+        assert result["http://example.com/app.min.js"] == http.UrlResult(
+            "http://example.com/app.min.js", {}, b"foo", 200, None
+        )
+        assert result["http://example.com/missing.js"] is None
+
 
 class FetchFileTest(TestCase):
     @responses.activate
@@ -524,6 +637,10 @@ class FetchSourcemapTest(TestCase):
         assert sv.get_source() == u'console.log("hello, World!")'
         assert smap_view.get_source_name(0) == u"/test.js"
 
+    def test_reuses_parsed_view(self):
+        smap_view = fetch_sourcemap(base64_sourcemap)
+        assert fetch_sourcemap(base64_sourcemap.rstrip("=")) is smap_view
+
     def test_broken_base64(self):
         with pytest.raises(UnparseableSourcemap):
             fetch_sourcemap("data:application/json;base64,xxx")
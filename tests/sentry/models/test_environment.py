@@ -1,8 +1,10 @@
 from __future__ import absolute_import
 
+import mock
 import pytest
 
 from sentry.models import Environment
+from sentry.models.environment import _local_cache
 from sentry.testutils import TestCase
 
 
@@ -25,6 +27,20 @@ class GetOrCreateTest(TestCase):
         with self.assertNumQueries(0):
             assert Environment.get_for_organization_id(project.organization_id, "prod").id == env.id
 
+    def test_local_cache(self):
+        project = self.create_project()
+        env = Environment.get_or_create(project=project, name="prod")
+
+        with mock.patch("sentry.models.environment.cache") as mock_cache:
+            with self.assertNumQueries(0):
+                assert Environment.get_or_create(project=project, name="prod").id == env.id
+            assert not mock_cache.get.called
+
+        cache_key = Environment.get_cache_key(project.organization_id, "prod")
+        assert _local_cache.get(cache_key) is not None
+        env.delete()
+        assert _local_cache.get(cache_key) is None
+
 
 @pytest.mark.parametrize(
     "val,expected",
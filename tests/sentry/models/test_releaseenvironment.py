@@ -4,6 +4,7 @@ from datetime import timedelta
 from django.utils import timezone
 
 from sentry.models import Environment, Release, ReleaseEnvironment
+from sentry.models.releaseenvironment import _local_cache
 from sentry.testutils import TestCase
 
 
@@ -53,3 +54,31 @@ class GetOrCreateTest(TestCase):
         )
         assert relenv.id == relenv2.id
         assert ReleaseEnvironment.objects.get(id=relenv.id).last_seen == relenv2.last_seen
+
+    def test_local_cache_evicts_changed_instance(self):
+        project = self.create_project(name="foo")
+        release = Release.objects.create(organization_id=project.organization_id, version="abcdef")
+        release.add_project(project)
+
+        relenvs = []
+        for name in ("prod", "staging"):
+            env = Environment.objects.create(
+                project_id=project.id, organization_id=project.organization_id, name=name
+            )
+            relenvs.append(
+                ReleaseEnvironment.get_or_create(
+                    project=project, release=release, environment=env, datetime=timezone.now()
+                )
+            )
+
+        cache_keys = [
+            ReleaseEnvironment.get_cache_key(
+                project.organization_id, relenv.release_id, relenv.environment_id
+            )
+            for relenv in relenvs
+        ]
+        assert all(_local_cache.get(cache_key) is not None for cache_key in cache_keys)
+
+        relenvs[0].save()
+        assert _local_cache.get(cache_keys[0]) is None
+        assert _local_cache.get(cache_keys[1]) is not None
@@ -1,6 +1,11 @@
 from __future__ import absolute_import
 
-from sentry.models import ReleaseFile
+import os
+import shutil
+import six
+import tempfile
+
+from sentry.models import File, ReleaseFile
 from sentry.testutils import TestCase
 
 
@@ -29,3 +34,56 @@ class ReleaseFileTestCase(TestCase):
         # unclear if we actually experience this case in the real
         # world, but worth documenting the behavior
         assert n("foo.js") == ["foo.js", "~foo.js"]
+
+
+class ReleaseFileCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path)
+
+    def create_file(self, contents):
+        file = File.objects.create(name="foo.js", type="release.file")
+        file.putfile(six.BytesIO(contents))
+        return file
+
+    def test_getfile(self):
+        file = self.create_file(b"foo")
+
+        with self.options({"releasefile.cache-path": self.cache_path}):
+            assert ReleaseFile.cache.get(file.checksum) is None
+            assert ReleaseFile.cache.getfile(file)[:] == b"foo"
+            assert ReleaseFile.cache.get(file.checksum)[:] == b"foo"
+
+            assert ReleaseFile.cache.getfile(self.create_file(b"")) == b""
+
+    def test_clear_old_entries(self):
+        old_file = self.create_file(b"a" * 10)
+        new_file = self.create_file(b"b" * 10)
+
+        with self.options(
+            {"releasefile.cache-path": self.cache_path, "releasefile.cache-limit": 15}
+        ):
+            ReleaseFile.cache.getfile(old_file)
+            ReleaseFile.cache.getfile(new_file)
+            os.utime(os.path.join(self.cache_path, old_file.checksum), (0, 0))
+
+            ReleaseFile.cache.clear_old_entries()
+
+            assert ReleaseFile.cache.get(old_file.checksum) is None
+            assert ReleaseFile.cache.get(new_file.checksum)[:] == b"b" * 10
+
+    def test_clear_old_tempfiles(self):
+        old_tempfile = os.path.join(self.cache_path, "tmpold")
+        new_tempfile = os.path.join(self.cache_path, "tmpnew")
+        for path in (old_tempfile, new_tempfile):
+            with open(path, "wb") as f:
+                f.write(b"x")
+        os.utime(old_tempfile, (0, 0))
+
+        with self.options({"releasefile.cache-path": self.cache_path}):
+            ReleaseFile.cache.clear_old_entries()
+
+        assert not os.path.exists(old_tempfile)
+        assert os.path.exists(new_tempfile)
@@ -93,6 +93,23 @@ class RedisQuotaTest(TestCase):
         assert quotas[1].limit == 300
         assert quotas[1].window == 60
 
+    def test_caches_quotas(self):
+        self.get_project_quota.return_value = (200, 60)
+        self.get_organization_quota.return_value = (300, 60)
+
+        with mock.patch.object(RedisQuota, "get_quotas", wraps=self.quota.get_quotas) as get_quotas:
+            for _ in xrange(3):
+                assert not self.quota.is_rate_limited(self.project).is_limited
+            assert get_quotas.call_count == 1
+
+            key = self.create_project_key(project=self.project)
+            self.quota.is_rate_limited(self.project, key=key)
+            assert get_quotas.call_count == 2
+
+        assert self.quota.get_usage(
+            self.project.organization_id, self.quota.get_quotas(self.project)
+        ) == [4, 4]
+
     @mock.patch("sentry.quotas.redis.is_rate_limited")
     @mock.patch.object(RedisQuota, "get_quotas", return_value=[])
     def test_bails_immediately_without_any_quota(self, get_quotas, is_rate_limited):
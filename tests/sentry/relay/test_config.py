@@ -0,0 +1,64 @@
+from __future__ import absolute_import
+
+import mock
+
+from sentry.message_filters import set_filter_state
+from sentry.models import OrganizationOption
+from sentry.relay.config import get_project_config
+from sentry.testutils import TestCase
+from sentry.utils.data_filters import FilterStatKeys
+
+
+class GetStoreProjectConfigTest(TestCase):
+    def test_cached(self):
+        config = get_project_config(self.project.id, for_store=True)
+        assert config.sensitive_data_filter is not None
+
+        cached = get_project_config(self.project.id, for_store=True)
+        assert cached.config is config.config
+        assert cached.filter_matchers is config.filter_matchers
+        assert cached.sensitive_data_filter is config.sensitive_data_filter
+        assert cached.project is not config.project
+        assert cached.project.organization == self.organization
+
+    @mock.patch("sentry.relay.config.SensitiveDataFilter")
+    @mock.patch("sentry.relay.config.compile_filter_matchers")
+    def test_compiled_lazily(self, compile_filter_matchers, sensitive_data_filter):
+        config = get_project_config(self.project.id)
+        assert not compile_filter_matchers.called
+        assert not sensitive_data_filter.called
+
+        assert config.filter_matchers is compile_filter_matchers.return_value
+        assert config.filter_matchers is compile_filter_matchers.return_value
+        assert config.sensitive_data_filter is sensitive_data_filter.return_value
+        assert compile_filter_matchers.call_count == 1
+        assert sensitive_data_filter.call_count == 1
+
+    def test_project_option_changed(self):
+        config = get_project_config(self.project.id, for_store=True)
+
+        self.project.update_option("sentry:scrub_data", False)
+
+        config = get_project_config(self.project.id, for_store=True)
+        assert not config.config["scrub_data"]
+        assert config.sensitive_data_filter is None
+
+    def test_filter_state_changed(self):
+        config = get_project_config(self.project.id, for_store=True)
+        assert not config.config["filter_settings"][FilterStatKeys.LOCALHOST]["is_enabled"]
+
+        set_filter_state(FilterStatKeys.LOCALHOST, self.project, {"active": True})
+
+        config = get_project_config(self.project.id, for_store=True)
+        assert config.config["filter_settings"][FilterStatKeys.LOCALHOST]["is_enabled"]
+
+    def test_organization_option_changed(self):
+        self.project.update_option("sentry:scrub_data", False)
+        config = get_project_config(self.project.id, for_store=True)
+        assert not config.config["scrub_data"]
+
+        OrganizationOption.objects.set_value(self.organization, "sentry:require_scrub_data", True)
+
+        config = get_project_config(self.project.id, for_store=True)
+        assert config.config["scrub_data"]
+        assert config.sensitive_data_filter is not None
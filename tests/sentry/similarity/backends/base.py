@@ -162,6 +162,25 @@ class MinHashIndexBackendTestMixin(object):
             == [("4", [1.0, None]), ("1", [1.0, 0.0]), ("2", [1.0, 0.0]), ("3", [1.0, 0.0])]
         )
 
+    def test_record_multi(self):
+        self.index.record_multi(
+            "example",
+            [
+                ("1", [("index", "hello world")]),
+                ("2", [("index", "hello world")]),
+                ("3", []),
+                # recorded at a timestamp that is outside of the retention
+                ("5", [("index", "hello world")], 0),
+            ],
+        )
+        self.index.record("example", "4", [("index", "hello world")])
+
+        assert self.index.compare("example", "4", [("index", 0)]) == [
+            ("1", [1.0]),
+            ("2", [1.0]),
+            ("4", [1.0]),
+        ]
+
     def test_merge(self):
         self.index.record("example", "1", [("index", ["foo", "bar"])])
         self.index.record("example", "2", [("index", ["baz"])])
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+
+import time
+
+from exam import fixture
+
+from sentry.similarity.backends.local import LocalIndexBackend
+from sentry.similarity.backends.redis import RedisScriptMinHashIndexBackend
+from sentry.similarity.signatures import MinHashSignatureBuilder
+from sentry.testutils import TestCase
+from sentry.utils import redis
+
+from .base import MinHashIndexBackendTestMixin
+
+
+class LocalIndexBackendTestCase(MinHashIndexBackendTestMixin, TestCase):
+    @fixture
+    def backend(self):
+        return RedisScriptMinHashIndexBackend(
+            redis.clusters.get("default").get_local_client(0),
+            "sim",
+            MinHashSignatureBuilder(32, 0xFFFF),
+            16,
+            60 * 60,
+            12,
+            10,
+        )
+
+    @fixture
+    def index(self):
+        return LocalIndexBackend(self.backend, ttl=60)
+
+    def test_matches_redis(self):
+        index = LocalIndexBackend(self.backend, ttl=60, max_keys=3)
+        for key, value in enumerate(["hello world", "jello world", "yellow world", "pizza"]):
+            index.record("example", "%s" % key, [("index", value)])
+
+        # too many keys to be copied
+        assert index.compare("example", "0", [("index", 0)]) == self.backend.compare(
+            "example", "0", [("index", 0)]
+        )
+
+        index.delete("example", [("index", "3")])
+        assert index.compare("example", "0", [("index", 0)]) == self.backend.compare(
+            "example", "0", [("index", 0)]
+        )
+        assert index.classify("example", [("index", 2, "mellow world")]) == self.backend.classify(
+            "example", [("index", 2, "mellow world")]
+        )
+
+    def test_export_import(self):
+        self.index.record("example", "1", [("index", "hello world")])
+        assert self.index.compare("example", "1", [("index", 0)]) == [("1", [1.0])]
+
+        timestamp = int(time.time())
+        result = self.index.export("example", [("index", 1)], timestamp=timestamp)
+        self.index.import_("example", [("index", 2, result[0])], timestamp=timestamp)
+
+        assert self.index.compare("example", "1", [("index", 0)]) == [("1", [1.0]), ("2", [1.0])]
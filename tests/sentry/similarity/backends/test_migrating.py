@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+
+import time
+
+from exam import fixture
+
+from sentry.similarity.backends.migrating import MigratingIndexBackend
+from sentry.similarity.backends.redis import RedisScriptMinHashIndexBackend
+from sentry.similarity.signatures import BatchedMinHashSignatureBuilder, MinHashSignatureBuilder
+from sentry.testutils import TestCase
+from sentry.utils import redis
+
+from .base import MinHashIndexBackendTestMixin
+
+
+def make_backend(namespace, signature_builder):
+    return RedisScriptMinHashIndexBackend(
+        redis.clusters.get("default").get_local_client(0),
+        namespace,
+        signature_builder,
+        16,
+        60 * 60,
+        12,
+        10,
+    )
+
+
+class MigratingIndexBackendTestCase(MinHashIndexBackendTestMixin, TestCase):
+    @fixture
+    def index(self):
+        return MigratingIndexBackend(
+            [
+                make_backend("sim:1", MinHashSignatureBuilder(32, 0xFFFF)),
+                make_backend("sim:2", BatchedMinHashSignatureBuilder(32, 0xFFFF)),
+            ]
+        )
+
+    def test_writes_all_indexes(self):
+        self.index.record("example", "1", [("index", ["foo", "bar"])])
+        for backend in self.index.backends:
+            assert backend.classify("example", [("index", 0, ["foo", "bar"])]) == [("1", [1.0])]
+
+        self.index.delete("example", [("index", "1")])
+        for backend in self.index.backends:
+            assert backend.classify("example", [("index", 0, ["foo", "bar"])]) == []
+
+    def test_export_import(self):
+        self.index.record("example", "1", [("index", "hello world")])
+
+        timestamp = int(time.time())
+        result = self.index.export("example", [("index", 1)], timestamp=timestamp)
+        assert len(result) == 1
+        assert len(result[0]) == 2
+
+        self.index.import_("example", [("index", 2, result[0])], timestamp=timestamp)
+
+        for backend in self.index.backends:
+            assert backend.compare("example", "1", [("index", 0)]) == [("1", [1.0]), ("2", [1.0])]
@@ -3,7 +3,7 @@ from __future__ import absolute_import
 from collections import Counter
 from unittest import TestCase
 
-from sentry.similarity.signatures import MinHashSignatureBuilder
+from sentry.similarity.signatures import BatchedMinHashSignatureBuilder, MinHashSignatureBuilder
 
 
 class MinHashSignatureBuilderTestCase(TestCase):
@@ -30,3 +30,25 @@ class MinHashSignatureBuilderTestCase(TestCase):
         self.assertAlmostEqual(
             similarity, estimation, delta=0.1  # totally made up constant, seems reasonable
         )
+
+
+class BatchedMinHashSignatureBuilderTestCase(TestCase):
+    def test_signatures(self):
+        n = 30
+        r = 0xFFFF
+        get_signature = BatchedMinHashSignatureBuilder(n, r)
+        assert get_signature(["foo", "bar", "baz"]) == get_signature(["baz", "foo", "bar", "foo"])
+
+        assert len(get_signature("hello world")) == n
+        for value in get_signature("hello world"):
+            assert 0 <= value < r
+
+        a = set("the quick grown box jumps over the hazy fog".split())
+        b = set("the quick brown fox jumps over the lazy dog".split())
+
+        matches = sum(x == y for x, y in zip(get_signature(a), get_signature(b)))
+
+        similarity = len(a & b) / float(len(a | b))
+        estimation = matches / float(n)
+
+        self.assertAlmostEqual(similarity, estimation, delta=0.1)
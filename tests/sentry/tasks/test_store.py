@@ -7,7 +7,13 @@ from time import time
 from sentry import quotas, tsdb
 from sentry.event_manager import EventManager, HashDiscarded
 from sentry.plugins import Plugin2
-from sentry.tasks.store import preprocess_event, process_event, save_event
+from sentry.tasks.store import (
+    flush_save_event_batch,
+    preprocess_event,
+    process_event,
+    save_event,
+    save_event_batch,
+)
 from sentry.testutils import PluginTestCase
 from sentry.utils.dates import to_datetime
 
@@ -74,9 +80,106 @@ class StoreTasksTest(PluginTestCase):
         assert mock_process_event.delay.call_count == 0
         assert mock_save_event.delay.call_count == 1
 
+    @mock.patch("sentry.tasks.store._do_save_event")
     @mock.patch("sentry.tasks.store.save_event")
-    @mock.patch("sentry.tasks.store.default_cache")
-    def test_process_event_mutate_and_save(self, mock_default_cache, mock_save_event):
+    @mock.patch("sentry.tasks.store.process_event")
+    def test_save_inline(self, mock_process_event, mock_save_event, mock_do_save_event):
+        project = self.create_project()
+
+        data = {
+            "project": project.id,
+            "platform": "NOTMATTLANG",
+            "logentry": {"formatted": "test"},
+            "extra": {"foo": "bar"},
+        }
+
+        with self.options({"store.inline-save-projects-opt-in": [project.id]}):
+            preprocess_event(cache_key="e:1", data=data, start_time=1, event_id="a" * 32)
+
+        assert mock_process_event.delay.call_count == 0
+        assert mock_save_event.delay.call_count == 0
+        mock_do_save_event.assert_called_once_with("e:1", data, 1, "a" * 32, project.id)
+
+    @mock.patch("sentry.tasks.store.flush_save_event_batch")
+    @mock.patch("sentry.tasks.store.save_event_batch")
+    @mock.patch("sentry.tasks.store.save_event")
+    def test_save_event_batched(
+        self, mock_save_event, mock_save_event_batch, mock_flush_save_event_batch
+    ):
+        project = self.create_project()
+
+        data = {
+            "project": project.id,
+            "platform": "NOTMATTLANG",
+            "logentry": {"formatted": "test"},
+            "extra": {"foo": "bar"},
+        }
+
+        with self.options({"store.save-event-batch-size": 2}):
+            preprocess_event(cache_key="e:1", data=data, start_time=1, event_id="a" * 32)
+
+            # the first event of a batch schedules a flush
+            mock_flush_save_event_batch.apply_async.assert_called_once_with(
+                kwargs={"project_id": project.id}, countdown=1
+            )
+            assert mock_save_event_batch.delay.call_count == 0
+
+            preprocess_event(cache_key="e:2", data=data, start_time=2, event_id="b" * 32)
+
+            # the batch is full now
+            mock_save_event_batch.delay.assert_called_once_with(
+                project_id=project.id,
+                events=[
+                    {"cache_key": "e:1", "start_time": 1, "event_id": "a" * 32},
+                    {"cache_key": "e:2", "start_time": 2, "event_id": "b" * 32},
+                ],
+            )
+
+            # a batch that didn't fill up is sent by the scheduled flush
+            preprocess_event(cache_key="e:3", data=data, start_time=3, event_id="c" * 32)
+            flush_save_event_batch(project_id=project.id)
+
+        assert mock_save_event_batch.delay.call_args == mock.call(
+            project_id=project.id,
+            events=[{"cache_key": "e:3", "start_time": 3, "event_id": "c" * 32}],
+        )
+        assert mock_flush_save_event_batch.apply_async.call_count == 2
+        assert mock_save_event.delay.call_count == 0
+
+    @mock.patch("sentry.tasks.store._cleanup_saved_event")
+    @mock.patch("sentry.tasks.store._track_saved_event")
+    @mock.patch("sentry.event_manager.EventManager.save_many")
+    @mock.patch("sentry.tasks.store.event_cache")
+    def test_save_event_batch_failing_event(
+        self, mock_event_cache, mock_save_many, mock_track_saved_event, mock_cleanup_saved_event
+    ):
+        project = self.create_project()
+        payloads = {
+            "e:1": {"event_id": "a" * 32, "platform": "python"},
+            "e:2": {"event_id": "b" * 32, "platform": "python"},
+        }
+        mock_event_cache.get.side_effect = lambda cache_key: dict(payloads[cache_key])
+        error = ValueError("boom")
+        event = mock.Mock()
+        mock_save_many.return_value = [error, event]
+
+        save_event_batch(
+            project_id=project.id,
+            events=[{"cache_key": "e:1", "start_time": 1}, {"cache_key": "e:2", "start_time": 2}],
+        )
+
+        # only the saved event is tracked, both payloads are cleaned up
+        mock_track_saved_event.assert_called_once_with(
+            event, "e:2", None, to_datetime(2), "b" * 32
+        )
+        assert [call[0][:2] for call in mock_cleanup_saved_event.call_args_list] == [
+            (None, "e:1"),
+            (event, "e:2"),
+        ]
+
+    @mock.patch("sentry.tasks.store.save_event")
+    @mock.patch("sentry.tasks.store.event_cache")
+    def test_process_event_mutate_and_save(self, mock_event_cache, mock_save_event):
         project = self.create_project()
 
         data = {
@@ -86,12 +189,12 @@ class StoreTasksTest(PluginTestCase):
             "extra": {"foo": "bar"},
         }
 
-        mock_default_cache.get.return_value = data
+        mock_event_cache.get.return_value = data
 
         process_event(cache_key="e:1", start_time=1)
 
         # The event mutated, so make sure we save it back
-        (_, (key, event, duration), _), = mock_default_cache.set.mock_calls
+        (_, (key, event, duration), _), = mock_event_cache.set.mock_calls
 
         assert key == "e:1"
         assert "extra" not in event
@@ -102,8 +205,8 @@ class StoreTasksTest(PluginTestCase):
         )
 
     @mock.patch("sentry.tasks.store.save_event")
-    @mock.patch("sentry.tasks.store.default_cache")
-    def test_process_event_no_mutate_and_save(self, mock_default_cache, mock_save_event):
+    @mock.patch("sentry.tasks.store.event_cache")
+    def test_process_event_no_mutate_and_save(self, mock_event_cache, mock_save_event):
         project = self.create_project()
 
         data = {
@@ -113,20 +216,20 @@ class StoreTasksTest(PluginTestCase):
             "extra": {"foo": "bar"},
         }
 
-        mock_default_cache.get.return_value = data
+        mock_event_cache.get.return_value = data
 
         process_event(cache_key="e:1", start_time=1)
 
         # The event did not mutate, so we shouldn't reset it in cache
-        assert mock_default_cache.set.call_count == 0
+        assert mock_event_cache.set.call_count == 0
 
         mock_save_event.delay.assert_called_once_with(
             cache_key="e:1", data=None, start_time=1, event_id=None, project_id=project.id
         )
 
     @mock.patch("sentry.tasks.store.save_event")
-    @mock.patch("sentry.tasks.store.default_cache")
-    def test_process_event_unprocessed(self, mock_default_cache, mock_save_event):
+    @mock.patch("sentry.tasks.store.event_cache")
+    def test_process_event_unprocessed(self, mock_event_cache, mock_save_event):
         project = self.create_project()
 
         data = {
@@ -136,11 +239,11 @@ class StoreTasksTest(PluginTestCase):
             "extra": {"foo": "bar"},
         }
 
-        mock_default_cache.get.return_value = data
+        mock_event_cache.get.return_value = data
 
         process_event(cache_key="e:1", start_time=1)
 
-        (_, (key, event, duration), _), = mock_default_cache.set.mock_calls
+        (_, (key, event, duration), _), = mock_event_cache.set.mock_calls
         assert key == "e:1"
         assert event["unprocessed"] is True
         assert duration == 3600
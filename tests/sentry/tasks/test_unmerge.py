@@ -9,6 +9,7 @@ from collections import OrderedDict
 from datetime import datetime, timedelta
 
 import pytz
+import six
 from django.conf import settings
 from django.utils import timezone
 from mock import patch, Mock
@@ -679,3 +680,65 @@ class UnmergeTestCase(TestCase):
         )
         assert destination_similar_items[1][0] == source.id
         assert destination_similar_items[1][1]["message:message:character-shingles"] < 1.0
+
+    @patch("sentry.tasks.unmerge.eventstream")
+    def test_unmerge_records_features_at_event_timestamps(self, mock_eventstream):
+        mock_eventstream.start_unmerge = Mock(return_value=None)
+
+        project = self.create_project()
+        source = self.create_group(project)
+
+        # the similarity index stores features in 30 day intervals, these
+        # events span two of them
+        now = timezone.now().replace(microsecond=0)
+        dates = [now - timedelta(days=45), now - timedelta(days=44), now - timedelta(days=1)]
+
+        def create_message_event(i, message, date):
+            return Event.objects.create(
+                project_id=project.id,
+                group_id=source.id,
+                event_id=uuid.UUID(fields=(i, 0x0, 0x1000, 0x80, 0x80, 0x808080808080)).hex,
+                message=message,
+                datetime=date,
+                data={
+                    "type": "default",
+                    "metadata": {"title": message},
+                    "logentry": {"message": message, "formatted": message},
+                },
+            )
+
+        source_event = create_message_event(0, "This is the source.", now)
+        destination_events = [
+            create_message_event(i + 1, "This is the destination!", date)
+            for i, date in enumerate(dates)
+        ]
+        for event in [source_event] + destination_events:
+            GroupHash.objects.get_or_create(
+                project=project, group=source, hash=get_fingerprint(event)
+            )
+
+        with patch.object(index, "record_multi", wraps=index.record_multi) as record_multi:
+            with self.tasks():
+                unmerge.delay(
+                    project.id,
+                    source.id,
+                    None,
+                    [get_fingerprint(destination_events[0])],
+                    None,
+                    batch_size=10,
+                )
+
+        destination = Group.objects.exclude(id=source.id).get(project=project)
+
+        # all events are recorded with one call, at their own timestamps
+        assert record_multi.call_count == 1
+        recorded = {}
+        for key, _, timestamp in record_multi.call_args[0][1]:
+            recorded.setdefault(key, set()).add(timestamp)
+
+        assert recorded == {
+            six.text_type(source.id): set([int(to_timestamp(now))]),
+            six.text_type(destination.id): set(
+                int(to_timestamp(date)) for date in dates
+            ),
+        }
@@ -1,9 +1,13 @@
 from __future__ import absolute_import
 
+from copy import deepcopy
+
 from sentry.grouping.api import get_default_grouping_config_dict, load_grouping_config
 from sentry.stacktraces.processing import (
+    StacktraceProcessor,
     find_stacktraces_in_data,
     normalize_stacktraces_for_grouping,
+    process_stacktraces,
 )
 from sentry.testutils import TestCase
 
@@ -334,3 +338,48 @@ class NormalizeInApptest(TestCase):
         assert frames[4]["in_app"] is False
         assert frames[5]["in_app"] is True
         assert frames[6]["in_app"] is True
+
+
+class UppercaseProcessor(StacktraceProcessor):
+    processed = []
+
+    def handles_frame(self, frame, stacktrace_info):
+        return True
+
+    def preprocess_frame(self, processable_frame):
+        processable_frame.set_cache_key_from_values(
+            [self.project.id, processable_frame.frame["function"]]
+        )
+
+    def process_frame(self, processable_frame, processing_task):
+        function = processable_frame.cache_value
+        if function is None:
+            self.processed.append(processable_frame.frame["function"])
+            function = processable_frame.frame["function"].upper()
+            processable_frame.set_cache_value(function)
+        return [dict(processable_frame.frame, function=function)], None, None
+
+
+class FrameCacheTest(TestCase):
+    def test_frame_cache(self):
+        data = {
+            "project": self.project.id,
+            "platform": "python",
+            "stacktrace": {
+                "frames": [{"function": "foo"}, {"function": "bar"}, {"function": "foo"}]
+            },
+        }
+
+        def make_processors(data, infos):
+            return [UppercaseProcessor(data, infos)]
+
+        del UppercaseProcessor.processed[:]
+        rv = process_stacktraces(deepcopy(data), make_processors=make_processors)
+        assert [f["function"] for f in rv["stacktrace"]["frames"]] == ["FOO", "BAR", "FOO"]
+        assert UppercaseProcessor.processed == ["foo", "bar", "foo"]
+
+        # the second event is processed entirely from the cache
+        del UppercaseProcessor.processed[:]
+        rv = process_stacktraces(deepcopy(data), make_processors=make_processors)
+        assert [f["function"] for f in rv["stacktrace"]["frames"]] == ["FOO", "BAR", "FOO"]
+        assert UppercaseProcessor.processed == []
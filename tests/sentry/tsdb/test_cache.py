@@ -0,0 +1,83 @@
+from __future__ import absolute_import
+
+import mock
+
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+
+from sentry.testutils import TestCase
+from sentry.tsdb import cache as tsdb_cache
+from sentry.tsdb.base import TSDBModel
+from sentry.tsdb.inmemory import InMemoryTSDB
+from sentry.utils.dates import to_datetime
+
+
+class GetRangeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.db = InMemoryTSDB()
+        self.now = timezone.now()
+        self.start = self.now - timedelta(hours=23)
+        for hours in range(5):
+            self.db.incr(TSDBModel.group, 1, self.now - timedelta(hours=hours), count=hours + 1)
+        self.db.incr(TSDBModel.group, 2, self.now - timedelta(hours=2))
+
+    def get_range(self, keys):
+        return tsdb_cache.get_range(
+            self.db, TSDBModel.group, keys, self.start, self.now, rollup=3600
+        )
+
+    def test_results(self):
+        expected = self.db.get_range(TSDBModel.group, [1, 2], self.start, self.now, rollup=3600)
+        assert self.get_range([1, 2]) == expected
+        # served from the cache
+        assert self.get_range([1, 2]) == expected
+
+    def test_only_fetches_open_bucket(self):
+        self.get_range([1, 2])
+
+        with mock.patch.object(self.db, "get_range", wraps=self.db.get_range) as get_range:
+            self.db.incr(TSDBModel.group, 1, self.now, count=10)
+            result = self.get_range([1, 2])
+
+        _, series = self.db.get_optimal_rollup_series(self.start, self.now, 3600)
+        assert get_range.call_count == 1
+        assert get_range.call_args[1]["keys"] == [1, 2]
+        assert get_range.call_args[1]["start"] == to_datetime(series[-1])
+        assert result[1][-1] == (series[-1], 11)
+
+    def test_environment(self):
+        self.get_range([1])
+        with mock.patch.object(self.db, "get_range", wraps=self.db.get_range) as get_range:
+            tsdb_cache.get_range(
+                self.db,
+                TSDBModel.group,
+                [1],
+                self.start,
+                self.now,
+                rollup=3600,
+                environment_ids=[1],
+            )
+        # nothing is cached for the environment yet
+        assert get_range.call_args[1]["start"] == self.start.replace(
+            minute=0, second=0, microsecond=0
+        )
+
+    def test_backends_not_shared(self):
+        self.get_range([1])
+
+        class OtherTSDB(InMemoryTSDB):
+            pass
+
+        other = OtherTSDB()
+        other.incr(TSDBModel.group, 1, self.now - timedelta(hours=3), count=100)
+        result = tsdb_cache.get_range(
+            other, TSDBModel.group, [1], self.start, self.now, rollup=3600
+        )
+        assert result == other.get_range(TSDBModel.group, [1], self.start, self.now, rollup=3600)
+
+        # and the first backend's entries are still its own
+        assert self.get_range([1]) == self.db.get_range(
+            TSDBModel.group, [1], self.start, self.now, rollup=3600
+        )
@@ -178,6 +178,59 @@ class RedisTSDBTest(TestCase):
         results = self.db.get_sums(TSDBModel.project, [1, 2], dts[0], dts[-1], environment_id=1)
         assert results == {1: 0, 2: 0}
 
+    def test_coalesced_writes(self):
+        self.db.write_coalesce_window = 60
+        now = datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(hours=1)
+        dts = [now + timedelta(hours=i) for i in range(2)]
+        model = TSDBModel.frequent_issues_by_project
+
+        def timestamp(d):
+            t = int(to_timestamp(d))
+            return t - (t % 3600)
+
+        self.db.incr(TSDBModel.project, 1, dts[0])
+        self.db.incr_multi(
+            [(TSDBModel.project, 1), (TSDBModel.project, 2)], dts[0], count=2, environment_id=1
+        )
+        self.db.incr(TSDBModel.project, 1, dts[1], count=3)
+        self.db.record(TSDBModel.users_affected_by_group, 1, ("foo", "bar"), dts[0])
+        self.db.record(TSDBModel.users_affected_by_group, 1, ("bar", "baz"), dts[0])
+        self.db.record_frequency_multi(((model, {"project:1": {"group:1": 1}}),), dts[1])
+        self.db.record_frequency_multi(
+            ((model, {"project:1": {"group:1": 2, "group:2": 1}}),), dts[1]
+        )
+
+        # nothing is written until the pending writes are flushed
+        assert self.db.get_range(TSDBModel.project, [1], dts[0], dts[-1]) == {
+            1: [(timestamp(dts[0]), 0), (timestamp(dts[1]), 0)]
+        }
+
+        self.db.flush_writes()
+
+        assert self.db.get_range(TSDBModel.project, [1, 2], dts[0], dts[-1]) == {
+            1: [(timestamp(dts[0]), 3), (timestamp(dts[1]), 3)],
+            2: [(timestamp(dts[0]), 2), (timestamp(dts[1]), 0)],
+        }
+        assert self.db.get_range(TSDBModel.project, [1], dts[0], dts[-1], environment_ids=[1]) == {
+            1: [(timestamp(dts[0]), 2), (timestamp(dts[1]), 0)]
+        }
+        assert self.db.get_distinct_counts_totals(
+            TSDBModel.users_affected_by_group, [1], dts[0], dts[-1], rollup=3600
+        ) == {1: 3}
+        assert self.db.get_most_frequent(model, ["project:1"], dts[0], dts[-1]) == {
+            "project:1": [("group:1", 3.0), ("group:2", 1.0)]
+        }
+
+    def test_coalesced_writes_max_keys(self):
+        self.db.write_coalesce_window = 60
+        self.db.write_coalesce_max_keys = 2
+        now = datetime.utcnow().replace(tzinfo=pytz.UTC)
+
+        self.db.incr(TSDBModel.project, 1, now)
+        assert self.db.get_sums(TSDBModel.project, [1], now, now) == {1: 0}
+        self.db.incr(TSDBModel.project, 2, now)
+        assert self.db.get_sums(TSDBModel.project, [1, 2], now, now) == {1: 1, 2: 1}
+
     def test_count_distinct(self):
         now = datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(hours=4)
         dts = [now + timedelta(hours=i) for i in range(4)]
@@ -0,0 +1,39 @@
+from __future__ import absolute_import
+
+import mock
+
+from sentry.testutils import TestCase
+from sentry.utils.bloom import RedisBloomFilter
+
+
+class RedisBloomFilterTest(TestCase):
+    def test_check_and_add(self):
+        bloom = RedisBloomFilter("test", capacity=1000, bucket_size=60, buckets=2, shards=4)
+
+        assert bloom.check_and_add_many(["a", "b"], timestamp=60) == [False, False]
+        assert bloom.check_and_add_many(["a", "c"], timestamp=60) == [True, False]
+
+        # a different process has no local copy and needs to ask Redis
+        other = RedisBloomFilter("test", capacity=1000, bucket_size=60, buckets=2, shards=4)
+        assert other.check_and_add("b", timestamp=119) is True
+        assert other.check_and_add("a", timestamp=179) is True
+        assert other.check_and_add("d", timestamp=179) is False
+
+        # "c" was only added to the first bucket, which has left the window
+        another = RedisBloomFilter("test", capacity=1000, bucket_size=60, buckets=2, shards=4)
+        assert another.check_and_add("c", timestamp=180) is False
+
+    def test_one_command_per_shard(self):
+        bloom = RedisBloomFilter("test", capacity=1000, bucket_size=60, buckets=2, shards=4)
+        items = ["item-%d" % i for i in range(20)]
+
+        with mock.patch.object(
+            bloom.cluster, "execute_commands", wraps=bloom.cluster.execute_commands
+        ) as execute_commands:
+            assert bloom.check_and_add_many(items, timestamp=60) == [False] * 20
+        (commands,), _ = execute_commands.call_args
+        assert len(commands) == len(set(bloom.get_shard(item) for item in items))
+        assert all(len(shard_commands) == 1 for shard_commands in commands.values())
+
+        other = RedisBloomFilter("test", capacity=1000, bucket_size=60, buckets=2, shards=4)
+        assert other.check_and_add_many(items + ["new"], timestamp=61) == [True] * 20 + [False]
@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+
+import mock
+
+from sentry.utils.cache import LocalCache, clear_local_caches
+
+
+def test_local_cache_get_set():
+    cache = LocalCache("test")
+    assert cache.get("foo") is None
+    assert cache.get("foo", 1) == 1
+
+    cache.set("foo", "bar")
+    assert cache.get("foo") == "bar"
+
+    cache.delete("foo")
+    assert cache.get("foo") is None
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache("test", max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+@mock.patch("sentry.utils.cache.time")
+def test_local_cache_ttl(mock_time):
+    mock_time.return_value = 1000
+    cache = LocalCache("test", ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=120)
+
+    mock_time.return_value = 1059
+    assert cache.get("a") == 1
+
+    mock_time.return_value = 1060
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+@mock.patch("sentry.utils.metrics.incr")
+def test_local_cache_metrics(mock_incr):
+    cache = LocalCache("test")
+    cache.get("a")
+    cache.set("a", 1)
+    cache.get("a")
+
+    assert [c[0][0] for c in mock_incr.call_args_list] == ["local_cache.miss", "local_cache.hit"]
+    assert mock_incr.call_args[1]["tags"] == {"cache": "test"}
+
+
+def test_clear_local_caches():
+    cache = LocalCache("test")
+    cache.set("a", 1)
+    clear_local_caches()
+    assert cache.get("a") is None
+
+
+@mock.patch("sentry.utils.metrics.incr")
+def test_local_cache_max_weight(mock_incr):
+    cache = LocalCache("test", max_weight=10)
+    cache.set("a", 1, weight=4)
+    cache.set("b", 2, weight=4)
+    assert cache.weight == 8
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, weight=4)
+    assert cache.weight == 8
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert mock_incr.call_args_list[1][0] == ("local_cache.evicted", 1)
+
+    cache.delete("a")
+    assert cache.weight == 4
@@ -4,7 +4,7 @@ from __future__ import absolute_import
 
 from sentry.constants import FILTER_MASK
 from unittest import TestCase
-from sentry.utils.data_scrubber import SensitiveDataFilter
+from sentry.utils.data_scrubber import SensitiveDataFilter, varmap
 
 VARS = {
     "foo": "bar",
@@ -411,3 +411,26 @@ class SensitiveDataFilterTest(TestCase):
         proc.apply(data)
 
         assert data["breadcrumbs"]["values"][0]["message"] == FILTER_MASK
+
+    def test_scrubs_in_place(self):
+        extra = {"foo": {"password": "hello", "bar": ["baz", {"secret": "hello"}]}}
+        data = {"extra": extra}
+
+        proc = SensitiveDataFilter()
+        proc.apply(data)
+
+        assert data["extra"] is extra
+        assert extra == {"foo": {"password": FILTER_MASK, "bar": ["baz", {"secret": FILTER_MASK}]}}
+
+    def test_matches_varmap(self):
+        value = {
+            "pairs": [("password", "hello"), ["foo", "bar"]],
+            "tuple": ("a", "pg://matt:pass@localhost/1", 1),
+            "nested": [[{"api_key": "x"}], []],
+            "is_authenticated": "true",
+        }
+        value["self"] = value
+
+        proc = SensitiveDataFilter(fields=["foo"])
+        expected = varmap(proc.sanitize, value)
+        assert proc._scrub(value) == expected